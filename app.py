@@ -1,30 +1,92 @@
 import io
+import os
+import json
+import time
+import base64
 import logging
+from datetime import datetime
 import numpy as np
-import tensorflow as tf
-from PIL import Image
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
-import joblib
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from flask import render_template, redirect, url_for, session
-from telegram import Bot
-from fusion import fuse_predictions
+from fusion import fuse_predictions, fuse_predictions_batch, batch_labels
+from batching import MicroBatcher
+from image_backends import load_image_model, read_tflite_model
+from PIL import Image
+from image_preprocess import open_image, MODEL_INPUT_SIZE
+from image_cache import PerceptualCache, dhash
+from text_model import TextModel
+from model_registry import ModelRegistry, ModelNotReady
+from db import ConnectionPool
+from notifier import NotificationDispatcher, TelegramSender
+from geo_index import DuplicateDetector
+from metrics import MetricsRegistry, flatten_stats
+from track_cache import TrackCache
+from change_feed import ChangeFeed, WatcherLimitReached
+from stats import fetch_stats
+
+
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+
+# Per-worker histograms, served in Prometheus format at /metrics
+metrics = MetricsRegistry()
+CLASSIFY_STAGE_SECONDS = metrics.histogram(
+    "snapfix_classify_stage_seconds", "Time spent in each classification stage.", ["stage"]
+)
+DB_SECONDS = metrics.histogram(
+    "snapfix_db_seconds", "Time spent in database operations (connect = pool checkout).", ["op"]
+)
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "snapfix_http_request_seconds",
+    "Time until the view returned its response (streamed bodies not included).",
+    ["method", "route", "status"],
+)
+
 
+def stage_timer(stage):
+    """`with stage_timer("decode"): ...` records into snapfix_classify_stage_seconds."""
+    return CLASSIFY_STAGE_SECONDS.time(stage=stage)
 
-bot = Bot(token='YOUR TELEGRAM TOKEN')
+
+def observe_db(op, seconds):
+    DB_SECONDS.observe(seconds, op=op)
+
+
+DB_SETTINGS = dict(
+    dbname=os.getenv("DB_NAME", "snapfix"),
+    user=os.getenv("DB_USER", "postgres"),
+    password=os.getenv("DB_PASSWORD", ""),
+    host=os.getenv("DB_HOST", "localhost"),
+    port=int(os.getenv("DB_PORT", "5432")),
+)
+
+db_pool = ConnectionPool(
+    minconn=int(os.getenv("SNAPFIX_DB_POOL_MIN", "1")),
+    maxconn=int(os.getenv("SNAPFIX_DB_POOL_MAX", "10")),
+    acquire_timeout=float(os.getenv("SNAPFIX_DB_POOL_TIMEOUT", "10")),
+    observe=observe_db,
+    cursor_factory=RealDictCursor,
+    **DB_SETTINGS,
+)
 
 
 def get_db_connection():
-    return psycopg2.connect(
-        dbname="DB_NAME",
-        user="DB_USER",
-        password="DB_PASSWORD",
-        host="DB_HOST",
-        port= DB_PORT,
-        cursor_factory=RealDictCursor,
-    )
+    """Borrow a pooled connection: `with get_db_connection() as conn: ...`"""
+    return db_pool.connection()
+
+
+notification_dispatcher = NotificationDispatcher(
+    db_pool,
+    TelegramSender(TELEGRAM_TOKEN, api_url=TELEGRAM_API_URL),
+    global_rate=float(os.getenv("SNAPFIX_TELEGRAM_GLOBAL_RATE", "30")),
+    per_chat_rate=float(os.getenv("SNAPFIX_TELEGRAM_PER_CHAT_RATE", "1")),
+    max_attempts=int(os.getenv("SNAPFIX_TELEGRAM_MAX_ATTEMPTS", "5")),
+    lease_s=float(os.getenv("SNAPFIX_TELEGRAM_LEASE_S", "300")),
+)
 
 
 DEPT_MAP = {
@@ -54,8 +116,12 @@ def generate_tracking_id():
 BASE_DIR = os.path.dirname(__file__)
 
 MODEL_PATH = os.path.join(BASE_DIR, "model_output", "image_model_mobilenet.keras")
+TFLITE_MODEL_PATH = os.path.join(BASE_DIR, "model_output", "image_model_int8.tflite")
+SAVEDMODEL_PATH = os.path.join(BASE_DIR, "model_output", "image_model_serving")
 TEXT_VEC_PATH = os.path.join(BASE_DIR, "text_vectorizer.joblib")
 TEXT_CLF_PATH = os.path.join(BASE_DIR, "text_classifier.joblib")
+# Compiled NumPy export of the two joblib files; used instead of them when present
+TEXT_SCORER_PATH = os.path.join(BASE_DIR, "text_scorer.npz")
 
 CLASS_NAMES = [
     "damaged_concrete_structures",
@@ -70,21 +136,352 @@ CLASS_NAMES = [
     "water_logging"
 ]
 
+# "full" workers serve classification; "web" workers never load a model
+# (nor import TensorFlow) and answer the classify routes with 503
+WORKER_PROFILE = os.getenv("SNAPFIX_WORKER_PROFILE", "full")
+
+# Model loading: "background" (thread per worker), "lazy" (first use) or "eager" (at import)
+MODEL_LOADING = os.getenv("SNAPFIX_MODEL_LOADING", "background")
+MODEL_WAIT_S = float(os.getenv("SNAPFIX_MODEL_WAIT_S", "30"))
+# A model that failed to load is retried after this, doubling per failure up to 10 min
+MODEL_RETRY_S = float(os.getenv("SNAPFIX_MODEL_RETRY_S", "30"))
+
+# DEBUG adds the per-request probabilities and SQL of the admin list
+LOG_LEVEL = os.getenv("SNAPFIX_LOG_LEVEL", "INFO").upper()
+
+# Image inference backend: "keras" (float32), "tflite" (int8 quantized) or
+# "savedmodel" (serving export: uploads are forwarded as bytes and decoded in-graph)
+IMAGE_BACKEND = os.getenv("SNAPFIX_IMAGE_BACKEND", "keras")
+IMAGE_BYTES_INPUT = IMAGE_BACKEND == "savedmodel"
+
+# CPU threads per worker process for inference (unset: each runtime's default,
+# i.e. every core). gunicorn.conf.py derives them from the worker count.
+TF_INTRA_OP_THREADS = int(os.getenv("SNAPFIX_TF_INTRA_OP_THREADS", "0")) or None
+TF_INTER_OP_THREADS = int(os.getenv("SNAPFIX_TF_INTER_OP_THREADS", "0")) or None
+TFLITE_NUM_THREADS = int(os.getenv("SNAPFIX_TFLITE_NUM_THREADS", "0")) or TF_INTRA_OP_THREADS
+
+# Largest accepted request body (photo uploads, bulk reports)
+MAX_UPLOAD_MB = float(os.getenv("SNAPFIX_MAX_UPLOAD_MB", "10"))
+
+# Dynamic micro-batching of /api/classify image inference
+IMAGE_BATCH_MAX_SIZE = int(os.getenv("SNAPFIX_IMAGE_BATCH_MAX_SIZE", "16"))
+IMAGE_BATCH_MAX_WAIT_MS = float(os.getenv("SNAPFIX_IMAGE_BATCH_MAX_WAIT_MS", "5"))
+
+# /api/classify/batch: items per request, and items per forward pass / streamed chunk
+CLASSIFY_BATCH_MAX_ITEMS = int(os.getenv("SNAPFIX_CLASSIFY_BATCH_MAX_ITEMS", "1000"))
+CLASSIFY_BATCH_CHUNK = int(os.getenv("SNAPFIX_CLASSIFY_BATCH_CHUNK", "64"))
+
+# Memoized text predictions; artifacts are re-checked for changes every few seconds
+TEXT_CACHE_SIZE = int(os.getenv("SNAPFIX_TEXT_CACHE_SIZE", "4096"))
+TEXT_CACHE_TTL = float(os.getenv("SNAPFIX_TEXT_CACHE_TTL", "3600"))
+TEXT_MODEL_CHECK_INTERVAL = float(os.getenv("SNAPFIX_TEXT_MODEL_CHECK_INTERVAL", "5"))
+
+# Perceptual-hash cache of image predictions (size 0 disables it)
+IMAGE_CACHE_SIZE = int(os.getenv("SNAPFIX_IMAGE_CACHE_SIZE", "10000"))
+IMAGE_CACHE_MAX_DISTANCE = int(os.getenv("SNAPFIX_IMAGE_CACHE_MAX_DISTANCE", "4"))
+IMAGE_CACHE_PATH = os.getenv("SNAPFIX_IMAGE_CACHE_PATH") or None
+
+# Reports of the same issueType this close (and recent) to an open one are
+# linked to it as duplicates instead of opening a new work item (radius 0 disables)
+DUPLICATE_RADIUS_M = float(os.getenv("SNAPFIX_DUPLICATE_RADIUS_M", "50"))
+DUPLICATE_WINDOW_HOURS = float(os.getenv("SNAPFIX_DUPLICATE_WINDOW_HOURS", "72"))
+
+# Read-through cache of /api/track answers (size 0 disables it); unknown ids
+# are cached for the shorter negative TTL. The Redis URL adds a shared tier.
+TRACK_CACHE_SIZE = int(os.getenv("SNAPFIX_TRACK_CACHE_SIZE", "10000"))
+TRACK_CACHE_TTL = float(os.getenv("SNAPFIX_TRACK_CACHE_TTL", "30"))
+TRACK_CACHE_NEGATIVE_TTL = float(os.getenv("SNAPFIX_TRACK_CACHE_NEGATIVE_TTL", "10"))
+TRACK_CACHE_REDIS_URL = os.getenv("SNAPFIX_TRACK_CACHE_REDIS_URL") or None
+
+# Status subscriptions: longest a long-poll is held, lifetime of one SSE
+# stream (clients reconnect with Last-Event-ID) and SSE keep-alive interval
+WATCH_TIMEOUT_S = float(os.getenv("SNAPFIX_WATCH_TIMEOUT_S", "25"))
+WATCH_STREAM_MAX_S = float(os.getenv("SNAPFIX_WATCH_STREAM_MAX_S", "300"))
+WATCH_HEARTBEAT_S = float(os.getenv("SNAPFIX_WATCH_HEARTBEAT_S", "15"))
+# Open watch requests per worker process (0 = no cap). Each one holds a server
+# thread, so gunicorn.conf.py gives every worker this many threads on top of
+# SNAPFIX_THREADS; beyond it watchers get 503 + Retry-After instead of
+# starving /api/classify and /api/track.
+WATCH_MAX_PER_WORKER = int(os.getenv("SNAPFIX_WATCH_MAX_PER_WORKER", "32"))
+WATCH_RETRY_AFTER_S = int(os.getenv("SNAPFIX_WATCH_RETRY_AFTER_S", "10"))
+
 # ================= LOAD MODELS ================= #
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def configure_tf_threads():
+    # Only takes effect before TensorFlow creates its thread pools, i.e.
+    # before the first op in this process
+    if IMAGE_BACKEND == "tflite" or not (TF_INTRA_OP_THREADS or TF_INTER_OP_THREADS):
+        return
+    import tensorflow as tf
+
+    if TF_INTRA_OP_THREADS:
+        tf.config.threading.set_intra_op_parallelism_threads(TF_INTRA_OP_THREADS)
+    if TF_INTER_OP_THREADS:
+        tf.config.threading.set_inter_op_parallelism_threads(TF_INTER_OP_THREADS)
+
+
+# (version, flatbuffer bytes) of the TFLite model, read by prepare_for_fork
+# in a pre-forking master and shared copy-on-write by the workers
+preloaded_tflite = None
+
+
+def build_image_model():
+    configure_tf_threads()
+    # Version of the file about to be loaded: cached predictions of another one are not reused
+    version = image_model_version()
+    tflite_content = None
+    if preloaded_tflite is not None and preloaded_tflite[0] == version:
+        tflite_content = preloaded_tflite[1]
+    model = load_image_model(
+        IMAGE_BACKEND,
+        keras_path=MODEL_PATH,
+        tflite_path=TFLITE_MODEL_PATH,
+        num_threads=TFLITE_NUM_THREADS,
+        savedmodel_path=SAVEDMODEL_PATH,
+        tflite_content=tflite_content,
+    )
+    if image_cache is not None:
+        image_cache.set_namespace(version)
+    return model
+
+
+def warm_up_image_model(model):
+    # The first predict() builds the inference graph; pay for it before traffic does
+    model.predict(np.zeros((1, *MODEL_INPUT_SIZE, 3), dtype=np.float32))
+    if model.accepts_bytes:
+        # Bytes signature (and every padded batch size of an XLA export)
+        model.warmup(WARMUP_JPEG)
+
+
+def encode_warmup_jpeg():
+    buf = io.BytesIO()
+    Image.new("RGB", (320, 240), (128, 128, 128)).save(buf, format="JPEG")
+    return buf.getvalue()
 
-image_model = tf.keras.models.load_model(MODEL_PATH)
-logging.info("✅ Image model loaded (MobileNet)")
 
-text_vectorizer = joblib.load(TEXT_VEC_PATH)
-text_classifier = joblib.load(TEXT_CLF_PATH)
+WARMUP_JPEG = encode_warmup_jpeg()
+
+
+def build_text_model():
+    return TextModel(
+        TEXT_VEC_PATH,
+        TEXT_CLF_PATH,
+        scorer_path=TEXT_SCORER_PATH,
+        cache_size=TEXT_CACHE_SIZE,
+        cache_ttl=TEXT_CACHE_TTL,
+        check_interval=TEXT_MODEL_CHECK_INTERVAL,
+        timer=stage_timer,
+    )
+
+
+models = ModelRegistry(mode=MODEL_LOADING, wait_timeout=MODEL_WAIT_S, retry_s=MODEL_RETRY_S)
+if WORKER_PROFILE == "full":
+    models.register("image", build_image_model, warm_up_image_model)
+    # NumPy/sklearn state only: safe to load before fork and share
+    models.register("text", build_text_model, TextModel.warmup, fork_safe=True)
+
+
+def prepare_for_fork():
+    """
+    Run once in a pre-forking master (gunicorn preload_app) before workers
+    exist. Loads the fork-safe models and, for the tflite backend, reads the
+    model's flatbuffer, so workers share both copy-on-write and only build
+    an interpreter (tensor arena) on top. The keras and savedmodel backends
+    need a running TensorFlow runtime to hold their weights, which cannot
+    cross fork(): TensorFlow is only imported here and each worker still
+    loads those models itself.
+    """
+    global preloaded_tflite
+    if WORKER_PROFILE != "full":
+        return
+    models.preload()
+    if IMAGE_BACKEND == "tflite":
+        try:
+            preloaded_tflite = (image_model_version(), read_tflite_model(TFLITE_MODEL_PATH))
+            logging.info(f"✅ TFLite model preloaded for the workers ({len(preloaded_tflite[1]) / 1e6:.1f} MB)")
+        except OSError as e:
+            # Workers load the file themselves (and retry) once it exists
+            logging.warning(f"⚠️ TFLite model not preloaded: {e}")
+    else:
+        import tensorflow  # noqa: F401
+
+
+def predict_image_batch(arrays):
+    return models.get("image").predict(np.stack(arrays))
+
+
+def predict_image_bytes_batch(uploads):
+    """Probabilities per encoded photo; None for photos TensorFlow cannot decode."""
+    model = models.get("image")
+    try:
+        return list(model.predict_bytes(uploads))
+    except Exception:
+        if len(uploads) == 1:
+            logging.debug("In-graph decode failed, falling back to PIL", exc_info=True)
+            return [None]
+    # One undecodable photo must not fail the rest of its batch
+    return [predict_image_bytes_batch([data])[0] for data in uploads]
+
+
+image_batcher = MicroBatcher(
+    predict_image_batch,
+    max_batch_size=IMAGE_BATCH_MAX_SIZE,
+    max_wait_ms=IMAGE_BATCH_MAX_WAIT_MS,
+    name="image-batcher",
+)
+
+image_bytes_batcher = MicroBatcher(
+    predict_image_bytes_batch,
+    max_batch_size=IMAGE_BATCH_MAX_SIZE,
+    max_wait_ms=IMAGE_BATCH_MAX_WAIT_MS,
+    name="image-bytes-batcher",
+) if IMAGE_BYTES_INPUT else None
+
+
+def image_model_version():
+    if IMAGE_BACKEND == "savedmodel":
+        path = os.path.join(SAVEDMODEL_PATH, "saved_model.pb")
+    else:
+        path = TFLITE_MODEL_PATH if IMAGE_BACKEND == "tflite" else MODEL_PATH
+    st = os.stat(path)
+    return f"{IMAGE_BACKEND}:{st.st_mtime_ns}:{st.st_size}"
+
+
+image_cache = PerceptualCache(
+    max_entries=IMAGE_CACHE_SIZE,
+    max_distance=IMAGE_CACHE_MAX_DISTANCE,
+    namespace=None,  # set by build_image_model() once the model is loaded
+    db_path=IMAGE_CACHE_PATH,
+) if IMAGE_CACHE_SIZE > 0 and WORKER_PROFILE == "full" else None
+
+
+def decode_upload(data):
+    """Uploaded bytes -> model-sized PIL image, timing the decode and resize stages."""
+    with stage_timer("decode"):
+        image = open_image(data)
+    with stage_timer("resize"):
+        return image.resize(MODEL_INPUT_SIZE)
+
+
+def classify_image(image):
+    def predict():
+        # Pixels stay in [0, 255]: the model applies preprocess_input in-graph
+        with stage_timer("predict"):
+            return image_batcher.predict(np.asarray(image, dtype=np.float32))
+
+    if image_cache is None:
+        return predict()
+    return image_cache.get_or_compute(image, predict)
+
+
+# Smallest decode dhash() can work from; JPEG draft mode then decodes at 1/8 scale
+DHASH_DECODE_SIZE = (9, 8)
+
+
+def upload_hash(data):
+    """
+    dHash of an upload for the image cache, from a draft decode at 1/8 scale
+    (None if PIL cannot read it): the savedmodel path skips the full decode.
+    """
+    try:
+        with stage_timer("hash"):
+            return dhash(open_image(data, DHASH_DECODE_SIZE))
+    except Exception:
+        return None
+
+
+def classify_upload(data):
+    """Probabilities for one uploaded photo."""
+    if not IMAGE_BYTES_INPUT:
+        return classify_image(decode_upload(data))
+
+    h = upload_hash(data) if image_cache else None
+    probs = image_cache.get(h) if h is not None else None
+    if probs is not None:
+        return probs
+
+    start = time.perf_counter()
+    with stage_timer("predict"):
+        probs = image_bytes_batcher.predict(data)
+    if probs is None:
+        # A format TensorFlow does not decode (e.g. WebP): PIL, then the pixel signature
+        return classify_image(decode_upload(data))
+    if h is not None:
+        image_cache.put(h, probs, inference_s=time.perf_counter() - start)
+    return probs
+
+
+def classify_uploads(uploads):
+    """classify_images() for encoded photos decoded in-graph; None where TensorFlow cannot decode one."""
+    hashes = [upload_hash(data) for data in uploads] if image_cache else [None] * len(uploads)
+    results = [image_cache.get(h) if h is not None else None for h in hashes]
+
+    missing = [i for i, probs in enumerate(results) if probs is None]
+    if missing:
+        start = time.perf_counter()
+        with stage_timer("predict"):
+            probs_rows = predict_image_bytes_batch([uploads[i] for i in missing])
+        per_image = (time.perf_counter() - start) / len(missing)
+        for i, probs in zip(missing, probs_rows):
+            results[i] = probs
+            if probs is not None and hashes[i] is not None:
+                image_cache.put(hashes[i], probs, inference_s=per_image)
+    return results
+
+
+def classify_images(images):
+    """Probabilities for a list of PIL images: cache hits plus one forward pass for the rest."""
+    hashes = [dhash(image) for image in images] if image_cache else None
+    results = [image_cache.get(h) for h in hashes] if image_cache else [None] * len(images)
+
+    missing = [i for i, probs in enumerate(results) if probs is None]
+    if missing:
+        batch = np.stack([np.asarray(images[i], dtype=np.float32) for i in missing])
+        start = time.perf_counter()
+        with stage_timer("predict"):
+            probs_rows = models.get("image").predict(batch)
+        per_image = (time.perf_counter() - start) / len(missing)
+        for i, probs in zip(missing, probs_rows):
+            results[i] = probs
+            if image_cache:
+                image_cache.put(hashes[i], probs, inference_s=per_image)
+    return results
+
+
+# Last in the model section: build_image_model needs image_model_version and image_cache
+if MODEL_LOADING == "eager":
+    models.start()
 
 # ================= APP ================= #
 
 app = Flask(__name__)
 CORS(app)
 app.secret_key = "FLASK_SECRET_KEY"
+# Werkzeug rejects larger request bodies with 413 before they are read
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024
+
+
+@app.before_request
+def start_background_workers():
+    # No-op after the first request in each worker process
+    models.start()
+    if TELEGRAM_TOKEN:
+        notification_dispatcher.ensure_started()
+
+@app.errorhandler(ModelNotReady)
+def model_not_ready(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+
+@app.errorhandler(WatcherLimitReached)
+def watcher_limit_reached(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": str(WATCH_RETRY_AFTER_S)}
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({"error": f"Upload exceeds {MAX_UPLOAD_MB:g} MB limit"}), 413
 
 # ================= AUTH (TEMP) ================= #
 
@@ -105,81 +502,298 @@ def login():
 def classify():
     logging.info("📥 /api/classify")
 
-    file = request.files.get("file")
-    description = request.form.get("description", "")
+    # Parsing the multipart body happens on first access to request.files
+    with stage_timer("upload_read"):
+        file = request.files.get("file")
+        description = request.form.get("description", "")
+        data = file.read() if file else None
+
+    # 503 (not a silent text-only answer) while the models are still loading
+    models.require("image", "text")
 
     img_probs = None
     txt_probs = None
 
     # ---------- IMAGE ----------
-    if file:
+    if data:
         try:
-            image = Image.open(io.BytesIO(file.read())).convert("RGB")
-            image = image.resize((224, 224))
-            arr = np.expand_dims(np.array(image) / 255.0, axis=0)
-            img_probs = image_model.predict(arr)[0]
+            img_probs = classify_upload(data)
         except Exception:
             logging.exception("❌ Image inference failed")
 
     # ---------- TEXT ----------
     if description:
         try:
-            X = text_vectorizer.transform([description])
-            txt_probs = text_classifier.predict_proba(X)[0]
+            txt_probs = models.get("text").predict_proba(description)
         except Exception:
             logging.exception("❌ Text inference failed")
 
     if img_probs is None and txt_probs is None:
         return jsonify({"error": "No valid input"}), 400
     
-    print("IMAGE_PROBS:", img_probs)
-    print("TEXT_PROBS :", txt_probs)
+    logging.debug(f"IMAGE_PROBS: {img_probs}")
+    logging.debug(f"TEXT_PROBS : {txt_probs}")
 
     # ---------- FUSION -----------
-    final_label, final_conf, source = fuse_predictions(
-        image_probs=img_probs,
-        text_probs=txt_probs,
-        class_names=CLASS_NAMES
-    )
-
-    # ---------- PRIORITY ----------
-    if final_conf >= 0.85:
-        priority = "High"
-    elif final_conf >= 0.65:
-        priority = "Medium"
-    else:
-        priority = "Low"
+    with stage_timer("fusion"):
+        final_label, final_conf, source = fuse_predictions(
+            image_probs=img_probs,
+            text_probs=txt_probs,
+            class_names=CLASS_NAMES
+        )
 
     logging.info(f"FINAL → {final_label} ({final_conf:.2f}) via {source}")
 
-    return jsonify({
-        "issueType": final_label,
-        "probability": round(final_conf, 2),
-        "priority": priority,
-        "decisionSource": source
-    }), 200
+    return jsonify(classification_result(final_label, final_conf, source)), 200
+
+
+def priority_for(confidence):
+    if confidence >= 0.85:
+        return "High"
+    if confidence >= 0.65:
+        return "Medium"
+    return "Low"
+
+
+def classification_result(label, confidence, source):
+    """Response body shared by /api/classify and /api/classify/batch."""
+    return {
+        "issueType": label,
+        "probability": round(confidence, 2),
+        "priority": priority_for(confidence),
+        "decisionSource": source,
+    }
+
+
+def parse_classify_batch():
+    """
+    Items as [{"id", "image": bytes or None, "description": str}] from either
+    - multipart: fields file_<i> / description_<i> (and optional id_<i>), or
+    - NDJSON: one {"id", "description", "image": <base64>} object per line.
+    """
+    items = {}
+    if request.mimetype in ("application/x-ndjson", "application/jsonlines"):
+        for i, line in enumerate(request.get_data(as_text=True).splitlines()):
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            image = obj.get("image")
+            items[i] = {
+                "id": obj.get("id"),
+                "image": base64.b64decode(image) if image else None,
+                "description": obj.get("description") or "",
+            }
+        return [items[i] for i in sorted(items)]
+
+    for key in list(request.files) + list(request.form):
+        field, _, index = key.rpartition("_")
+        if field not in ("file", "description", "id") or not index.isdigit():
+            continue
+        item = items.setdefault(int(index), {"id": None, "image": None, "description": ""})
+        if field == "file":
+            with stage_timer("upload_read"):
+                item["image"] = request.files[key].read() or None
+        elif field == "description":
+            item["description"] = request.form[key]
+        else:
+            item["id"] = request.form[key]
+    return [items[i] for i in sorted(items)]
+
+
+def classify_chunk(items):
+    """Per-item result dicts for one chunk: batched text, image and fusion."""
+    n = len(items)
+    txt_mask = np.array([bool(item["description"]) for item in items])
+    img_mask = np.zeros(n, dtype=bool)
+    txt_probs = np.zeros((n, len(CLASS_NAMES)))
+    img_probs = np.zeros((n, len(CLASS_NAMES)))
+
+    if txt_mask.any():
+        rows = np.flatnonzero(txt_mask)
+        try:
+            txt_probs[rows] = models.get("text").predict_proba_batch([items[i]["description"] for i in rows])
+        except Exception:
+            logging.exception("❌ Batch text inference failed")
+            txt_mask[:] = False
+
+    uploads = [(i, item["image"]) for i, item in enumerate(items) if item["image"]]
+    if uploads and IMAGE_BYTES_INPUT:
+        try:
+            for (i, _), probs in zip(uploads, classify_uploads([data for _, data in uploads])):
+                if probs is not None:
+                    img_probs[i] = probs
+                    img_mask[i] = True
+        except Exception:
+            logging.exception("❌ Batch image inference failed")
+        # Photos TensorFlow could not decode go through PIL below
+        uploads = [(i, data) for i, data in uploads if not img_mask[i]]
+
+    images, image_rows = [], []
+    for i, data in uploads:
+        try:
+            images.append(decode_upload(data))
+            image_rows.append(i)
+        except Exception:
+            logging.exception(f"❌ Could not decode image {i}")
+    if images:
+        try:
+            img_probs[image_rows] = classify_images(images)
+            img_mask[image_rows] = True
+        except Exception:
+            logging.exception("❌ Batch image inference failed")
+
+    with stage_timer("fusion"):
+        label_idx, conf, source = fuse_predictions_batch(img_probs, txt_probs, img_mask, txt_mask)
+    labels = batch_labels(label_idx, CLASS_NAMES)
+
+    results = []
+    for i, item in enumerate(items):
+        if not (img_mask[i] or txt_mask[i]):
+            result = {"error": "No valid input"}
+        else:
+            result = classification_result(labels[i], float(conf[i]), source[i])
+        if item["id"] is not None:
+            result["id"] = item["id"]
+        results.append(result)
+    return results
+
+
+@app.route("/api/classify/batch", methods=["POST"])
+def classify_batch():
+    try:
+        items = parse_classify_batch()
+    except (ValueError, TypeError, AttributeError):
+        return jsonify({"error": "Invalid NDJSON body"}), 400
+
+    if not items:
+        return jsonify({"error": "No items"}), 400
+    if len(items) > CLASSIFY_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {CLASSIFY_BATCH_MAX_ITEMS} items per request"}), 413
+
+    # Fail before streaming starts rather than halfway through
+    models.require("image", "text")
+
+    logging.info(f"📥 /api/classify/batch ({len(items)} items)")
+
+    def generate():
+        # One NDJSON line per item, in request order, flushed chunk by chunk
+        for start in range(0, len(items), CLASSIFY_BATCH_CHUNK):
+            chunk = items[start:start + CLASSIFY_BATCH_CHUNK]
+            for offset, result in enumerate(classify_chunk(chunk)):
+                yield json.dumps({"index": start + offset, **result}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+# ================= HEALTH ================= #
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    # Liveness: the process serves requests, models may still be loading
+    return jsonify({"status": "ok"}), 200
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    status = models.status()
+    status["profile"] = WORKER_PROFILE
+    status["pid"] = os.getpid()
+    return jsonify(status), 200 if status["ready"] else 503
+
+# ================= METRICS ================= #
+
+def runtime_stats():
+    text_model = models.loaded("text")
+    return {
+        "models": models.status(),
+        "image_batching": image_batcher.stats(),
+        "image_bytes_batching": image_bytes_batcher.stats() if image_bytes_batcher else None,
+        "text_cache": text_model.stats() if text_model else None,
+        "image_cache": image_cache.stats() if image_cache else None,
+        "db_pool": db_pool.stats(),
+        "notifications": dict(notification_dispatcher.stats),
+        "duplicates": duplicate_detector.stats() if duplicate_detector else None,
+        "track_cache": track_cache.stats() if track_cache else None,
+        "change_feed": change_feed.stats(),
+    }
+
+
+# The same counters as /api/metrics, as snapfix_<component>_<key> gauges
+metrics.add_collector(lambda: flatten_stats("snapfix", runtime_stats()))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def observe_request(response):
+    start = g.get("request_start")
+    if start is not None:
+        # Route template, not the raw path, to keep label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start, method=request.method, route=route, status=response.status_code
+        )
+    return response
+
+
+@app.route("/api/metrics", methods=["GET"])
+def runtime_metrics():
+    return jsonify(runtime_stats()), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    # Per worker process: scrape each worker (or run one) for complete numbers
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # ================= REPORT ================= #
 
-@app.route("/api/report", methods=["POST"])
-def create_report():
-    data = request.get_json()
+REPORT_COLUMNS = (
+    "userId", "issueType", "location", "description", "priority",
+    "status", "telegram_id", "primary_department",
+    "decision_source", "probability", "raw_label",
+    "latitude", "longitude", "duplicate_of",
+)
+
+# tracking_id is derived from the new id by the reports_tracking_id trigger
+# (schema.sql), so a report is written in one statement.
+INSERT_REPORT_SQL = (
+    f"INSERT INTO reports ({', '.join(REPORT_COLUMNS)}) "
+    f"VALUES ({', '.join(['%s'] * len(REPORT_COLUMNS))}) "
+    "RETURNING id, tracking_id, timestamp"
+)
+
+BULK_MAX_REPORTS = int(os.getenv("SNAPFIX_BULK_MAX_REPORTS", "10000"))
+
+
+duplicate_detector = DuplicateDetector(
+    radius_m=DUPLICATE_RADIUS_M,
+    window_s=DUPLICATE_WINDOW_HOURS * 3600,
+) if DUPLICATE_RADIUS_M > 0 else None
+
+
+def parse_location(location):
+    """'lat,lon' -> (lat, lon) floats, or (None, None) if missing/invalid."""
+    if location:
+        try:
+            lat_str, lon_str = location.split(",")
+            return float(lat_str.strip()), float(lon_str.strip())
+        except Exception:
+            pass
+    return None, None
 
+
+def report_values(data, duplicate_of=None):
+    """Column values for one report payload, in REPORT_COLUMNS order."""
     user_id = 0
     issue_type = data.get("issueType")
     location = data.get("location")
     description = data.get("description", "")
     priority = data.get("priority", "Medium")
 
-    lat = None
-    lon = None
-    if location:
-        try:
-            lat_str, lon_str = location.split(",")
-            lat = float(lat_str.strip())
-            lon = float(lon_str.strip())
-        except Exception:
-             pass
+    lat, lon = parse_location(location)
 
     telegram_id = data.get("telegram_id")
 
@@ -189,87 +803,395 @@ def create_report():
 
     primary_dept = DEPT_MAP.get(issue_type, "Unknown")
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        INSERT INTO reports (
-            userId, issueType, location, description, priority,
-            status, telegram_id, primary_department,
-            decision_source, probability, raw_label,
-            latitude, longitude
-        )
-        VALUES (%s, %s, %s, %s, %s,
-                'Pending', %s, %s,
-                %s, %s, %s,
-                %s, %s)
-        RETURNING id;
-        """,
-        (
-            user_id, issue_type, location, description, priority,
-            telegram_id, primary_dept,
-            decision_source, probability, raw_label,
-            lat, lon,
-        ),
+    return (
+        user_id, issue_type, location, description, priority,
+        "Duplicate" if duplicate_of else "Pending", telegram_id, primary_dept,
+        decision_source, probability, raw_label,
+        lat, lon, duplicate_of,
     )
 
-    row = cur.fetchone()
-    numeric_id = row["id"] if isinstance(row, dict) else row[0]
-    tracking_id = f"SNFX-{numeric_id:06d}"
 
-    cur.execute(
-        "UPDATE reports SET tracking_id = %s WHERE id = %s",
-        (tracking_id, numeric_id),
+@app.route("/api/report", methods=["POST"])
+def create_report():
+    data = request.get_json()
+    issue_type = data.get("issueType")
+    lat, lon = parse_location(data.get("location"))
+    check_duplicate = duplicate_detector is not None and lat is not None
+
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+
+        original = None
+        if check_duplicate:
+            original = duplicate_detector.find_original(cur, issue_type, lat, lon)
+
+        cur.execute(INSERT_REPORT_SQL, report_values(data, original[0] if original else None))
+        row = cur.fetchone()
+
+        conn.commit()
+        cur.close()
+
+    # The id may have been looked up (and cached as unknown) before it existed
+    invalidate_tracking(row["tracking_id"])
+
+    if original:
+        return jsonify({"tracking_id": row["tracking_id"], "duplicate_of": original[1]}), 200
+
+    if check_duplicate:
+        duplicate_detector.add(row["id"], issue_type, lat, lon, row["timestamp"], row["tracking_id"])
+    return jsonify({"tracking_id": row["tracking_id"]}), 200
+
+# ================= BULK REPORTS ================= #
+
+def copy_field(value):
+    """Encode one value for COPY ... FROM STDIN (text format)."""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
     )
 
-    conn.commit()
-    cur.close()
-    conn.close()
 
-    return jsonify({"tracking_id": tracking_id}), 200
+# VARCHAR widths in schema.sql for the text columns a payload fills in
+BULK_TEXT_LIMITS = {
+    "issueType": 50,
+    "location": 100,
+    "priority": 10,
+    "decisionSource": 50,
+    "rawLabel": 50,
+}
+
+
+def bulk_row_error(item):
+    """Why COPY would reject this report payload, or None if it would load."""
+    for field in ("issueType", "location"):
+        if not isinstance(item.get(field), str) or not item[field].strip():
+            return f"{field} must be a non-empty string"
+    for field, limit in BULK_TEXT_LIMITS.items():
+        value = item.get(field)
+        if value is not None and (not isinstance(value, str) or len(value) > limit):
+            return f"{field} must be a string of at most {limit} characters"
+
+    probability = item.get("probability")
+    if probability is not None:
+        try:
+            ok = not isinstance(probability, bool) and abs(float(probability)) < 99.995
+        except (TypeError, ValueError):
+            ok = False
+        if not ok:
+            return "probability must be a number below 100"
+
+    telegram_id = item.get("telegram_id")
+    if telegram_id is not None:
+        digits = str(telegram_id).lstrip("-")
+        if (
+            isinstance(telegram_id, (bool, float))
+            or not digits.isdigit()
+            or not -2**63 <= int(telegram_id) < 2**63
+        ):
+            return "telegram_id must be an integer"
+    return None
+
+
+def parse_bulk_payload():
+    """Reports from a JSON array body or an NDJSON (one object per line) body."""
+    if request.mimetype in ("application/x-ndjson", "application/jsonlines"):
+        return [
+            json.loads(line)
+            for line in request.get_data(as_text=True).splitlines()
+            if line.strip()
+        ]
+
+    data = request.get_json(silent=True)
+    return data if isinstance(data, list) else None
+
+
+def copy_reports(items):
+    """Insert all reports with a single COPY in one transaction; returns tracking ids in order."""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+
+        # Reserve ids up front: COPY has no RETURNING, and explicit ids let
+        # us hand tracking ids back in request order.
+        cur.execute(
+            "SELECT nextval(pg_get_serial_sequence('reports', 'id')) AS id "
+            "FROM generate_series(1, %s)",
+            (len(items),),
+        )
+        ids = [row["id"] for row in cur.fetchall()]
+
+        buf = io.StringIO()
+        for report_id, item in zip(ids, items):
+            values = (report_id,) + report_values(item)
+            buf.write("\t".join(copy_field(v) for v in values))
+            buf.write("\n")
+        buf.seek(0)
+
+        cur.copy_expert(
+            f"COPY reports (id, {', '.join(REPORT_COLUMNS)}) FROM STDIN",
+            buf,
+        )
+
+        cur.execute(
+            "SELECT id, tracking_id FROM reports WHERE id = ANY(%s)",
+            (ids,),
+        )
+        tracking_ids = {row["id"]: row["tracking_id"] for row in cur.fetchall()}
+
+        conn.commit()
+        cur.close()
+
+    return [tracking_ids[i] for i in ids]
+
+
+@app.route("/api/reports/bulk", methods=["POST"])
+def create_reports_bulk():
+    try:
+        items = parse_bulk_payload()
+    except ValueError:
+        return jsonify({"error": "Invalid NDJSON body"}), 400
+
+    if not items or not all(isinstance(item, dict) for item in items):
+        return jsonify({"error": "Expected a non-empty array of report objects"}), 400
+    if len(items) > BULK_MAX_REPORTS:
+        return jsonify({"error": f"At most {BULK_MAX_REPORTS} reports per request"}), 413
+
+    for i, item in enumerate(items):
+        error = bulk_row_error(item)
+        if error:
+            return jsonify({"error": f"Report {i}: {error}; nothing was stored"}), 400
+
+    # Not checked for duplicates (one COPY, no per-row lookup); the rows still
+    # become originals for later /api/report calls once the detector syncs
+    try:
+        tracking_ids = copy_reports(items)
+    except (psycopg2.DataError, psycopg2.IntegrityError):
+        # The database message quotes row data: keep it in the server log
+        logging.exception("❌ Bulk insert rejected")
+        return jsonify({"error": "Bulk insert rejected, nothing was stored"}), 400
+
+    invalidate_tracking(*tracking_ids)
+    return jsonify({"tracking_ids": tracking_ids}), 200
 
 # ================= TRACK ================= #
 
+track_cache = TrackCache(
+    max_entries=TRACK_CACHE_SIZE,
+    ttl=TRACK_CACHE_TTL,
+    negative_ttl=TRACK_CACHE_NEGATIVE_TTL,
+    redis_url=TRACK_CACHE_REDIS_URL,
+) if TRACK_CACHE_SIZE > 0 else None
+
+
+def invalidate_tracking(*tracking_ids):
+    """Call after committing any change to what /api/track returns for these ids."""
+    if track_cache:
+        track_cache.invalidate(*tracking_ids)
+
+
+def fetch_track_row(tracking_id):
+    """The /api/track fields plus status_version, or None if unknown."""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT tracking_id, issueType, status,
+                   primary_department, priority, remarks, timestamp,
+                   dept_status, dept_remarks, status_version
+            FROM reports
+            WHERE tracking_id = %s
+            """,
+            (tracking_id,),
+        )
+        row = cur.fetchone()
+        cur.close()
+    return row
+
+
+def load_track_body(tracking_id):
+    """JSON body of /api/track for `tracking_id`, or None if unknown."""
+    row = fetch_track_row(tracking_id)
+    if row is None:
+        return None
+    del row["status_version"]
+    return jsonify(row).get_data(as_text=True)
+
+
 @app.route("/api/track", methods=["GET"])
 def track_report():
     tracking_id = request.args.get("id")
     if not tracking_id:
         return jsonify({"error": "tracking_id required"}), 400
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT tracking_id, issueType, status,
-               primary_department, priority, remarks, timestamp,
-               dept_status, dept_remarks
-        FROM reports
-        WHERE tracking_id = %s
-        """,
-        (tracking_id,),
-    )
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    if track_cache:
+        body = track_cache.get(tracking_id, load_track_body)
+    else:
+        body = load_track_body(tracking_id)
 
-    if not row:
+    if body is None:
         return jsonify({"error": "Not found"}), 404
 
-    return jsonify(row), 200
+    return app.response_class(body, mimetype=app.json.mimetype), 200
+
+# ================= WATCH ================= #
+
+# One LISTEN connection per worker, opened by the first subscriber
+change_feed = ChangeFeed(max_subscribers=WATCH_MAX_PER_WORKER, **DB_SETTINGS)
+
+
+def watch_payload(row):
+    """/api/track fields plus the `version` cursor for the next watch call."""
+    row = dict(row)
+    row["version"] = row.pop("status_version")
+    return row
+
+
+@app.route("/api/track/watch", methods=["GET"])
+def watch_report():
+    """
+    Long-poll: answers as soon as the report's version differs from `since`
+    (or the ETag sent as If-None-Match), else 204 after `timeout` seconds.
+    Without a cursor it answers immediately with the current state.
+    """
+    tracking_id = request.args.get("id")
+    if not tracking_id:
+        return jsonify({"error": "tracking_id required"}), 400
+
+    since = request.args.get("since") or request.headers.get("If-None-Match", "").strip('"') or None
+    try:
+        timeout = min(float(request.args.get("timeout", WATCH_TIMEOUT_S)), WATCH_TIMEOUT_S)
+    except ValueError:
+        return jsonify({"error": "timeout must be a number"}), 400
+    deadline = time.monotonic() + timeout
+
+    # Subscribe first: a change committed while we read still wakes us up.
+    # No connection is held while waiting.
+    with change_feed.subscribe(tracking_id) as sub:
+        while True:
+            row = fetch_track_row(tracking_id)
+            if row is None:
+                return jsonify({"error": "Not found"}), 404
+            if since is None or str(row["status_version"]) != since:
+                response = jsonify(watch_payload(row))
+                response.headers["ETag"] = f'"{row["status_version"]}"'
+                return response, 200
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not sub.wait(remaining):
+                return "", 204, {"ETag": f'"{since}"'}
+
+
+@app.route("/api/track/events", methods=["GET"])
+def report_events():
+    """
+    Server-Sent Events: one `status` event per version change, starting with
+    the current state unless Last-Event-ID (or `since`) already matches it.
+    """
+    tracking_id = request.args.get("id")
+    if not tracking_id:
+        return jsonify({"error": "tracking_id required"}), 400
+
+    # Subscribed here rather than in the stream, so a full worker answers 503
+    # (before any query)
+    sub = change_feed.subscribe(tracking_id)
+    try:
+        row = fetch_track_row(tracking_id)
+    except BaseException:
+        # call_on_close below never runs: release the slot here
+        change_feed.unsubscribe(sub)
+        raise
+    if row is None:
+        change_feed.unsubscribe(sub)
+        return jsonify({"error": "Not found"}), 404
+
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("since")
+
+    def generate():
+        sent = last_id
+        deadline = time.monotonic() + WATCH_STREAM_MAX_S
+        yield "retry: 3000\n\n"
+        changed = True
+        while True:
+            if changed:
+                row = fetch_track_row(tracking_id)
+                if row is None:
+                    return
+                if str(row["status_version"]) != sent:
+                    sent = str(row["status_version"])
+                    data = app.json.dumps(watch_payload(row))
+                    yield f"id: {sent}\nevent: status\ndata: {data}\n\n"
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            changed = sub.wait(min(WATCH_HEARTBEAT_S, remaining))
+            if not changed:
+                # Keeps proxies from closing the idle stream
+                yield ": keep-alive\n\n"
+
+    response = Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(lambda: change_feed.unsubscribe(sub))
+    return response
+
+# ================= STATS ================= #
+
+# Served from the trigger-maintained counter tables (schema.sql): the cost
+# does not grow with the number of reports.
+STATS_MAX_DAYS = int(os.getenv("SNAPFIX_STATS_MAX_DAYS", "365"))
+
+
+@app.route("/api/stats", methods=["GET"])
+def report_stats():
+    department = request.args.get("department") or None
+    try:
+        admin_id = int(request.args["admin_id"]) if request.args.get("admin_id") else None
+        days = min(max(int(request.args.get("days", 30)), 1), STATS_MAX_DAYS)
+    except ValueError:
+        return jsonify({"error": "admin_id and days must be integers"}), 400
+
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        stats = fetch_stats(cur, department=department, admin_id=admin_id, days=days)
+        cur.close()
+    return jsonify(stats), 200
 
 # ================= WEB-PAGE ================= #
 
+ADMIN_PAGE_SIZE = int(os.getenv("SNAPFIX_ADMIN_PAGE_SIZE", "50"))
+
+
+def encode_page_cursor(row):
+    """Keyset cursor for the row a page ended on: '<iso timestamp>,<id>'."""
+    return f"{row['timestamp'].isoformat()},{row['id']}"
+
+
+def decode_page_cursor(cursor):
+    ts, report_id = cursor.rsplit(",", 1)
+    return datetime.fromisoformat(ts), int(report_id)
+
+
 @app.route('/admin/reports')
 def admin_reports():
     status = request.args.get('status', '')
     dept = request.args.get('dept', '')
+    after = request.args.get('after', '')
+    
+    try:
+        after_key = decode_page_cursor(after) if after else None
+    except ValueError:
+        return "Invalid page cursor", 400
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
         base_sql = '''SELECT 
+        id,
         tracking_id, 
         issueType,
         primary_department, 
@@ -293,29 +1215,40 @@ def admin_reports():
             base_sql += ' AND primary_department = %s'
             params.append(dept)
         
-        base_sql += ' ORDER BY timestamp DESC'
-        
-        print(f"DEBUG - SQL Query: {base_sql}")
-        print(f"DEBUG - Params: {params}")
+        # Keyset pagination on (timestamp, id): served straight from the
+        # composite indexes in schema.sql, no matter how deep the page.
+        if after_key:
+            base_sql += ' AND (timestamp, id) < (%s, %s)'
+            params.extend(after_key)
         
-        cur.execute(base_sql, params)
-        rows = cur.fetchall()
+        base_sql += ' ORDER BY timestamp DESC, id DESC LIMIT %s'
+        params.append(ADMIN_PAGE_SIZE + 1)
         
-        print(f"DEBUG - Rows returned: {len(rows)}")
-        if rows:
-            print(f"DEBUG - First row: {rows[0]}")
+        logging.debug(f"admin_reports SQL: {base_sql}")
+        logging.debug(f"admin_reports params: {params}")
         
-        cur.execute('SELECT id, department FROM dept_admins ORDER BY department')
-        dept_admins = cur.fetchall()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(base_sql, params)
+            rows = cur.fetchall()
+            
+            has_more = len(rows) > ADMIN_PAGE_SIZE
+            rows = rows[:ADMIN_PAGE_SIZE]
+            next_cursor = encode_page_cursor(rows[-1]) if has_more else None
+
+            cur.execute('SELECT id, department FROM dept_admins ORDER BY department')
+            dept_admins = cur.fetchall()
+            
+            # Headline numbers from the counters, not a scan of reports
+            stats = fetch_stats(cur, department=dept or None)
+            cur.close()
         
-        cur.close()
-        conn.close()
+        logging.debug(f"admin_reports rows returned: {len(rows)}")
         
-        return render_template('admin_reports.html', reports=rows, dept_admins=dept_admins, selected_status=status, selected_dept=dept)
+        return render_template('admin_reports.html', reports=rows, dept_admins=dept_admins, selected_status=status, selected_dept=dept,
+                               next_cursor=next_cursor, is_first_page=not after, stats=stats)
     except Exception as e:
-        print(f"Error in admin_reports: {e}")
-        import traceback
-        traceback.print_exc()
+        logging.exception("❌ admin_reports failed")
         return f"Error: {str(e)}", 500
 
 # ================= ADMIN ASSIGN ================= #
@@ -324,16 +1257,16 @@ def admin_reports():
 def admin_assign_report(tracking_id):
     dept_admin_id = request.form.get("dept_admin_id")
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE reports SET assigned_dept_admin_id=%s, dept_status='Assigned' WHERE tracking_id=%s",
-        (dept_admin_id, tracking_id),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE reports SET assigned_dept_admin_id=%s, dept_status='Assigned' WHERE tracking_id=%s",
+            (dept_admin_id, tracking_id),
+        )
+        conn.commit()
+        cur.close()
     
+    invalidate_tracking(tracking_id)
     return redirect(url_for("admin_reports"))
 
 # ================= DEPT ADMIN LOGIN ================= #
@@ -344,13 +1277,12 @@ def deptlogin():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id, department FROM dept_admins WHERE username = %s AND password = %s", 
-                    (username, password,))
-        deptadmin = cur.fetchone()
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, department FROM dept_admins WHERE username = %s AND password = %s", 
+                        (username, password,))
+            deptadmin = cur.fetchone()
+            cur.close()
         
         if deptadmin:
             session['deptadminid'] = deptadmin['id']
@@ -371,21 +1303,21 @@ def deptdashboard():
     deptadminid = session["deptadminid"]
     department = session["deptadmindepartment"]
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute(
-    """SELECT tracking_id, issuetype, status, priority, timestamp, 
-       dept_status, dept_remarks, description, location, latitude, longitude 
-       FROM reports 
-       WHERE assigned_dept_admin_id = %s AND (dept_status IS NULL OR dept_status != 'Resolved') 
-       ORDER BY timestamp DESC""",
-    (deptadminid,)
-)
-    reports = cur.fetchall()
-    cur.close()
-    conn.close()
-    return render_template("dept_dashboard.html", reports=reports, department=department)
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        
+        cur.execute(
+            """SELECT tracking_id, issuetype, status, priority, timestamp, 
+               dept_status, dept_remarks, description, location, latitude, longitude 
+               FROM reports 
+               WHERE assigned_dept_admin_id = %s AND (dept_status IS NULL OR dept_status != 'Resolved') 
+               ORDER BY timestamp DESC""",
+            (deptadminid,)
+        )
+        reports = cur.fetchall()
+        stats = fetch_stats(cur, admin_id=deptadminid)
+        cur.close()
+    return render_template("dept_dashboard.html", reports=reports, department=department, stats=stats)
 
 # ================= DEPT ADMIN REPORT DETAIL ================= #
 
@@ -401,80 +1333,82 @@ def deptreportdetail(tracking_id):
         dept_remarks = str(request.form.get("deptremarks", "")).strip()
         
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            # Get report details BEFORE updating
-            cursor.execute(
-                "SELECT telegram_id, issueType FROM reports WHERE tracking_id = %s AND assigned_dept_admin_id = %s",
-                (tracking_id, deptadminid)
-            )
-            reportrow = cursor.fetchone()
-            
-            if not reportrow:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                
+                # Get report details BEFORE updating
+                cursor.execute(
+                    "SELECT telegram_id, issueType FROM reports WHERE tracking_id = %s AND assigned_dept_admin_id = %s",
+                    (tracking_id, deptadminid)
+                )
+                reportrow = cursor.fetchone()
+                
+                if not reportrow:
+                    cursor.close()
+                    return "Report not found or not assigned to you", 404
+                
+                telegram_id = reportrow["telegram_id"]
+                
+                # Get department name
+                cursor.execute(
+                    "SELECT department FROM dept_admins WHERE id = %s",
+                    (deptadminid,)
+                )
+                deptrow = cursor.fetchone()
+                deptname = deptrow["department"] if deptrow else "Unknown"
+                
+                # UPDATE the status
+                cursor.execute(
+                    "UPDATE reports SET dept_status = %s, dept_remarks = %s WHERE tracking_id = %s RETURNING id",
+                    (dept_status, dept_remarks, tracking_id)
+                )
+                report_id = cursor.fetchone()["id"]
+                
+                # Queue the Telegram notification in the same transaction;
+                # the background dispatcher delivers it.
+                if telegram_id:
+                    statusmessages = {
+                        "Assigned": f"🔔 Your complaint {tracking_id} has been assigned to {deptname}.",
+                        "In Progress": f"⏳ Work is in progress on your complaint {tracking_id}.",
+                        "Resolved": f"✅ Your complaint {tracking_id} has been resolved by {deptname}. Thank you!"
+                    }
+                    message = statusmessages.get(dept_status, f"📋 Status updated: {dept_status}")
+                    cursor.execute(
+                        "INSERT INTO notification_outbox (tracking_id, chat_id, message) VALUES (%s, %s, %s)",
+                        (tracking_id, int(telegram_id), message)
+                    )
+                else:
+                    logging.warning(f"⚠️ No telegram_id found for {tracking_id}")
+                
+                conn.commit()
                 cursor.close()
-                conn.close()
-                return "Report not found or not assigned to you", 404
             
-            telegram_id = reportrow["telegram_id"]
-            issue_type = reportrow["issueType"]
-            
-            # Get department name
-            cursor.execute(
-                "SELECT department FROM dept_admins WHERE id = %s",
-                (deptadminid,)
-            )
-            deptrow = cursor.fetchone()
-            deptname = deptrow["department"] if deptrow else "Unknown"
-            
-            # UPDATE the status
-            cursor.execute(
-                "UPDATE reports SET dept_status = %s, dept_remarks = %s WHERE tracking_id = %s",
-                (dept_status, dept_remarks, tracking_id)
-            )
-            conn.commit()
-            
-            # Send Telegram notification
+            invalidate_tracking(tracking_id)
             if telegram_id:
-                statusmessages = {
-                    "Assigned": f"🔔 Your complaint {tracking_id} has been assigned to {deptname}.",
-                    "In Progress": f"⏳ Work is in progress on your complaint {tracking_id}.",
-                    "Resolved": f"✅ Your complaint {tracking_id} has been resolved by {deptname}. Thank you!"
-                }
-                message = statusmessages.get(dept_status, f"📋 Status updated: {dept_status}")
-                try:
-                    bot.send_message(chat_id=int(telegram_id), text=message, parse_mode="Markdown")
-                    print(f"✅ Telegram sent to {telegram_id}: {message}")
-                except Exception as e:
-                    print(f"❌ Telegram error: {e}")
-            else:
-                print(f"⚠️ No telegram_id found for {tracking_id}")
+                notification_dispatcher.wake()
+            if dept_status == "Resolved" and duplicate_detector:
+                duplicate_detector.remove(report_id)
             
-            cursor.close()
-            conn.close()
             return redirect(url_for("deptdashboard"))
         
         except Exception as e:
-            print(f"Error: {e}")
-            import traceback
-            traceback.print_exc()
+            logging.exception(f"❌ Updating report {tracking_id} failed")
             return f"Error: {str(e)}", 500
     
     # GET request - show the detail page
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute(
-            """SELECT tracking_id, issueType, status, priority, timestamp, 
-               dept_status, dept_remarks, description, location, latitude, longitude, 
-               probability, remarks 
-               FROM reports 
-               WHERE tracking_id = %s AND assigned_dept_admin_id = %s""",
-            (tracking_id, deptadminid)
-        )
-        report = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT tracking_id, issueType, status, priority, timestamp, 
+                   dept_status, dept_remarks, description, location, latitude, longitude, 
+                   probability, remarks 
+                   FROM reports 
+                   WHERE tracking_id = %s AND assigned_dept_admin_id = %s""",
+                (tracking_id, deptadminid)
+            )
+            report = cursor.fetchone()
+            cursor.close()
         
         if not report:
             return "Report not found", 404
@@ -490,9 +1424,7 @@ def deptreportdetail(tracking_id):
         return render_template("dept_report_detail.html", report=report)
     
     except Exception as e:
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logging.exception(f"❌ Loading report {tracking_id} failed")
         return f"Error: {str(e)}", 500
 
         # ================= DEPT ADMIN LOGOUT ================= #
@@ -514,5 +1446,6 @@ def index():
 # ================= MAIN ================= #
 
 if __name__ == "__main__":
-    print("ROUTES:", app.url_map)
+    logging.debug(f"ROUTES: {app.url_map}")
+    models.start()
     app.run(debug=False, port=5000)
\ No newline at end of file
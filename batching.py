@@ -0,0 +1,122 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent requests submit one input each; a background worker collects
+them into a batch, flushes when the batch is full or the oldest item has
+waited `max_wait_ms`, runs a single forward pass and routes each output
+row back to the caller that submitted it.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, name="micro-batcher"):
+        """
+        predict_fn receives a list of inputs and must return a sequence of
+        outputs of the same length, in the same order.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+
+        self.predict_fn = predict_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker_pid = None
+
+        self._stats_lock = threading.Lock()
+        self._histogram = {}
+        self._batches = 0
+        self._items = 0
+
+    # ---------- WORKER ----------
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so a pre-forked worker process
+        # starts its own batching thread on first use.
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            thread.start()
+            self._worker_pid = os.getpid()
+
+    def _run(self):
+        q = self._queue
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch):
+        items = [item for item, _ in batch]
+        futures = [future for _, future in batch]
+
+        try:
+            outputs = self.predict_fn(items)
+            if len(outputs) != len(items):
+                raise RuntimeError(
+                    f"{self.name}: predict_fn returned {len(outputs)} rows for {len(items)} inputs"
+                )
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, output in zip(futures, outputs):
+            future.set_result(output)
+
+        with self._stats_lock:
+            size = len(items)
+            self._histogram[size] = self._histogram.get(size, 0) + 1
+            self._batches += 1
+            self._items += size
+
+    # ---------- PUBLIC API ----------
+
+    def submit(self, item):
+        """Queue one input; returns a Future resolving to its output row."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def predict(self, item, timeout=None):
+        """Blocking helper: submit one input and wait for its output row."""
+        return self.submit(item).result(timeout=timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            histogram = dict(sorted(self._histogram.items()))
+            batches = self._batches
+            items = self._items
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": round(items / batches, 3) if batches else 0.0,
+            "batch_size_histogram": histogram,
+        }
@@ -0,0 +1,108 @@
+"""
+Bounded, thread-safe in-memory LRU cache with optional per-entry TTL.
+
+Used to memoize pure functions on the request path (e.g. text
+classification of repeated complaint descriptions). Keeps hit / miss /
+eviction counters so the hit rate can be observed at /api/metrics.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, max_entries=4096, ttl=None, name="lru-cache"):
+        """
+        max_entries: least recently used entries are evicted beyond this.
+        ttl: seconds an entry stays valid; None or 0 keeps entries until evicted.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl) if ttl else None
+        self.name = name
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, value); order = recency, oldest first
+        self._entries = OrderedDict()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self._misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value, ttl=None):
+        """ttl overrides the cache-wide TTL for this entry; ttl <= 0 does not cache it."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            # Expired on arrival: also drop any older value for the key
+            self.delete(key)
+            return
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Cached value for `key`, calling compute() on a miss. Concurrent misses
+        on the same key may both compute; the last result wins.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def delete(self, key):
+        """Drop `key`; True if it was cached."""
+        with self._lock:
+            return self._entries.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            stats = {
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "size": len(self._entries),
+                "hits": hits,
+                "misses": misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+        stats["hit_rate"] = round(hits / (hits + misses), 4) if hits + misses else 0.0
+        return stats
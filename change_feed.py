@@ -0,0 +1,181 @@
+"""
+In-process fan-out of report status changes, fed by Postgres LISTEN/NOTIFY.
+
+The reports_status_changed trigger (schema.sql) bumps reports.status_version
+and NOTIFYs '<tracking_id>:<version>' on the `report_status` channel when
+status, dept_status, remarks or dept_remarks change. Each worker process
+keeps one listening connection (opened on the first subscription) and a
+map of subscribers per tracking id, so an idle watcher is a parked thread
+waiting on an Event: no query, no polling.
+
+    with change_feed.subscribe(tracking_id) as sub:
+        ...read the current row...
+        sub.wait(timeout)   # True -> something changed, read it again
+
+Subscribe before reading the row, so a change committed in between still
+wakes the subscriber. While the listening connection is down, wait() gives
+up after `fallback_poll_s` and reports True so callers re-check the
+database themselves.
+
+Every waiting subscriber holds a server thread, so with `max_subscribers`
+set, subscribe() raises WatcherLimitReached once the process has that many
+and the remaining threads stay free for other routes.
+"""
+
+import os
+import select
+import threading
+import time
+import logging
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class WatcherLimitReached(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, feed, tracking_id):
+        self.feed = feed
+        self.tracking_id = tracking_id
+        self.version = None  # last version announced by NOTIFY
+        self._event = threading.Event()
+
+    def wait(self, timeout):
+        """Block until a change is announced (True) or `timeout` passes (False)."""
+        connected = self.feed.connected
+        fired = self._event.wait(timeout if connected else min(timeout, self.feed.fallback_poll_s))
+        self._event.clear()
+        return fired or not connected
+
+    def _notify(self, version):
+        self.version = version
+        self._event.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.feed.unsubscribe(self)
+
+
+class ChangeFeed:
+    def __init__(self, channel="report_status", fallback_poll_s=5.0, reconnect_s=2.0, max_subscribers=0,
+                 **connect_kwargs):
+        self.channel = channel
+        self.fallback_poll_s = float(fallback_poll_s)
+        self.reconnect_s = float(reconnect_s)
+        self.max_subscribers = int(max_subscribers)  # per process; 0 = no cap
+        self.connect_kwargs = connect_kwargs
+
+        self.connected = False
+        self._lock = threading.Lock()
+        self._subscribers = {}  # tracking_id -> set of Subscription
+        self._count = 0
+        self._pid = None
+
+        self.stats_counters = {
+            "notifications": 0,
+            "wakeups": 0,
+            "reconnects": 0,
+            "rejected": 0,
+        }
+
+    # ---------- LISTENER ----------
+
+    def ensure_started(self):
+        """Start this process's listener thread (no-op once running)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Subscribers and connection state inherited across fork() are not ours
+            self._subscribers = {}
+            self._count = 0
+            self.connected = False
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="change-feed", daemon=True).start()
+
+    def _run(self):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.connect_kwargs)
+                conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                self.connected = True
+                # Changes made while disconnected were never announced
+                self._wake_all()
+                logging.info(f"👂 Listening for report changes on '{self.channel}'")
+
+                while True:
+                    if select.select([conn], [], [], 30.0)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            self._dispatch(conn.notifies.pop(0).payload)
+            except Exception:
+                logging.exception("❌ Change feed connection lost")
+            finally:
+                self.connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            # Let waiters fall back to polling until the feed is back
+            self._wake_all()
+            self.stats_counters["reconnects"] += 1
+            time.sleep(self.reconnect_s)
+
+    def _dispatch(self, payload):
+        tracking_id, _, version = payload.rpartition(":")
+        self.stats_counters["notifications"] += 1
+        with self._lock:
+            subscribers = list(self._subscribers.get(tracking_id, ()))
+        for sub in subscribers:
+            sub._notify(int(version) if version.isdigit() else None)
+        self.stats_counters["wakeups"] += len(subscribers)
+
+    def _wake_all(self):
+        with self._lock:
+            subscribers = [sub for subs in self._subscribers.values() for sub in subs]
+        for sub in subscribers:
+            sub._event.set()
+
+    # ---------- PUBLIC API ----------
+
+    def subscribe(self, tracking_id):
+        self.ensure_started()
+        sub = Subscription(self, tracking_id)
+        with self._lock:
+            if self.max_subscribers and self._count >= self.max_subscribers:
+                self.stats_counters["rejected"] += 1
+                raise WatcherLimitReached(f"{self._count} watchers already open in this worker")
+            self._subscribers.setdefault(tracking_id, set()).add(sub)
+            self._count += 1
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.tracking_id)
+            if subs is not None and sub in subs:
+                subs.discard(sub)
+                self._count -= 1
+                if not subs:
+                    del self._subscribers[sub.tracking_id]
+
+    def stats(self):
+        with self._lock:
+            watchers = self._count
+            watched_ids = len(self._subscribers)
+        return {
+            "connected": self.connected,
+            "watchers": watchers,
+            "max_watchers": self.max_subscribers,
+            "watched_ids": watched_ids,
+            **self.stats_counters,
+        }
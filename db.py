@@ -0,0 +1,217 @@
+"""
+Thread-safe PostgreSQL connection pool shared by the Flask routes.
+
+Wraps psycopg2's ThreadedConnectionPool with:
+- blocking checkout (bounded by a timeout) instead of failing when all
+  connections are in use,
+- health checks on checkout and return, so broken connections and
+  connections left mid-transaction never go back to other requests,
+- wait-time counters so pool pressure can be observed,
+- optional per-operation timings: with `observe(op, seconds)` set, every
+  checkout ("connect"), execute, fetch and commit is reported to it.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+
+class TimedConnection(extensions.connection):
+    """Connection whose commit() reports to `observe`; set by ConnectionPool on checkout."""
+    observe = None
+
+    def commit(self):
+        if self.observe is None:
+            return super().commit()
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            self.observe("commit", time.perf_counter() - start)
+
+
+class _TimedCursorMixin:
+    def _timed(self, op, method, *args, **kwargs):
+        observe = getattr(self.connection, "observe", None)
+        if observe is None:
+            return method(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            observe(op, time.perf_counter() - start)
+
+    def execute(self, *args, **kwargs):
+        return self._timed("execute", super().execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed("execute", super().executemany, *args, **kwargs)
+
+    def copy_expert(self, *args, **kwargs):
+        return self._timed("execute", super().copy_expert, *args, **kwargs)
+
+    def fetchone(self):
+        return self._timed("fetch", super().fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed("fetch", super().fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed("fetch", super().fetchall)
+
+
+_timed_cursors = {}
+
+
+def timed_cursor(base):
+    """Subclass of cursor class `base` whose execute/fetch calls are timed."""
+    if base not in _timed_cursors:
+        _timed_cursors[base] = type(f"Timed{base.__name__}", (_TimedCursorMixin, base), {})
+    return _timed_cursors[base]
+
+
+class ConnectionPool:
+    def __init__(self, minconn=1, maxconn=10, acquire_timeout=10.0, observe=None, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("expected 0 <= minconn <= maxconn and maxconn >= 1")
+
+        self.minconn = int(minconn)
+        self.maxconn = int(maxconn)
+        self.acquire_timeout = float(acquire_timeout)
+        self.observe = observe
+        if observe is not None:
+            connect_kwargs.setdefault("connection_factory", TimedConnection)
+            connect_kwargs["cursor_factory"] = timed_cursor(connect_kwargs.get("cursor_factory") or extensions.cursor)
+        self.connect_kwargs = connect_kwargs
+
+        self._lock = threading.Lock()
+        self._pool = None
+        self._slots = None
+        self._pid = None
+        # Pools inherited across fork() are kept referenced, never closed:
+        # closing them would terminate the parent's server sessions.
+        self._inherited = []
+
+        self._stats_lock = threading.Lock()
+        self._acquired = 0
+        self._in_use = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._discarded = 0
+
+    def _get_pool(self):
+        if self._pid == os.getpid():
+            return self._pool
+        with self._lock:
+            if self._pid != os.getpid():
+                if self._pool is not None:
+                    self._inherited.append(self._pool)
+                self._pool = pool.ThreadedConnectionPool(
+                    self.minconn, self.maxconn, **self.connect_kwargs
+                )
+                self._slots = threading.BoundedSemaphore(self.maxconn)
+                self._pid = os.getpid()
+        return self._pool
+
+    # ---------- CHECKOUT / RETURN ----------
+
+    def getconn(self):
+        pg_pool = self._get_pool()
+
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._stats_lock:
+                self._timeouts += 1
+            raise pool.PoolError(
+                f"timed out after {self.acquire_timeout:.1f}s waiting for a database connection"
+            )
+        waited = time.perf_counter() - start
+
+        try:
+            conn = pg_pool.getconn()
+            if conn.closed:
+                pg_pool.putconn(conn, close=True)
+                with self._stats_lock:
+                    self._discarded += 1
+                conn = pg_pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._stats_lock:
+            self._acquired += 1
+            self._in_use += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        if self.observe is not None:
+            if isinstance(conn, TimedConnection):
+                conn.observe = self.observe
+            self.observe("connect", time.perf_counter() - start)
+        return conn
+
+    def putconn(self, conn):
+        pg_pool = self._get_pool()
+        discard = bool(conn.closed)
+
+        if not discard:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+        try:
+            pg_pool.putconn(conn, close=discard)
+        finally:
+            self._slots.release()
+            with self._stats_lock:
+                self._in_use -= 1
+                if discard:
+                    self._discarded += 1
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a `with` block.
+
+        Callers commit explicitly; anything left uncommitted (including on
+        error) is rolled back before the connection is returned.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.closeall()
+            self._pool = None
+            self._pid = None
+
+    # ---------- METRICS ----------
+
+    def stats(self):
+        with self._stats_lock:
+            acquired = self._acquired
+            return {
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+                "in_use": self._in_use,
+                "acquired": acquired,
+                "wait_ms_total": round(self._wait_total * 1000.0, 3),
+                "wait_ms_mean": round(self._wait_total * 1000.0 / acquired, 3) if acquired else 0.0,
+                "wait_ms_max": round(self._wait_max * 1000.0, 3),
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+            }
@@ -0,0 +1,264 @@
+"""
+Geo-spatial duplicate-report detection.
+
+GeoGridIndex buckets open reports into a lat/lon grid whose cells are
+`radius_m` tall and (at their latitude) `radius_m` wide, separately per
+issue type. A radius query therefore only visits the 3x3 block of cells
+around the point, whatever the total number of reports.
+
+DuplicateDetector keeps one index per worker process in sync with the
+reports table:
+- seeded from open reports on first use and rebuilt every `rebuild_s`,
+- caught up before each lookup on rows inserted by other workers: rows
+  whose timestamp falls after the previous catch-up minus `overlap_s` are
+  re-read, since ids are not committed in order (a row with a lower id
+  can become visible after a higher one),
+- updated on insert and resolve by this worker.
+
+A candidate from the index is re-checked against the database before
+use, so a report resolved by another worker is never linked to. Lookup
+and insert of one issue type are serialized across workers by a
+transaction-level advisory lock, so two simultaneous reports of the same
+issue cannot both miss each other.
+"""
+
+import math
+import os
+import threading
+import time
+from datetime import timedelta
+
+
+M_PER_DEG_LAT = 111320.0
+
+
+class GeoGridIndex:
+    def __init__(self, radius_m=50.0):
+        if radius_m <= 0:
+            raise ValueError("radius_m must be > 0")
+        self.radius_m = float(radius_m)
+        self.cell_deg = self.radius_m / M_PER_DEG_LAT
+
+        # (issue_type, row, col) -> [(report_id, lat, lon, timestamp, tracking_id)];
+        # lists rather than dicts since most cells hold a single report
+        self._cells = {}
+        self._where = {}  # report_id -> cell key
+
+    # ---------- GRID ----------
+
+    def _row(self, lat):
+        return math.floor(lat / self.cell_deg)
+
+    def _col(self, row, lon):
+        # Cells in a row are radius_m wide at the row's central latitude
+        lat = (row + 0.5) * self.cell_deg
+        width = self.cell_deg / max(math.cos(math.radians(lat)), 1e-6)
+        return math.floor(lon / width)
+
+    def _key(self, issue_type, lat, lon):
+        row = self._row(lat)
+        return issue_type, row, self._col(row, lon)
+
+    def distance_m(self, lat1, lon1, lat2, lon2):
+        # Equirectangular approximation: well under 0.1% error at these radii
+        x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+        y = math.radians(lat2 - lat1)
+        return 6371008.8 * math.hypot(x, y)
+
+    # ---------- PUBLIC API ----------
+
+    def add(self, report_id, issue_type, lat, lon, timestamp, tracking_id=None):
+        self.remove(report_id)
+        key = self._key(issue_type, lat, lon)
+        self._cells.setdefault(key, []).append((report_id, lat, lon, timestamp, tracking_id))
+        self._where[report_id] = key
+
+    def remove(self, report_id):
+        key = self._where.pop(report_id, None)
+        if key is None:
+            return False
+        cell = self._cells[key]
+        cell[:] = [entry for entry in cell if entry[0] != report_id]
+        if not cell:
+            del self._cells[key]
+        return True
+
+    def nearby(self, issue_type, lat, lon, since=None):
+        """
+        [(distance_m, report_id, tracking_id)] of reports of `issue_type`
+        within radius_m of (lat, lon), nearest first. With `since`, entries
+        older than it are skipped and dropped from the index.
+        """
+        # Longitude half-span of the radius at the most poleward latitude touched
+        lat_edge = min(90.0, abs(lat) + self.cell_deg)
+        dlon = self.cell_deg / max(math.cos(math.radians(lat_edge)), 1e-6)
+
+        found, expired = [], []
+        for row in range(self._row(lat - self.cell_deg), self._row(lat + self.cell_deg) + 1):
+            for col in range(self._col(row, lon - dlon), self._col(row, lon + dlon) + 1):
+                cell = self._cells.get((issue_type, row, col))
+                if not cell:
+                    continue
+                for report_id, r_lat, r_lon, r_ts, r_tracking in cell:
+                    if since is not None and r_ts < since:
+                        expired.append(report_id)
+                        continue
+                    distance = self.distance_m(lat, lon, r_lat, r_lon)
+                    if distance <= self.radius_m:
+                        found.append((distance, report_id, r_tracking))
+
+        for report_id in expired:
+            self.remove(report_id)
+        found.sort()
+        return found
+
+    def clear(self):
+        self._cells.clear()
+        self._where.clear()
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, report_id):
+        return report_id in self._where
+
+
+# A report is open (and can absorb duplicates) until resolved; duplicates
+# themselves are never originals.
+OPEN_REPORT_SQL = """
+    duplicate_of IS NULL
+    AND status NOT IN ('Resolved', 'Duplicate')
+    AND dept_status IS DISTINCT FROM 'Resolved'
+"""
+
+
+# First key of the pg_advisory_xact_lock(int, int) pair; the second is hashtext(issueType)
+ADVISORY_LOCK_CLASS = 0x5F1D
+
+
+class DuplicateDetector:
+    def __init__(self, radius_m=50.0, window_s=86400.0, overlap_s=60.0, rebuild_s=600.0):
+        self.index = GeoGridIndex(radius_m)
+        self.window = timedelta(seconds=float(window_s))
+        self.overlap = timedelta(seconds=float(overlap_s))
+        self.rebuild_s = float(rebuild_s)
+
+        # Guards the grid and the fields below only; database reads run outside
+        # it, so lookups of other issue types are not held up by a round-trip
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped on every clear
+        self._pid = None
+        self._synced_at = None  # LOCALTIMESTAMP of the previous catch-up
+        self._rebuilt_at = 0.0
+
+        self._lookups = 0
+        self._duplicates = 0
+        self._lookup_total = 0.0
+
+    def _sync(self, cur):
+        """
+        Seed (first call per process, then every rebuild_s) or catch up with
+        reports inserted elsewhere. Returns (now, generation) of the index the
+        rows went into.
+        """
+        while True:
+            with self._lock:
+                if self._pid != os.getpid() or time.monotonic() - self._rebuilt_at >= self.rebuild_s:
+                    # Rebuilt per process (a forked copy would miss the parent's later
+                    # inserts) and periodically, for rows committed later than overlap_s
+                    self.index.clear()
+                    self._generation += 1
+                    self._synced_at = None
+                    self._pid = os.getpid()
+                    self._rebuilt_at = time.monotonic()
+                generation, synced_at = self._generation, self._synced_at
+
+            now, rows = self._read_since(cur, synced_at)
+
+            with self._lock:
+                if self._generation == generation:
+                    for row in rows:
+                        if row["id"] not in self.index:
+                            self.index.add(
+                                row["id"], row["issuetype"], row["latitude"], row["longitude"],
+                                row["timestamp"], row["tracking_id"],
+                            )
+                    self._synced_at = now if self._synced_at is None else max(self._synced_at, now)
+                    return now, generation
+            # Cleared by another thread meanwhile: these rows belong to the old
+            # index, read again from scratch
+
+    def _read_since(self, cur, synced_at):
+        """(now, open reports of the window not yet seen as of `synced_at`)."""
+        cur.execute("SELECT LOCALTIMESTAMP AS now")
+        now = cur.fetchone()["now"]
+        since = now - self.window
+        if synced_at is not None:
+            since = max(since, synced_at - self.overlap)
+
+        cur.execute(
+            f"""
+            SELECT id, tracking_id, issueType, latitude, longitude, timestamp
+            FROM reports
+            WHERE timestamp >= %s
+              AND latitude IS NOT NULL AND longitude IS NOT NULL
+              AND {OPEN_REPORT_SQL}
+            """,
+            (since,),
+        )
+        return now, cur.fetchall()
+
+    def find_original(self, cur, issue_type, lat, lon):
+        """
+        (id, tracking_id) of the nearest open report of `issue_type` within the
+        radius and time window, or None. `cur` is a RealDictCursor on the
+        transaction that will insert the new report; it holds the issue type's
+        advisory lock from here until that transaction ends, so commit right
+        after the insert.
+        """
+        cur.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", (ADVISORY_LOCK_CLASS, issue_type or ""))
+        candidates = None
+        while candidates is None:
+            now, generation = self._sync(cur)
+            with self._lock:
+                if self._generation != generation:
+                    continue  # cleared since the sync: it has to be redone
+
+                start = time.perf_counter()
+                candidates = self.index.nearby(issue_type, lat, lon, since=now - self.window)
+                self._lookup_total += time.perf_counter() - start
+                self._lookups += 1
+
+        for _, report_id, _ in candidates:
+            cur.execute(
+                f"SELECT id, tracking_id FROM reports WHERE id = %s AND {OPEN_REPORT_SQL}",
+                (report_id,),
+            )
+            row = cur.fetchone()
+            if row:
+                with self._lock:
+                    self._duplicates += 1
+                return row["id"], row["tracking_id"]
+            # Resolved by another worker since it was indexed
+            self.remove(report_id)
+        return None
+
+    def add(self, report_id, issue_type, lat, lon, timestamp, tracking_id=None):
+        with self._lock:
+            self.index.add(report_id, issue_type, lat, lon, timestamp, tracking_id)
+
+    def remove(self, report_id):
+        with self._lock:
+            self.index.remove(report_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "radius_m": self.index.radius_m,
+                "window_s": self.window.total_seconds(),
+                "indexed": len(self.index),
+                "overlap_s": self.overlap.total_seconds(),
+                "lookups": self._lookups,
+                "duplicates": self._duplicates,
+                "mean_lookup_us": round(self._lookup_total / self._lookups * 1e6, 1) if self._lookups else 0.0,
+            }
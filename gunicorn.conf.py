@@ -0,0 +1,98 @@
+"""
+Production gunicorn settings for the Flask app.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+- preload_app: the app is imported once in the master, which then loads the
+  fork-safe models (text) and the TFLite flatbuffer (SNAPFIX_IMAGE_BACKEND=
+  tflite) or imports TensorFlow, and freezes the GC before forking, so
+  workers share that memory copy-on-write. Each worker then only builds its
+  TFLite interpreter; the keras/savedmodel backends load their weights in
+  every worker, since a started TensorFlow runtime cannot cross fork().
+- CPU threads: every worker gets CPU_COUNT // workers inference threads
+  (TF intra-op, TFLite, OpenMP/BLAS) unless set explicitly, so N workers
+  no longer each spin up one thread per core (SNAPFIX_TUNE_THREADS=0 keeps
+  the runtimes' defaults).
+- SNAPFIX_PIN_WORKERS=1 additionally pins each worker to its own slice of
+  the allowed cores.
+- threads: SNAPFIX_THREADS for ordinary requests plus
+  SNAPFIX_WATCH_MAX_PER_WORKER for long-poll/SSE watchers, each of which
+  parks a thread for its whole lifetime. The app refuses watchers beyond
+  that cap with 503, so they can never take the ordinary requests' threads.
+
+Set the worker count with SNAPFIX_WORKERS rather than -w: the thread split
+is computed here, before the app is imported.
+"""
+
+import os
+import gc
+
+
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+bind = os.getenv("SNAPFIX_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("SNAPFIX_WORKERS", str(CPU_COUNT)))
+worker_class = "gthread"
+# The app reads the same variable to cap its watchers
+WATCH_MAX_PER_WORKER = int(os.environ.setdefault("SNAPFIX_WATCH_MAX_PER_WORKER", "32"))
+threads = int(os.getenv("SNAPFIX_THREADS", "4")) + WATCH_MAX_PER_WORKER
+timeout = int(os.getenv("SNAPFIX_WORKER_TIMEOUT_S", "120"))
+preload_app = os.getenv("SNAPFIX_PRELOAD", "1") == "1"
+
+TUNE_THREADS = os.getenv("SNAPFIX_TUNE_THREADS", "1") == "1"
+PIN_WORKERS = os.getenv("SNAPFIX_PIN_WORKERS", "0") == "1"
+CORES_PER_WORKER = max(1, CPU_COUNT // workers)
+
+# Must be in the environment before the app (and NumPy/TensorFlow) is imported
+if TUNE_THREADS:
+    for name in (
+        "SNAPFIX_TF_INTRA_OP_THREADS", "SNAPFIX_TFLITE_NUM_THREADS",
+        "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+    ):
+        os.environ.setdefault(name, str(CORES_PER_WORKER))
+    os.environ.setdefault("SNAPFIX_TF_INTER_OP_THREADS", "1")
+
+# Eager loading would start TensorFlow in the master before fork()
+os.environ.setdefault("SNAPFIX_MODEL_LOADING", "background")
+if preload_app and os.environ["SNAPFIX_MODEL_LOADING"] == "eager":
+    raise RuntimeError("SNAPFIX_MODEL_LOADING=eager cannot be combined with preload_app; use background or lazy")
+
+
+def on_starting(server):
+    if server.cfg.workers != workers:
+        server.log.warning(
+            f"⚠️ {server.cfg.workers} workers set outside SNAPFIX_WORKERS: "
+            f"inference threads were sized for {workers}"
+        )
+    server.log.info(
+        f"🧵 {server.cfg.workers} worker(s) on {CPU_COUNT} core(s), "
+        f"{os.getenv('SNAPFIX_TF_INTRA_OP_THREADS') or 'default'} inference thread(s) each"
+        + (", pinned" if PIN_WORKERS else "")
+    )
+
+
+def when_ready(server):
+    # Runs in the master before the first worker is forked
+    if not server.cfg.preload_app:
+        return
+    import app
+
+    app.prepare_for_fork()
+    # Keep the collector from touching (and so copying) the inherited objects
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # Lowest slot not held by a live worker, so a restarted worker reuses its cores
+    taken = {getattr(w, "snapfix_slot", None) for w in server.WORKERS.values()}
+    worker.snapfix_slot = min(slot for slot in range(len(taken) + 1) if slot not in taken)
+
+
+def post_fork(server, worker):
+    if not PIN_WORKERS or not hasattr(os, "sched_setaffinity"):
+        return
+    allowed = sorted(os.sched_getaffinity(0))
+    start = (worker.snapfix_slot * CORES_PER_WORKER) % len(allowed)
+    cores = allowed[start:start + CORES_PER_WORKER]
+    os.sched_setaffinity(0, cores)
+    server.log.info(f"📌 Worker {worker.pid} pinned to cores {cores}")
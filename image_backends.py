@@ -0,0 +1,198 @@
+"""
+Inference backends for the MobileNet image classifier.
+
+Every backend exposes `predict(batch)` taking a float32 array of shape
+(N, 224, 224, 3) with pixel values in [0, 255] (the trained graph applies
+`preprocess_input` itself) and returning (N, num_classes) probabilities.
+
+- keras      : the float32 Keras model saved by training/train_image_model.py,
+               called directly through a tf.function (not Model.predict)
+- tflite     : the post-training-quantized int8 TFLite export of that model;
+               the interpreter can be built on flatbuffer bytes read earlier
+               (read_tflite_model in a pre-forking master, shared by workers)
+- savedmodel : the serving SavedModel export of the Keras model, without
+               augmentation layers (optionally XLA-compiled); it also has
+               `predict_bytes(images)` taking encoded photos, decoded and
+               resized by TensorFlow ops inside the graph (`accepts_bytes`)
+"""
+
+import threading
+
+import numpy as np
+
+
+class KerasImageModel:
+    name = "keras"
+    accepts_bytes = False
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+
+        self.model = tf.keras.models.load_model(model_path)
+        # Model.predict builds a data adapter and callbacks on every call,
+        # which dominates the cost of a micro-batch of a few images
+        self._forward = tf.function(
+            lambda images: self.model(images, training=False),
+            input_signature=[tf.TensorSpec((None, *self.model.input_shape[1:]), tf.float32)],
+        )
+
+    def predict(self, batch):
+        return self._forward(np.asarray(batch, dtype=np.float32)).numpy()
+
+
+def _tflite_interpreter_class():
+    # The slim tflite-runtime wheel is preferred when installed; the full
+    # TensorFlow package ships the same interpreter as a fallback.
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def read_tflite_model(model_path):
+    """
+    Flatbuffer bytes of a TFLite model, for TFLiteImageModel(model_content=...).
+    Also imports the interpreter module; neither starts a thread, so this is
+    safe before fork().
+    """
+    _tflite_interpreter_class()
+    with open(model_path, "rb") as f:
+        return f.read()
+
+
+def _load_tflite_interpreter(model_path, num_threads, model_content=None):
+    Interpreter = _tflite_interpreter_class()
+    if model_content is not None:
+        # The interpreter reads the weights from this buffer in place (no copy)
+        return Interpreter(model_content=model_content, num_threads=num_threads)
+    return Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+class TFLiteImageModel:
+    name = "tflite"
+    accepts_bytes = False
+
+    def __init__(self, model_path, num_threads=None, model_content=None):
+        self.interpreter = _load_tflite_interpreter(model_path, num_threads, model_content)
+        self.interpreter.allocate_tensors()
+
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+
+        # The interpreter keeps mutable tensor buffers, so only one
+        # invocation may run at a time.
+        self._lock = threading.Lock()
+
+    def _quantize(self, batch):
+        dtype = self._input["dtype"]
+        scale, zero_point = self._input["quantization"]
+        if not scale:
+            return batch.astype(dtype)
+
+        info = np.iinfo(dtype)
+        q = np.round(batch / scale + zero_point)
+        return np.clip(q, info.min, info.max).astype(dtype)
+
+    def _dequantize(self, out):
+        scale, zero_point = self._output["quantization"]
+        if not scale:
+            return out.astype(np.float32)
+        return (out.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input["index"], list(batch.shape))
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = batch.shape[0]
+
+            self.interpreter.set_tensor(self._input["index"], self._quantize(batch))
+            self.interpreter.invoke()
+            out = self.interpreter.get_tensor(self._output["index"])
+
+        return self._dequantize(out)
+
+
+# Batch sizes an XLA-compiled savedmodel is padded to: XLA compiles one
+# program per input shape, so arbitrary micro-batch sizes would keep recompiling
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+
+def _bucket(n, buckets):
+    for size in buckets:
+        if size >= n:
+            return size
+    return buckets[-1]
+
+
+class SavedModelImageModel:
+    name = "savedmodel"
+    accepts_bytes = True
+
+    def __init__(self, model_path, batch_buckets=BATCH_BUCKETS):
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model = tf.saved_model.load(model_path)
+        self._classify_bytes = self.model.signatures["serving_default"]
+        self._classify_pixels = self.model.signatures["classify_pixels"]
+        jit_compile = getattr(self.model, "jit_compile", None)
+        self.jit_compile = bool(jit_compile.numpy()) if jit_compile is not None else False
+        self.batch_buckets = tuple(sorted(batch_buckets))
+
+    def _padded(self, items, run):
+        """
+        run() over `items`; for an XLA model in chunks padded to a bucket
+        size (padding repeats the last item).
+        """
+        if not self.jit_compile:
+            return run(items)
+        outputs = []
+        largest = self.batch_buckets[-1]
+        for start in range(0, len(items), largest):
+            chunk = items[start:start + largest]
+            size = _bucket(len(chunk), self.batch_buckets)
+            outputs.append(run(chunk + chunk[-1:] * (size - len(chunk)))[:len(chunk)])
+        return np.concatenate(outputs)
+
+    def predict(self, batch):
+        def run(images):
+            images = self._tf.constant(np.asarray(images, dtype=np.float32))
+            return self._classify_pixels(images=images)["probabilities"].numpy()
+
+        return self._padded(list(np.asarray(batch, dtype=np.float32)), run)
+
+    def predict_bytes(self, images):
+        """
+        Encoded JPEG/PNG/GIF/BMP photos -> (N, num_classes) probabilities.
+        Raises tf.errors.InvalidArgumentError if any of them cannot be decoded.
+        """
+        def run(chunk):
+            image_bytes = self._tf.constant(chunk, dtype=self._tf.string)
+            return self._classify_bytes(image_bytes=image_bytes)["probabilities"].numpy()
+
+        return self._padded(list(images), run)
+
+    def warmup(self, image_bytes):
+        """Compile every bucket size of both signatures up front instead of on live requests."""
+        for size in self.batch_buckets if self.jit_compile else (1,):
+            self.predict(np.zeros((size, 224, 224, 3), dtype=np.float32))
+            self.predict_bytes([image_bytes] * size)
+
+
+def load_image_model(backend, keras_path, tflite_path, num_threads=None, savedmodel_path=None, tflite_content=None):
+    if backend == "keras":
+        return KerasImageModel(keras_path)
+    if backend == "tflite":
+        return TFLiteImageModel(tflite_path, num_threads=num_threads, model_content=tflite_content)
+    if backend == "savedmodel":
+        return SavedModelImageModel(savedmodel_path)
+    raise ValueError(f"Unknown image backend: {backend!r} (expected 'keras', 'tflite' or 'savedmodel')")
@@ -0,0 +1,283 @@
+"""
+Perceptual-hash cache for image classification.
+
+The same photo of a pothole or garbage heap is often forwarded many times,
+re-encoded or slightly cropped along the way. Each upload is reduced to a
+64-bit difference hash (dHash); if a cached hash lies within
+`max_distance` bits (Hamming distance) the stored probabilities are reused
+and the CNN forward pass is skipped.
+
+Near neighbours are found with a band index: the 64 bits are split into
+max_distance + 1 bands, and by the pigeonhole principle any hash within
+the radius matches a candidate exactly on at least one band.
+
+Entries live in a bounded in-memory LRU. An optional SQLite file persists
+them across restarts and workers; new entries are written by a background
+thread, so a miss never waits on SQLite (or holds the lock lookups take)
+while it commits. Entries are namespaced by model version, so a retrained
+model never serves stale probabilities. The version can be set after
+construction (set_namespace), once the model is actually loaded; until
+then the cache stays empty.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+HASH_BITS = 64
+# Entries waiting for the SQLite writer; beyond this new ones are not persisted
+PERSIST_QUEUE_SIZE = 10000
+
+
+def dhash(image, hash_size=8):
+    """64-bit difference hash of a PIL image (row-wise gradient signs)."""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _to_signed(value):
+    # SQLite INTEGER is signed 64-bit
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def _to_unsigned(value):
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+class PerceptualCache:
+    def __init__(self, max_entries=10000, max_distance=4, namespace="", db_path=None, name="image-cache"):
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        if not 0 <= max_distance < HASH_BITS:
+            raise ValueError(f"max_distance must be in [0, {HASH_BITS})")
+
+        self.max_entries = int(max_entries)
+        self.max_distance = int(max_distance)
+        self.namespace = namespace
+        self.db_path = db_path
+        self.name = name
+
+        # Band boundaries (bit offsets) for the near-neighbour index
+        n_bands = self.max_distance + 1
+        edges = [round(i * HASH_BITS / n_bands) for i in range(n_bands + 1)]
+        self._bands = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(edges, edges[1:])]
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # hash -> probs, oldest first
+        self._index = [dict() for _ in self._bands]  # band value -> set of hashes
+
+        self._db = None
+        self._db_pid = None
+        self._db_lock = threading.Lock()  # the SQLite connection is shared by the writer and loads
+        self._pending = None  # queue of rows for the writer thread of this process
+        self._writer_pid = None
+        self._persist_dropped = 0
+
+        self._hits = 0
+        self._near_hits = 0
+        self._misses = 0
+        self._inference_total = 0.0
+        self._saved_total = 0.0
+
+        if self.db_path and self.namespace is not None:
+            self._load_from_disk()
+
+    # ---------- INDEX ----------
+
+    def _band_keys(self, h):
+        return [(h >> lo) & mask for lo, mask in self._bands]
+
+    def _add(self, h, probs):
+        if h in self._entries:
+            self._entries.move_to_end(h)
+            self._entries[h] = probs
+            return
+        self._entries[h] = probs
+        for index, key in zip(self._index, self._band_keys(h)):
+            index.setdefault(key, set()).add(h)
+        while len(self._entries) > self.max_entries:
+            old, _ = self._entries.popitem(last=False)
+            for index, key in zip(self._index, self._band_keys(old)):
+                bucket = index.get(key)
+                bucket.discard(old)
+                if not bucket:
+                    del index[key]
+
+    def _find(self, h):
+        """(hash, probs) of the closest cached hash within max_distance, or None."""
+        if h in self._entries:
+            return h, self._entries[h]
+        best, best_distance = None, self.max_distance + 1
+        for index, key in zip(self._index, self._band_keys(h)):
+            for candidate in index.get(key, ()):
+                distance = hamming(h, candidate)
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        if best is None:
+            return None
+        return best, self._entries[best]
+
+    # ---------- DISK ----------
+
+    def _connection(self):
+        # sqlite3 connections must not cross fork(); one per worker process
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS image_cache ("
+                " namespace TEXT NOT NULL, hash INTEGER NOT NULL, probs BLOB NOT NULL,"
+                " created_at REAL NOT NULL, PRIMARY KEY (namespace, hash))"
+            )
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _load_from_disk(self):
+        with self._db_lock:
+            rows = self._connection().execute(
+                "SELECT hash, probs FROM image_cache WHERE namespace = ? ORDER BY created_at DESC LIMIT ?",
+                (self.namespace, self.max_entries),
+            ).fetchall()
+        with self._lock:
+            for h, blob in reversed(rows):
+                probs = np.frombuffer(blob, dtype=np.float32)
+                self._add(_to_unsigned(h), probs)
+
+    def _ensure_writer(self):
+        # Queue and thread are per process, like the connection
+        if self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._pending = queue.Queue(maxsize=PERSIST_QUEUE_SIZE)
+            self._writer_pid = os.getpid()
+            threading.Thread(target=self._write_loop, name=f"{self.name}-writer", daemon=True).start()
+
+    def _persist(self, h, probs):
+        self._ensure_writer()
+        row = (self.namespace, _to_signed(h), np.asarray(probs, dtype=np.float32).tobytes(), time.time())
+        try:
+            self._pending.put_nowait(row)
+        except queue.Full:
+            self._persist_dropped += 1
+
+    def _write_loop(self):
+        pending = self._pending
+        while True:
+            rows = [pending.get()]
+            # One transaction for everything queued meanwhile
+            while True:
+                try:
+                    rows.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._db_lock:
+                    db = self._connection()
+                    db.executemany(
+                        "INSERT OR REPLACE INTO image_cache (namespace, hash, probs, created_at) VALUES (?, ?, ?, ?)",
+                        rows,
+                    )
+                    db.commit()
+            except Exception:
+                logging.exception(f"❌ {self.name}: persisting {len(rows)} entries failed")
+            finally:
+                for _ in rows:
+                    pending.task_done()
+
+    def flush(self):
+        """Block until every queued entry has been written to SQLite."""
+        if self._pending is not None and self._writer_pid == os.getpid():
+            self._pending.join()
+
+    # ---------- PUBLIC API ----------
+
+    def set_namespace(self, namespace):
+        """Switch to another model version: drops the entries of the old one and loads the new one's."""
+        with self._lock:
+            if namespace == self.namespace:
+                return
+            self.namespace = namespace
+            self._entries.clear()
+            for index in self._index:
+                index.clear()
+        if self.db_path and namespace is not None:
+            self._load_from_disk()
+
+    def get(self, h):
+        if self.namespace is None:
+            return None
+        with self._lock:
+            found = self._find(h)
+            if found is None:
+                self._misses += 1
+                return None
+            cached_hash, probs = found
+            self._entries.move_to_end(cached_hash)
+            self._hits += 1
+            self._near_hits += cached_hash != h
+            if self._misses:
+                self._saved_total += self._inference_total / self._misses
+            return probs
+
+    def put(self, h, probs, inference_s=None):
+        """Store probabilities for hash `h`; `inference_s` is what computing them cost."""
+        if self.namespace is None:
+            return
+        probs = np.array(probs, dtype=np.float32)
+        probs.setflags(write=False)  # shared between requests
+        with self._lock:
+            self._add(h, probs)
+            if inference_s is not None:
+                self._inference_total += inference_s
+        if self.db_path:
+            self._persist(h, probs)
+
+    def get_or_compute(self, image, compute):
+        """Probabilities for a PIL image: cached by dHash, else compute() and store."""
+        h = dhash(image)
+        probs = self.get(h)
+        if probs is not None:
+            return probs
+
+        start = time.perf_counter()
+        probs = compute()
+        self.put(h, probs, inference_s=time.perf_counter() - start)
+        return probs
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            return {
+                "max_entries": self.max_entries,
+                "max_distance": self.max_distance,
+                "size": len(self._entries),
+                "persistent": bool(self.db_path),
+                "persist_pending": self._pending.qsize() if self._pending is not None else 0,
+                "persist_dropped": self._persist_dropped,
+                "hits": hits,
+                "near_hits": self._near_hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "mean_inference_ms": round(self._inference_total / misses * 1000.0, 3) if misses else 0.0,
+                # Each hit is credited with the mean miss inference time seen so far
+                "inference_saved_ms": round(self._saved_total * 1000.0, 1),
+            }
@@ -0,0 +1,33 @@
+"""
+Decode uploaded photos into model-ready arrays.
+
+JPEGs are decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8 while
+decoding (never below the requested size), so a 12 MP phone photo is
+never fully materialised just to be shrunk to 224x224.
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+
+MODEL_INPUT_SIZE = (224, 224)
+
+
+def open_image(data, size=MODEL_INPUT_SIZE):
+    """Encoded image bytes -> decoded RGB PIL image, at least `size` but not yet resized."""
+    image = Image.open(io.BytesIO(data))
+    # No-op for formats without reduced decoding (PNG, WebP, ...)
+    image.draft("RGB", size)
+    return image.convert("RGB")
+
+
+def load_image(data, size=MODEL_INPUT_SIZE):
+    """Encoded image bytes -> RGB PIL image resized to `size`."""
+    return open_image(data, size).resize(size)
+
+
+def decode_image(data, size=MODEL_INPUT_SIZE):
+    """Encoded image bytes -> float32 (H, W, 3) array with pixels in [0, 255]."""
+    return np.asarray(load_image(data, size), dtype=np.float32)
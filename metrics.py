@@ -0,0 +1,178 @@
+"""
+In-process Prometheus metrics for the Flask workers.
+
+Histograms and counters are kept per worker process and rendered in the
+Prometheus text exposition format (version 0.0.4) by /metrics, so no
+client library or pushgateway is needed:
+
+    classify = registry.histogram("snapfix_classify_stage_seconds", "...", ["stage"])
+    with classify.time(stage="decode"):
+        ...
+
+Collectors registered with add_collector() contribute gauges computed at
+scrape time (pool, cache and batcher stats that already exist as dicts).
+"""
+
+import math
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# Seconds: 100 µs to 10 s, roughly x2.5 apart
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, *extra):
+        return tuple(zip(self.labelnames, key)) + extra
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            lines.extend(self._render_series(series))
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def _render_series(self, series):
+        for key, value in series:
+            yield f"{self.name}_total{_format_labels(self._labels(key))} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # First bucket whose upper bound is >= value (le semantics)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a `with` block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_series(self, series):
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                labels = self._labels(key, ("le", _format_value(float(bound))))
+                yield f"{self.name}_bucket{_format_labels(labels)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self._labels(key))} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self._labels(key))} {count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """collect() -> {metric name: value} of gauges, evaluated on every scrape."""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for name, value in sorted(collect().items()):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def flatten_stats(prefix, stats):
+    """
+    Numeric leaves of a nested stats dict as {metric name: value}:
+    {"db_pool": {"in_use": 2}} -> {"<prefix>_db_pool_in_use": 2}.
+    Strings and None are skipped; booleans become 0/1.
+    """
+    gauges = {}
+    for key, value in (stats or {}).items():
+        name = f"{prefix}_{_metric_name(key)}"
+        if isinstance(value, dict):
+            gauges.update(flatten_stats(name, value))
+        elif isinstance(value, bool):
+            gauges[name] = int(value)
+        elif isinstance(value, (int, float)) and math.isfinite(value):
+            gauges[name] = value
+    return gauges
+
+
+def _metric_name(key):
+    return "".join(ch if ch.isalnum() else "_" for ch in str(key)).lower()
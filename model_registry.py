@@ -0,0 +1,208 @@
+"""
+Deferred model loading for the Flask workers.
+
+Each model is registered with a loader and an optional warm-up callable.
+Loading happens in one of three modes:
+- background : a thread per worker process loads (and warms) every model
+               as soon as the worker starts serving; requests that need a
+               model wait for it up to a timeout,
+- lazy       : each model is loaded by the first request that needs it,
+- eager      : everything is loaded when start() is called (at import).
+
+`ready()` backs the /readyz probe; routes that never touch a model do not
+wait for (or import) anything. A model that failed to load is retried once
+its backoff (retry_s, doubling per consecutive failure up to max_retry_s)
+has passed: by the next get() in lazy mode, in the background when get()
+or ready() is called otherwise.
+
+Under a pre-forking server (gunicorn preload_app), preload() loads the
+models registered as fork_safe in the master, before any worker exists:
+the workers inherit them and share their memory copy-on-write. Models
+whose runtime keeps threads or per-process state (TensorFlow, TFLite) must
+not be fork_safe; each worker loads those itself.
+"""
+
+import os
+import threading
+import time
+import logging
+
+
+class ModelNotReady(Exception):
+    pass
+
+
+class _Entry:
+    def __init__(self, name, loader, warmup, fork_safe):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.fork_safe = fork_safe
+        self.preloaded = False
+        self.model = None
+        self.state = "pending"  # pending -> loading -> ready | failed (-> loading on retry)
+        self.error = None
+        self.failures = 0  # consecutive failed loads
+        self.retry_at = 0.0  # time.monotonic() after which a failed load is retried
+        self.load_s = None
+        self.warmup_s = None
+        self.loaded = threading.Event()
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    MODES = ("background", "lazy", "eager")
+
+    def __init__(self, mode="background", wait_timeout=30.0, retry_s=30.0, max_retry_s=600.0):
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {self.MODES}, got {mode!r}")
+        self.mode = mode
+        self.wait_timeout = float(wait_timeout)
+        self.retry_s = float(retry_s)
+        self.max_retry_s = float(max_retry_s)
+
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def register(self, name, loader, warmup=None, fork_safe=False):
+        """
+        loader() -> model; warmup(model) runs once right after loading.
+        fork_safe: the loaded model keeps working in processes forked after
+        loading (plain Python/NumPy state), so preload() may load it.
+        """
+        self._entries[name] = _Entry(name, loader, warmup, fork_safe)
+
+    # ---------- LOADING ----------
+
+    def _retry_due(self, entry):
+        return entry.state == "failed" and time.monotonic() >= entry.retry_at
+
+    def _load(self, entry):
+        with entry.lock:
+            if entry.state == "ready" or (entry.state == "failed" and not self._retry_due(entry)):
+                return
+            entry.state = "loading"
+            entry.loaded.clear()
+            try:
+                start = time.perf_counter()
+                model = entry.loader()
+                entry.load_s = time.perf_counter() - start
+
+                if entry.warmup:
+                    start = time.perf_counter()
+                    entry.warmup(model)
+                    entry.warmup_s = time.perf_counter() - start
+
+                entry.model = model
+                entry.state = "ready"
+                entry.error = None
+                entry.failures = 0
+                logging.info(
+                    f"✅ Model '{entry.name}' loaded in {entry.load_s:.2f}s"
+                    + (f", warmed up in {entry.warmup_s:.2f}s" if entry.warmup_s is not None else "")
+                )
+            except Exception as e:
+                entry.state = "failed"
+                entry.error = str(e)
+                entry.failures += 1
+                backoff = min(self.retry_s * 2 ** (entry.failures - 1), self.max_retry_s)
+                entry.retry_at = time.monotonic() + backoff
+                logging.exception(f"❌ Loading model '{entry.name}' failed, retrying in {backoff:.0f}s")
+            finally:
+                entry.loaded.set()
+
+    def _retry(self, entry):
+        """Reload a failed model in a background thread once its backoff has passed."""
+        if not self._retry_due(entry):
+            return
+        with self._lock:
+            if not self._retry_due(entry):
+                return
+            # Waiters from here on wait for the new attempt
+            entry.state = "loading"
+            entry.loaded.clear()
+        threading.Thread(target=self._load, args=(entry,), name=f"model-retry-{entry.name}", daemon=True).start()
+
+    def _load_all(self):
+        for entry in self._entries.values():
+            self._load(entry)
+
+    def preload(self):
+        """Load the fork_safe models now, in the process that is about to fork the workers."""
+        for entry in self._entries.values():
+            if entry.fork_safe:
+                self._load(entry)
+                entry.preloaded = entry.state == "ready"
+
+    def start(self):
+        """Begin loading per the mode; call once per worker process (cheap to repeat)."""
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            if self.mode == "eager":
+                self._load_all()
+            elif self.mode == "background":
+                threading.Thread(target=self._load_all, name="model-loader", daemon=True).start()
+
+    # ---------- PUBLIC API ----------
+
+    def get(self, name, timeout=None):
+        """The loaded model; waits up to `timeout` (default wait_timeout) or raises ModelNotReady."""
+        entry = self._entries.get(name)
+        if entry is None:
+            raise ModelNotReady(f"Model '{name}' is not served by this worker")
+        if entry.state == "ready":
+            return entry.model
+
+        if self.mode == "lazy":
+            self._load(entry)
+        else:
+            self.start()
+            self._retry(entry)
+            entry.loaded.wait(self.wait_timeout if timeout is None else timeout)
+
+        if entry.state != "ready":
+            detail = f": {entry.error}" if entry.error else ""
+            raise ModelNotReady(f"Model '{name}' is {entry.state}{detail}")
+        return entry.model
+
+    def require(self, *names):
+        for name in names:
+            self.get(name)
+
+    def loaded(self, name):
+        """The model if already loaded, else None (never waits or loads)."""
+        entry = self._entries.get(name)
+        return entry.model if entry is not None and entry.state == "ready" else None
+
+    def ready(self):
+        if self.mode != "lazy":
+            # A probe polling a failed worker is what brings it back
+            for entry in self._entries.values():
+                self._retry(entry)
+        # Lazy workers are ready to take traffic before anything is loaded
+        if self.mode == "lazy":
+            return all(e.state != "failed" for e in self._entries.values())
+        return all(e.state == "ready" for e in self._entries.values())
+
+    def status(self):
+        return {
+            "mode": self.mode,
+            "ready": self.ready(),
+            "models": {
+                name: {
+                    "state": e.state,
+                    "load_s": round(e.load_s, 3) if e.load_s is not None else None,
+                    "warmup_s": round(e.warmup_s, 3) if e.warmup_s is not None else None,
+                    "error": e.error,
+                    "failures": e.failures,
+                    "retry_in_s": round(max(0.0, e.retry_at - time.monotonic()), 1) if e.state == "failed" else None,
+                    "preloaded": e.preloaded,
+                }
+                for name, e in self._entries.items()
+            },
+        }
@@ -0,0 +1,414 @@
+"""
+Durable, rate-limited Telegram notifications.
+
+Routes write notifications into the `notification_outbox` table in the
+same transaction as the status change they announce. A background
+dispatcher in every worker process drains the outbox:
+
+- claims due rows a chat at a time: the chat's advisory lock is taken for
+  the claim and its rows are marked 'sending' with a lease, so several
+  processes drain the same table without reordering a chat's messages,
+- commits the claim before calling Telegram and records the results in a
+  second short transaction, so no row lock or pooled connection is held
+  across HTTP calls (a claim whose dispatcher died expires after `lease_s`
+  and is sent again),
+- coalesces multiple pending messages for the same tracking id into the
+  newest one,
+- respects Telegram's global and per-chat limits with token buckets shared
+  by all processes through Postgres (PostgresRateLimiter),
+- retries transient failures with exponential backoff (honouring 429
+  retry_after) and gives up after `max_attempts`.
+"""
+
+import os
+import time
+import logging
+import threading
+
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take one token if available; otherwise return seconds until one is."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def is_full(self):
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class LocalRateLimiter:
+    """Token buckets kept in this process; only exact with a single dispatcher."""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def try_acquire(self, key, rate):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) > 10000:
+                self.buckets = {k: b for k, b in self.buckets.items() if not b.is_full()}
+            bucket = self.buckets[key] = TokenBucket(rate)
+        return bucket.try_acquire()
+
+
+class PostgresRateLimiter:
+    """
+    Token buckets shared by every process through the notification_rate_limits
+    table (see notification_rate_acquire in schema.sql). Each acquire is one
+    short autocommitted statement on a pooled connection.
+    """
+
+    def __init__(self, db_pool, prune_s=600.0):
+        self.db_pool = db_pool
+        self.prune_s = prune_s
+        self._pruned = time.monotonic()
+
+    def try_acquire(self, key, rate):
+        """Take one token if available; otherwise return seconds until one is."""
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT notification_rate_acquire(%s, %s, %s) AS wait",
+                (key, float(rate), max(1.0, float(rate))),
+            )
+            wait = cur.fetchone()["wait"]
+            if time.monotonic() - self._pruned >= self.prune_s:
+                # Buckets idle this long are full again; dropping them changes nothing
+                cur.execute("DELETE FROM notification_rate_limits WHERE tat < NOW() - interval '1 hour'")
+                self._pruned = time.monotonic()
+            conn.commit()
+            cur.close()
+        return wait
+
+
+class TelegramError(Exception):
+    def __init__(self, message, retry_after=None, permanent=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.permanent = permanent
+
+
+class TelegramSender:
+    """Minimal synchronous client for the Bot API sendMessage method."""
+
+    def __init__(self, token, api_url="https://api.telegram.org", timeout=10.0):
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, chat_id, text):
+        try:
+            r = self.session.post(
+                self.url,
+                json={"chat_id": int(chat_id), "text": text, "parse_mode": "Markdown"},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise TelegramError(f"network error: {e}") from e
+
+        if r.status_code == 200:
+            return
+
+        try:
+            body = r.json()
+        except ValueError:
+            body = {}
+        description = body.get("description", r.text[:200])
+
+        if r.status_code == 429:
+            retry_after = body.get("parameters", {}).get("retry_after", 1)
+            raise TelegramError(f"rate limited: {description}", retry_after=float(retry_after))
+        if 400 <= r.status_code < 500:
+            # Blocked bot, unknown chat, malformed text: retrying won't help
+            raise TelegramError(f"HTTP {r.status_code}: {description}", permanent=True)
+        raise TelegramError(f"HTTP {r.status_code}: {description}")
+
+
+# Ready to send: pending and due, or claimed by a dispatcher whose lease ran out
+CLAIMABLE_SQL = """(
+    ({t}.status = 'pending' AND {t}.next_attempt_at <= NOW())
+    OR ({t}.status = 'sending' AND {t}.claimed_at <= NOW() - make_interval(secs => %(lease_s)s))
+)"""
+# Holds back the later messages of its chat: deferred, or claimed under a live lease
+BLOCKING_SQL = """(
+    ({t}.status = 'pending' AND {t}.next_attempt_at > NOW())
+    OR ({t}.status = 'sending' AND {t}.claimed_at > NOW() - make_interval(secs => %(lease_s)s))
+)"""
+# First key of the pg_try_advisory_xact_lock(int, int) pair; the second is hashint8(chat_id)
+ADVISORY_LOCK_CLASS = 0x7E1E
+
+
+class NotificationDispatcher:
+    def __init__(
+        self,
+        db_pool,
+        sender,
+        batch_size=50,
+        poll_interval=1.0,
+        global_rate=30.0,
+        per_chat_rate=1.0,
+        max_attempts=5,
+        backoff_base=2.0,
+        backoff_max=300.0,
+        lease_s=300.0,
+        limiter=None,
+    ):
+        self.db_pool = db_pool
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.global_rate = global_rate
+        self.per_chat_rate = per_chat_rate
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_s = lease_s
+
+        if limiter is None:
+            limiter = PostgresRateLimiter(db_pool) if db_pool is not None else LocalRateLimiter()
+        self.limiter = limiter
+
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+        self.stats = {"sent": 0, "superseded": 0, "deferred": 0, "retried": 0, "failed": 0}
+
+    # ---------- LIFECYCLE ----------
+
+    def ensure_started(self):
+        """Start the drain thread once per process (threads do not survive fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._wake = threading.Event()
+            thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def wake(self):
+        """Called after committing new outbox rows to skip the poll delay."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                claimed = self.drain_once()
+            except Exception:
+                logger.exception("Notification dispatcher iteration failed")
+                claimed = 0
+
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    # ---------- RATE LIMITS ----------
+
+    def _backoff(self, attempts):
+        return min(self.backoff_max, self.backoff_base ** attempts)
+
+    # ---------- SENDING ----------
+
+    def send_batch(self, rows):
+        """
+        Send claimed outbox rows (dicts with id, chat_id, message, attempts),
+        oldest first.
+
+        Returns (sent_ids, retries, failed) where retries is a list of
+        (id, delay_seconds, error, counts_as_attempt) and failed a list of
+        (id, error). Once a chat has a deferred or failed row, its later rows
+        are deferred too so per-chat order is preserved.
+        """
+        sent, retries, failed = [], [], []
+        blocked_chats = {}
+
+        for row in rows:
+            chat_id = row["chat_id"]
+
+            if chat_id in blocked_chats:
+                retries.append((row["id"], blocked_chats[chat_id], None, False))
+                continue
+
+            # Global first: sleeping for it after taking the chat's token would
+            # send later than the token allows and crowd the chat's next message
+            wait = self.limiter.try_acquire("global", self.global_rate)
+            while wait > 0:
+                time.sleep(wait)
+                wait = self.limiter.try_acquire("global", self.global_rate)
+
+            wait = self.limiter.try_acquire(f"chat:{chat_id}", self.per_chat_rate)
+            if wait > 0:
+                blocked_chats[chat_id] = wait
+                retries.append((row["id"], wait, None, False))
+                continue
+
+            try:
+                self.sender.send(chat_id, row["message"])
+                sent.append(row["id"])
+            except TelegramError as e:
+                attempts = row.get("attempts", 0) + 1
+                if e.permanent or attempts >= self.max_attempts:
+                    failed.append((row["id"], str(e)))
+                    continue
+                delay = e.retry_after if e.retry_after is not None else self._backoff(attempts)
+                blocked_chats[chat_id] = delay
+                retries.append((row["id"], delay, str(e), True))
+
+        return sent, retries, failed
+
+    def claim(self):
+        """
+        Claim due rows of up to batch_size chats, coalesce them and commit;
+        returns (rows claimed, rows to send oldest first).
+
+        A chat is claimed under its advisory lock, and only rows that no
+        deferred or in-flight row of the same chat precedes, so two
+        dispatchers never hold messages of one chat at the same time.
+        """
+        params = {"lease_s": self.lease_s, "limit": self.batch_size, "lock_class": ADVISORY_LOCK_CLASS}
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            # LIMIT before the lock call, so only the chats returned get locked
+            cur.execute(
+                f"""
+                SELECT chat_id FROM (
+                    SELECT chat_id, MIN(id) AS first_id
+                    FROM notification_outbox o
+                    WHERE {CLAIMABLE_SQL.format(t="o")}
+                    GROUP BY chat_id
+                    ORDER BY first_id
+                    LIMIT %(limit)s
+                ) due
+                WHERE pg_try_advisory_xact_lock(%(lock_class)s, hashint8(chat_id))
+                """,
+                params,
+            )
+            chats = [row["chat_id"] for row in cur.fetchall()]
+            if not chats:
+                conn.rollback()
+                return 0, []
+
+            # New statement, new snapshot: sees claims committed while we locked
+            cur.execute(
+                f"""
+                UPDATE notification_outbox
+                SET status = 'sending', claimed_at = NOW()
+                WHERE id IN (
+                    SELECT id FROM notification_outbox o
+                    WHERE o.chat_id = ANY(%(chats)s)
+                      AND {CLAIMABLE_SQL.format(t="o")}
+                      -- keep per-chat order: wait behind an earlier deferred or in-flight message
+                      AND NOT EXISTS (
+                          SELECT 1 FROM notification_outbox e
+                          WHERE e.chat_id = o.chat_id
+                            AND e.id < o.id
+                            AND {BLOCKING_SQL.format(t="e")}
+                      )
+                    ORDER BY id
+                    LIMIT %(limit)s
+                )
+                RETURNING id, tracking_id, chat_id, message, attempts
+                """,
+                {**params, "chats": chats},
+            )
+            rows = sorted(cur.fetchall(), key=lambda row: row["id"])
+            if not rows:
+                conn.rollback()
+                return 0, []
+
+            # Coalesce: only the newest message per tracking id is worth sending.
+            latest = {}
+            for row in rows:
+                latest[row["tracking_id"]] = row["id"]
+
+            cur.execute(
+                """
+                UPDATE notification_outbox o
+                SET status = 'superseded'
+                FROM unnest(%s::varchar[], %s::bigint[]) AS l(tracking_id, latest_id)
+                WHERE o.tracking_id = l.tracking_id
+                  AND o.id < l.latest_id
+                  AND (o.status = 'pending' OR o.id = ANY(%s))
+                """,
+                (list(latest.keys()), list(latest.values()), [row["id"] for row in rows]),
+            )
+            self.stats["superseded"] += cur.rowcount
+
+            conn.commit()
+            cur.close()
+
+        return len(rows), [row for row in rows if latest[row["tracking_id"]] == row["id"]]
+
+    def record(self, sent, retries, failed):
+        """Store the outcome of send_batch for rows this dispatcher claimed."""
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            if sent:
+                cur.execute(
+                    "UPDATE notification_outbox SET status = 'sent', sent_at = NOW(), "
+                    "attempts = attempts + 1 WHERE id = ANY(%s) AND status = 'sending'",
+                    (sent,),
+                )
+            for row_id, delay, error, counts in retries:
+                cur.execute(
+                    """
+                    UPDATE notification_outbox
+                    SET status = 'pending',
+                        claimed_at = NULL,
+                        next_attempt_at = NOW() + make_interval(secs => %s),
+                        attempts = attempts + %s,
+                        last_error = COALESCE(%s, last_error)
+                    WHERE id = %s AND status = 'sending'
+                    """,
+                    (delay, 1 if counts else 0, error, row_id),
+                )
+            for row_id, error in failed:
+                cur.execute(
+                    "UPDATE notification_outbox SET status = 'failed', attempts = attempts + 1, "
+                    "last_error = %s WHERE id = %s AND status = 'sending'",
+                    (error, row_id),
+                )
+            conn.commit()
+            cur.close()
+
+    def drain_once(self):
+        """Claim, coalesce and send one batch; returns the number of rows claimed."""
+        claimed, rows = self.claim()
+        if not rows:
+            return claimed
+
+        # No transaction or pooled connection is held while Telegram is called
+        sent, retries, failed = self.send_batch(rows)
+        self.record(sent, retries, failed)
+
+        for error in {e for _, _, e, _ in retries if e} | {e for _, e in failed}:
+            logger.warning("Telegram delivery problem: %s", error)
+
+        self.stats["sent"] += len(sent)
+        self.stats["deferred"] += sum(1 for r in retries if not r[3])
+        self.stats["retried"] += sum(1 for r in retries if r[3])
+        self.stats["failed"] += len(failed)
+
+        return claimed
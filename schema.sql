@@ -47,6 +47,251 @@ ALTER TABLE reports
     ADD COLUMN IF NOT EXISTS dept_status VARCHAR(50) DEFAULT 'Not Assigned',
     ADD COLUMN IF NOT EXISTS dept_remarks TEXT;
 
+-- Reports filed near an open report of the same issueType are stored with
+-- status 'Duplicate' and point at the original instead of opening a new work item.
+ALTER TABLE reports
+    ADD COLUMN IF NOT EXISTS duplicate_of INTEGER REFERENCES reports(id);
+
+-- ================= INDEXES ================= --
+-- /admin/reports filters on status and/or primary_department and pages with a
+-- keyset on (timestamp, id); each filter combination gets a matching index so
+-- every page is an index range scan that stops after LIMIT rows.
+
+CREATE INDEX IF NOT EXISTS idx_reports_timestamp_id
+    ON reports (timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_reports_status_timestamp_id
+    ON reports (status, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_reports_dept_timestamp_id
+    ON reports (primary_department, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_reports_status_dept_timestamp_id
+    ON reports (status, primary_department, timestamp DESC, id DESC);
+
+-- ================= TRACKING ID ================= --
+-- Derive tracking_id (SNFX-000042) from the SERIAL id inside the INSERT itself,
+-- so creating a report is a single write. Fires for COPY as well.
+
+CREATE OR REPLACE FUNCTION reports_set_tracking_id() RETURNS trigger AS $$
+BEGIN
+    IF NEW.tracking_id IS NULL THEN
+        NEW.tracking_id := 'SNFX-' || lpad(NEW.id::text, greatest(6, length(NEW.id::text)), '0');
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reports_tracking_id ON reports;
+CREATE TRIGGER reports_tracking_id
+    BEFORE INSERT ON reports
+    FOR EACH ROW EXECUTE FUNCTION reports_set_tracking_id();
+
+-- ================= STATUS CHANGE FEED ================= --
+-- status_version counts the changes citizens can see through /api/track;
+-- it is the cursor of /api/track/watch and /api/track/events. Every change is
+-- announced on the report_status channel as '<tracking_id>:<version>'
+-- (delivered at commit) and fanned out to waiting clients by change_feed.py.
+
+ALTER TABLE reports
+    ADD COLUMN IF NOT EXISTS status_version INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION reports_status_changed() RETURNS trigger AS $$
+BEGIN
+    IF (NEW.status, NEW.dept_status, NEW.remarks, NEW.dept_remarks)
+       IS DISTINCT FROM (OLD.status, OLD.dept_status, OLD.remarks, OLD.dept_remarks) THEN
+        NEW.status_version := OLD.status_version + 1;
+        PERFORM pg_notify('report_status', NEW.tracking_id || ':' || NEW.status_version);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reports_status_changed ON reports;
+CREATE TRIGGER reports_status_changed
+    BEFORE UPDATE ON reports
+    FOR EACH ROW EXECUTE FUNCTION reports_status_changed();
+
+-- ================= DASHBOARD COUNTERS ================= --
+-- Report counts maintained by statement-level triggers, so dashboards and
+-- /api/stats never scan `reports`:
+-- - report_counts       : department x assignee x status x dept_status x
+--                         priority x issueType (NULLs stored as '' / 0),
+-- - report_daily_counts : reports filed per day, department and issueType.
+-- Each INSERT/UPDATE/DELETE statement applies one aggregated delta per group
+-- (COPY and multi-row statements included); groups are upserted in key order
+-- so concurrent writers lock counter rows in the same order.
+-- stats.py checks the counters against `reports` and rebuilds them.
+
+CREATE TABLE IF NOT EXISTS report_counts (
+    primary_department VARCHAR(150) NOT NULL,
+    assigned_dept_admin_id INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    dept_status VARCHAR(50) NOT NULL,
+    priority VARCHAR(10) NOT NULL,
+    issuetype VARCHAR(50) NOT NULL,
+    n BIGINT NOT NULL,
+    PRIMARY KEY (primary_department, assigned_dept_admin_id, status, dept_status, priority, issuetype)
+);
+
+CREATE TABLE IF NOT EXISTS report_daily_counts (
+    day DATE NOT NULL,
+    primary_department VARCHAR(150) NOT NULL,
+    issuetype VARCHAR(50) NOT NULL,
+    n BIGINT NOT NULL,
+    PRIMARY KEY (day, primary_department, issuetype)
+);
+
+CREATE OR REPLACE FUNCTION reports_maintain_counters() RETURNS trigger AS $$
+DECLARE
+    delta TEXT;
+BEGIN
+    -- +1 per new row image, -1 per old one; unchanged groups cancel out
+    delta := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT *, 1 AS d FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT *, -1 AS d FROM old_rows'
+        ELSE 'SELECT *, 1 AS d FROM new_rows UNION ALL SELECT *, -1 AS d FROM old_rows'
+    END;
+
+    EXECUTE format($q$
+        INSERT INTO report_counts AS c
+            (primary_department, assigned_dept_admin_id, status, dept_status, priority, issuetype, n)
+        SELECT COALESCE(primary_department, ''), COALESCE(assigned_dept_admin_id, 0),
+               COALESCE(status, ''), COALESCE(dept_status, ''), COALESCE(priority, ''),
+               COALESCE(issuetype, ''), sum(d)
+        FROM (%s) delta
+        GROUP BY 1, 2, 3, 4, 5, 6
+        HAVING sum(d) <> 0
+        ORDER BY 1, 2, 3, 4, 5, 6
+        ON CONFLICT (primary_department, assigned_dept_admin_id, status, dept_status, priority, issuetype)
+        DO UPDATE SET n = c.n + EXCLUDED.n
+    $q$, delta);
+
+    EXECUTE format($q$
+        INSERT INTO report_daily_counts AS c (day, primary_department, issuetype, n)
+        SELECT timestamp::date, COALESCE(primary_department, ''), COALESCE(issuetype, ''), sum(d)
+        FROM (%s) delta
+        GROUP BY 1, 2, 3
+        HAVING sum(d) <> 0
+        ORDER BY 1, 2, 3
+        ON CONFLICT (day, primary_department, issuetype)
+        DO UPDATE SET n = c.n + EXCLUDED.n
+    $q$, delta);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reports_counters_insert ON reports;
+CREATE TRIGGER reports_counters_insert
+    AFTER INSERT ON reports REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION reports_maintain_counters();
+
+DROP TRIGGER IF EXISTS reports_counters_update ON reports;
+CREATE TRIGGER reports_counters_update
+    AFTER UPDATE ON reports REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION reports_maintain_counters();
+
+DROP TRIGGER IF EXISTS reports_counters_delete ON reports;
+CREATE TRIGGER reports_counters_delete
+    AFTER DELETE ON reports REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION reports_maintain_counters();
+
+-- Recompute both tables from `reports`; writers wait until it commits
+CREATE OR REPLACE FUNCTION rebuild_report_counters() RETURNS void AS $$
+BEGIN
+    LOCK TABLE reports IN SHARE MODE;
+    DELETE FROM report_counts;
+    DELETE FROM report_daily_counts;
+
+    INSERT INTO report_counts
+        (primary_department, assigned_dept_admin_id, status, dept_status, priority, issuetype, n)
+    SELECT COALESCE(primary_department, ''), COALESCE(assigned_dept_admin_id, 0),
+           COALESCE(status, ''), COALESCE(dept_status, ''), COALESCE(priority, ''),
+           COALESCE(issuetype, ''), count(*)
+    FROM reports
+    GROUP BY 1, 2, 3, 4, 5, 6;
+
+    INSERT INTO report_daily_counts (day, primary_department, issuetype, n)
+    SELECT timestamp::date, COALESCE(primary_department, ''), COALESCE(issuetype, ''), count(*)
+    FROM reports
+    GROUP BY 1, 2, 3;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill when the counters are introduced on an existing database
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM report_counts) AND EXISTS (SELECT 1 FROM reports) THEN
+        PERFORM rebuild_report_counters();
+    END IF;
+END;
+$$;
+
+-- ================= NOTIFICATION OUTBOX ================= --
+-- Written in the same transaction as the status change it announces,
+-- drained asynchronously by notifier.NotificationDispatcher.
+-- status: pending | sending | sent | superseded | failed
+-- 'sending' rows are claimed by a dispatcher at claimed_at; the claim is
+-- committed before the Telegram call and expires after the dispatcher's lease.
+
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    tracking_id VARCHAR(30) NOT NULL,
+    chat_id BIGINT NOT NULL,
+    message TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_pending
+    ON notification_outbox (next_attempt_at, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_outbox_pending_tracking
+    ON notification_outbox (tracking_id, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_outbox_pending_chat
+    ON notification_outbox (chat_id, id) WHERE status = 'pending';
+
+ALTER TABLE notification_outbox
+    ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_outbox_sending
+    ON notification_outbox (chat_id, id) WHERE status = 'sending';
+
+-- Telegram limits are per bot, so every dispatcher process draws from the
+-- same buckets: 'global' and 'chat:<chat_id>'. Each row keeps the bucket's
+-- theoretical arrival time (GCRA): a send is allowed while tat - now leaves
+-- room for one more message within the burst.
+CREATE TABLE IF NOT EXISTS notification_rate_limits (
+    key VARCHAR(40) PRIMARY KEY,
+    tat TIMESTAMPTZ NOT NULL
+);
+
+-- Takes one token from `bucket` and returns 0, or returns the seconds until
+-- one is available without taking it.
+CREATE OR REPLACE FUNCTION notification_rate_acquire(bucket TEXT, rate DOUBLE PRECISION, burst DOUBLE PRECISION)
+RETURNS DOUBLE PRECISION AS $$
+DECLARE
+    v_now TIMESTAMPTZ := clock_timestamp();
+    v_tat TIMESTAMPTZ;
+    v_wait DOUBLE PRECISION;
+BEGIN
+    INSERT INTO notification_rate_limits (key, tat) VALUES (bucket, v_now)
+    ON CONFLICT (key) DO NOTHING;
+    SELECT GREATEST(l.tat, v_now) INTO v_tat
+    FROM notification_rate_limits l WHERE l.key = bucket FOR UPDATE;
+
+    v_wait := extract(epoch FROM v_tat - v_now) - (burst - 1) / rate;
+    IF v_wait > 0 THEN
+        RETURN v_wait;
+    END IF;
+    UPDATE notification_rate_limits
+    SET tat = v_tat + make_interval(secs => 1 / rate)
+    WHERE key = bucket;
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+
 -- ================= INSERT DEPT ADMINS ================= --
 
 INSERT INTO dept_admins (department, username, password, email) VALUES
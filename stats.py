@@ -0,0 +1,170 @@
+"""
+Dashboard statistics read from the trigger-maintained counter tables.
+
+report_counts and report_daily_counts (schema.sql) hold one row per group,
+so every function here costs the same whether `reports` has a hundred rows
+or ten million. Empty strings / 0 in the counters stand for NULL columns.
+
+Run as a script to compare the counters with a full GROUP BY over
+`reports` and, with --rebuild, recompute them:
+
+    python stats.py --check
+    python stats.py --rebuild
+"""
+
+import os
+import sys
+import argparse
+from collections import Counter
+from datetime import date, timedelta
+
+
+COUNT_DIMENSIONS = ("primary_department", "assigned_dept_admin_id", "status", "dept_status", "priority", "issuetype")
+
+COUNTS_FROM_REPORTS_SQL = """
+    SELECT COALESCE(primary_department, '') AS primary_department,
+           COALESCE(assigned_dept_admin_id, 0) AS assigned_dept_admin_id,
+           COALESCE(status, '') AS status, COALESCE(dept_status, '') AS dept_status,
+           COALESCE(priority, '') AS priority, COALESCE(issuetype, '') AS issuetype,
+           count(*) AS n
+    FROM reports
+    GROUP BY 1, 2, 3, 4, 5, 6
+"""
+
+DAILY_FROM_REPORTS_SQL = """
+    SELECT timestamp::date AS day, COALESCE(primary_department, '') AS primary_department,
+           COALESCE(issuetype, '') AS issuetype, count(*) AS n
+    FROM reports
+    GROUP BY 1, 2, 3
+"""
+
+
+def _rows(cur):
+    """Rows as tuples whether `cur` is a plain or a dict cursor."""
+    return [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cur.fetchall()]
+
+
+def fetch_stats(cur, department=None, admin_id=None, days=30):
+    """
+    Headline numbers for the dashboards and /api/stats, optionally limited
+    to one primary department and/or one assigned department admin.
+    """
+    sql = f"SELECT {', '.join(COUNT_DIMENSIONS)}, n FROM report_counts WHERE n <> 0"
+    params = []
+    if department:
+        sql += " AND primary_department = %s"
+        params.append(department)
+    if admin_id is not None:
+        sql += " AND assigned_dept_admin_id = %s"
+        params.append(int(admin_id))
+    cur.execute(sql, params)
+
+    totals = {dim: Counter() for dim in ("status", "dept_status", "priority", "issuetype", "primary_department")}
+    total = 0
+    open_assigned = 0
+    for dept, assignee, status, dept_status, priority, issuetype, n in _rows(cur):
+        total += n
+        totals["status"][status or None] += n
+        totals["dept_status"][dept_status or None] += n
+        totals["priority"][priority or None] += n
+        totals["issuetype"][issuetype] += n
+        totals["primary_department"][dept] += n
+        if assignee and dept_status != "Resolved":
+            open_assigned += n
+
+    since = date.today() - timedelta(days=days - 1)
+    sql = "SELECT day, sum(n) FROM report_daily_counts WHERE day >= %s"
+    params = [since]
+    if department:
+        sql += " AND primary_department = %s"
+        params.append(department)
+    cur.execute(sql + " GROUP BY day ORDER BY day", params)
+    daily = {day.isoformat(): int(n) for day, n in _rows(cur) if n}
+
+    return {
+        "total": int(total),
+        "open_assigned": int(open_assigned),
+        "by_status": _plain(totals["status"]),
+        "by_dept_status": _plain(totals["dept_status"]),
+        "by_priority": _plain(totals["priority"]),
+        "by_issue_type": _plain(totals["issuetype"]),
+        "by_department": _plain(totals["primary_department"]),
+        "daily": daily,
+    }
+
+
+def _plain(counter):
+    # JSON keys: NULL groups are reported as "none"
+    return {("none" if key is None else str(key)): int(n) for key, n in counter.most_common() if n}
+
+
+# ---------- CONSISTENCY ----------
+
+def check_counters(cur):
+    """Differences between the counters and `reports` as {table: [(key, counter, actual)]}."""
+    problems = {}
+    for table, columns, actual_sql in (
+        ("report_counts", COUNT_DIMENSIONS, COUNTS_FROM_REPORTS_SQL),
+        ("report_daily_counts", ("day", "primary_department", "issuetype"), DAILY_FROM_REPORTS_SQL),
+    ):
+        cur.execute(f"SELECT {', '.join(columns)}, n FROM {table} WHERE n <> 0")
+        stored = {row[:-1]: row[-1] for row in _rows(cur)}
+        cur.execute(actual_sql)
+        actual = {row[:-1]: row[-1] for row in _rows(cur)}
+
+        diff = [
+            (key, stored.get(key, 0), actual.get(key, 0))
+            for key in sorted(set(stored) | set(actual), key=str)
+            if stored.get(key, 0) != actual.get(key, 0)
+        ]
+        if diff:
+            problems[table] = diff
+    return problems
+
+
+def rebuild_counters(cur):
+    """Recompute both counter tables from `reports` (blocks writers until commit)."""
+    cur.execute("SELECT rebuild_report_counters()")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or rebuild the dashboard counters")
+    parser.add_argument("--check", action="store_true", help="compare counters with reports (default)")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the counters from reports")
+    args = parser.parse_args()
+
+    import psycopg2
+
+    conn = psycopg2.connect(
+        dbname=os.getenv("DB_NAME", "snapfix"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", ""),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", "5432")),
+    )
+    cur = conn.cursor()
+    # One snapshot for both sides of the comparison
+    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+    if args.rebuild:
+        rebuild_counters(cur)
+        conn.commit()
+        print("✅ Counters rebuilt from reports")
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+    problems = check_counters(cur)
+    conn.rollback()
+    conn.close()
+
+    if not problems:
+        print("✅ Counters match reports")
+        return
+    for table, diff in problems.items():
+        print(f"❌ {table}: {len(diff)} group(s) differ")
+        for key, stored, actual in diff[:20]:
+            print(f"   {key}: counter {stored}, reports {actual}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 """
 SnapFix Telegram Bot - Frontend for SnapFix Backend
-Requires: python-telegram-bot>=20, requests, python-dotenv, pillow
+Requires: python-telegram-bot>=20, httpx, python-dotenv, pillow
 
 SnapFix Telegram Bot
 Frontend interface for reporting and tracking civic issues.
@@ -8,8 +8,9 @@ Communicates with SnapFix Flask backend.
 """
 
 import os
+import asyncio
 import logging
-import requests
+import httpx
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -39,6 +40,16 @@ load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:5000")
 
+# Shared backend HTTP client: keep-alive pool, per-call timeouts and a cap
+# on in-flight requests so one slow classification can't starve the rest.
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "20"))
+BACKEND_MAX_CONCURRENCY = int(os.getenv("BACKEND_MAX_CONCURRENCY", "10"))
+CLASSIFY_TIMEOUT = float(os.getenv("BACKEND_CLASSIFY_TIMEOUT", "30"))
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "10"))
+
+# The image model only sees 224x224, so larger photo sizes are wasted bandwidth
+MODEL_INPUT_SIZE = 224
+
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -77,6 +88,44 @@ def clear_user_session(user_id):
     user_sessions.pop(user_id, None)
 
 
+def pick_photo_size(photo_sizes, min_side=MODEL_INPUT_SIZE):
+    """Smallest PhotoSize whose shorter side still covers the model input."""
+    large_enough = [p for p in photo_sizes if min(p.width, p.height) >= min_side]
+    if not large_enough:
+        return max(photo_sizes, key=lambda p: p.width * p.height)
+    return min(large_enough, key=lambda p: p.width * p.height)
+
+
+# ================= BACKEND CLIENT ================= #
+
+
+backend_client = None
+backend_slots = None
+
+
+async def open_backend_client(application: Application):
+    global backend_client, backend_slots
+    backend_client = httpx.AsyncClient(
+        base_url=BACKEND_URL,
+        timeout=httpx.Timeout(BACKEND_TIMEOUT, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=BACKEND_MAX_CONNECTIONS,
+            max_keepalive_connections=BACKEND_MAX_CONNECTIONS,
+        ),
+    )
+    backend_slots = asyncio.Semaphore(BACKEND_MAX_CONCURRENCY)
+
+
+async def close_backend_client(application: Application):
+    if backend_client is not None:
+        await backend_client.aclose()
+
+
+async def backend_request(method, path, timeout=BACKEND_TIMEOUT, **kwargs):
+    async with backend_slots:
+        return await backend_client.request(method, path, timeout=timeout, **kwargs)
+
+
 # ================= START ================= #
 
 
@@ -232,7 +281,7 @@ async def report_photo_handler(update: Update, context: ContextTypes.DEFAULT_TYP
 
         try:
             data = {"description": session.get("description", "")}
-            r = requests.post(f"{BACKEND_URL}/api/classify", data=data)
+            r = await backend_request("POST", "/api/classify", data=data, timeout=CLASSIFY_TIMEOUT)
 
             if r.status_code == 200:
                 res = r.json()
@@ -251,7 +300,7 @@ async def report_photo_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             else:
                 await update.message.reply_text("⚠️ Classification failed.")
         except Exception as e:
-            logging.error(f"Text classify error: {e}")
+            logger.error(f"Text classify error: {e}")
             await update.message.reply_text("⚠️ Error classifying.")
 
         await proceed_to_confirm(update, session)
@@ -262,14 +311,16 @@ async def report_photo_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("❌ Please send a valid photo or type 'skip'.")
         return REPORT_PHOTO
 
-    photo = update.message.photo[-1]
+    photo = pick_photo_size(update.message.photo)
     file = await context.bot.get_file(photo.file_id)
     photo_bytes = await file.download_as_bytearray()
 
     try:
-        files = {'file': ('photo.jpg', photo_bytes, 'image/jpeg')}
+        files = {'file': ('photo.jpg', bytes(photo_bytes), 'image/jpeg')}
         data = {'description': session.get("description", "")}
-        r = requests.post(f"{BACKEND_URL}/api/classify", files=files, data=data)
+        r = await backend_request(
+            "POST", "/api/classify", files=files, data=data, timeout=CLASSIFY_TIMEOUT
+        )
 
         if r.status_code == 200:
             data = r.json()
@@ -290,7 +341,7 @@ async def report_photo_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             await update.message.reply_text("⚠️ Classification failed.")
             session["photo_file_id"] = photo.file_id
     except Exception as e:
-        logging.error(f"Classify error: {e}")
+        logger.error(f"Classify error: {e}")
         await update.message.reply_text("⚠️ Error uploading photo.")
         session["photo_file_id"] = photo.file_id
 
@@ -332,17 +383,27 @@ async def confirm_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "decisionSource": session.get("decision_source"),
             "rawLabel": session.get("raw_label", session["issue_type"]),
         }
-        r = requests.post(f"{BACKEND_URL}/api/report", json=payload)
-        print("REPORT DEBUG:", r.status_code, r.text)
+        try:
+            r = await backend_request("POST", "/api/report", json=payload)
+            logger.debug(f"/api/report -> {r.status_code} {r.text}")
+        except httpx.HTTPError as e:
+            logger.error(f"Report submit error: {e}")
+            r = None
 
-        if r.status_code == 200:
+        if r is not None and r.status_code == 200:
             data = r.json()
             tid = data["tracking_id"]
             keyboard = InlineKeyboardMarkup(
                 [[InlineKeyboardButton("📱 Main Menu", callback_data="back_to_menu")]]
             )
+            text = f"✅ Report submitted!\nTracking ID: `{tid}`"
+            if data.get("duplicate_of"):
+                text += (
+                    f"\n\nℹ️ This issue was already reported nearby as `{data['duplicate_of']}`; "
+                    "your report has been linked to it."
+                )
             await query.edit_message_text(
-                f"✅ Report submitted!\nTracking ID: `{tid}`",
+                text,
                 reply_markup=keyboard,
                 parse_mode=ParseMode.MARKDOWN,
             )
@@ -375,7 +436,12 @@ async def confirm_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def tracking_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tid = update.message.text.strip()
-    r = requests.get(f"{BACKEND_URL}/api/track", params={"id": tid})
+    try:
+        r = await backend_request("GET", "/api/track", params={"id": tid})
+    except httpx.HTTPError as e:
+        logger.error(f"Tracking error: {e}")
+        await update.message.reply_text("⚠️ Tracking service unavailable. Please try again.")
+        return MAIN_MENU
     
     if r.status_code == 200:
         data = r.json()
@@ -403,7 +469,15 @@ async def tracking_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 def main():
-    app = Application.builder().token(TELEGRAM_TOKEN).build()
+    app = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        # Handle updates from different users concurrently instead of one by one
+        .concurrent_updates(True)
+        .post_init(open_backend_client)
+        .post_shutdown(close_backend_client)
+        .build()
+    )
 
     conv = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -0,0 +1,186 @@
+"""
+EXPLAIN-backed benchmark for /admin/reports at 1M rows.
+
+Builds a scratch copy of `reports` in schema `snapfix_bench` filled with
+synthetic rows, then compares for several filter combinations:
+- legacy : the old unbounded `... ORDER BY timestamp DESC` query
+- page 1 : keyset first page (LIMIT page_size + 1)
+- deep   : keyset page starting halfway through the filtered result
+first without and then with the composite indexes declared in schema.sql.
+
+Needs schema.sql applied to the target database. Connection settings come
+from the same DB_* variables as app.py.
+
+    python bench_admin_reports.py --rows 1000000
+"""
+
+import os
+import re
+import json
+import argparse
+
+import psycopg2
+
+
+SCHEMA_SQL = os.path.join(os.path.dirname(__file__), "..", "schema.sql")
+
+COLUMNS = """id, tracking_id, issueType, primary_department, status, priority,
+    timestamp, probability, assigned_dept_admin_id, latitude, longitude,
+    dept_status, dept_remarks"""
+
+DEPARTMENTS = [
+    "Public Works Department (PWD)",
+    "Transport Department (RTO / Traffic Engineering)",
+    "BBMP – Solid Waste Management (SWM)",
+    "BBMP – Ward Maintenance / City Beautification Cell",
+    "Traffic Police (Bengaluru Traffic Police)",
+    "BBMP – Forest / Horticulture Wing",
+    "PWD / BBMP Engineering",
+    "BESCOM (Electricity Supply Company)",
+    "BBMP – Storm Water Drain (SWD) Dept",
+    "BESCOM",
+]
+
+SCENARIOS = [
+    ("all", {}),
+    ("status", {"status": "Pending"}),
+    ("dept", {"primary_department": "BESCOM"}),
+    ("status+dept", {"status": "Resolved", "primary_department": "Traffic Police (Bengaluru Traffic Police)"}),
+]
+
+
+def connect():
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME", "snapfix"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", ""),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", "5432")),
+    )
+
+
+def report_indexes():
+    """(name, column list) of every reports index declared in schema.sql."""
+    with open(SCHEMA_SQL, encoding="utf-8") as f:
+        sql = f.read()
+    return re.findall(r"CREATE INDEX IF NOT EXISTS (idx_reports_\w+)\s+ON reports \(([^)]*)\);", sql)
+
+
+def populate(cur, rows):
+    cur.execute("DROP SCHEMA IF EXISTS snapfix_bench CASCADE")
+    cur.execute("CREATE SCHEMA snapfix_bench")
+    cur.execute("CREATE TABLE snapfix_bench.reports (LIKE public.reports INCLUDING DEFAULTS)")
+    cur.execute("SELECT setseed(0.42)")
+    cur.execute(
+        """
+        INSERT INTO snapfix_bench.reports (
+            id, userId, issueType, location, description, timestamp, priority,
+            status, tracking_id, primary_department, probability, latitude, longitude
+        )
+        SELECT g, 0, 'garbage', '12.97,77.59', 'synthetic',
+               TIMESTAMP '2026-01-01' + (g * INTERVAL '20 seconds'),
+               (ARRAY['High', 'Medium', 'Low'])[1 + g %% 3],
+               CASE WHEN r < 0.6 THEN 'Pending' WHEN r < 0.85 THEN 'In Progress' ELSE 'Resolved' END,
+               'SNFX-' || lpad(g::text, greatest(6, length(g::text)), '0'),
+               (%s::text[])[1 + (g::bigint * 7919) %% %s],
+               round(r::numeric, 2), 12.9 + r / 10, 77.5 + r / 10
+        FROM (SELECT g, random() AS r FROM generate_series(1, %s) g) s
+        """,
+        (DEPARTMENTS, len(DEPARTMENTS), rows),
+    )
+    cur.execute("ANALYZE snapfix_bench.reports")
+
+
+def where_clause(filters):
+    sql = " WHERE 1=1"
+    for column in filters:
+        sql += f" AND {column} = %s"
+    return sql, list(filters.values())
+
+
+def explain(cur, sql, params):
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()[0][0]
+
+    nodes = []
+
+    def walk(node):
+        label = node["Node Type"]
+        if "Index Name" in node:
+            label += f" ({node['Index Name']})"
+        nodes.append(label)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan["Plan"])
+    return plan["Execution Time"], " > ".join(nodes)
+
+
+def run_scenarios(cur, page_size):
+    results = []
+    for name, filters in SCENARIOS:
+        where, params = where_clause(filters)
+        base = f"SELECT {COLUMNS} FROM snapfix_bench.reports{where}"
+
+        cur.execute(f"SELECT count(*) FROM snapfix_bench.reports{where}", params)
+        matches = cur.fetchone()[0]
+        cur.execute(
+            f"SELECT timestamp, id FROM snapfix_bench.reports{where} "
+            f"ORDER BY timestamp DESC, id DESC OFFSET %s LIMIT 1",
+            params + [matches // 2],
+        )
+        middle = cur.fetchone()
+
+        queries = {
+            "legacy": (base + " ORDER BY timestamp DESC", params),
+            "page 1": (base + " ORDER BY timestamp DESC, id DESC LIMIT %s", params + [page_size + 1]),
+            "deep": (
+                base + " AND (timestamp, id) < (%s, %s) ORDER BY timestamp DESC, id DESC LIMIT %s",
+                params + list(middle) + [page_size + 1],
+            ),
+        }
+        for query_name, (sql, query_params) in queries.items():
+            ms, plan = explain(cur, sql, query_params)
+            results.append({"scenario": name, "query": query_name, "matches": matches, "ms": ms, "plan": plan})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=int(os.getenv("SNAPFIX_ADMIN_PAGE_SIZE", "50")))
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the snapfix_bench schema afterwards")
+    args = parser.parse_args()
+
+    conn = connect()
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    print(f"Populating snapfix_bench.reports with {args.rows:,} rows ...")
+    populate(cur, args.rows)
+
+    results = {"without_indexes": run_scenarios(cur, args.page_size)}
+
+    for name, columns in report_indexes():
+        cur.execute(f"CREATE INDEX {name} ON snapfix_bench.reports ({columns})")
+    cur.execute("ANALYZE snapfix_bench.reports")
+    results["with_indexes"] = run_scenarios(cur, args.page_size)
+
+    for label, rows in results.items():
+        print(f"\n== {label.replace('_', ' ')} ==")
+        print(f"{'scenario':12s} {'query':7s} {'matches':>9s} {'ms':>10s}  plan")
+        for r in rows:
+            print(f"{r['scenario']:12s} {r['query']:7s} {r['matches']:9d} {r['ms']:10.2f}  {r['plan']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if not args.keep:
+        cur.execute("DROP SCHEMA snapfix_bench CASCADE")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
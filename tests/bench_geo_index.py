@@ -0,0 +1,118 @@
+"""
+Benchmark: duplicate-report lookup in GeoGridIndex with 1M open reports.
+
+Scatters synthetic open reports (10 issue types, random ages) over a
+Bengaluru-sized bounding box, then times radius + time-window queries and
+checks every answer against a brute-force NumPy scan.
+
+    python bench_geo_index.py --reports 1000000 --queries 10000 --radius 50
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from geo_index import GeoGridIndex
+
+
+ISSUE_TYPES = [
+    "damaged_concrete_structures", "damaged_electric_poles", "damaged_road_sign",
+    "fallen_trees", "garbage", "graffiti", "illegal_parking", "no_electricity",
+    "pothole_road_crack", "water_logging",
+]
+
+# Rough Bengaluru extent
+LAT_RANGE = (12.83, 13.14)
+LON_RANGE = (77.46, 77.78)
+
+
+def peak_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def brute_force(index, lats, lons, types, ages, issue, lat, lon, max_age):
+    mask = (types == issue) & (ages <= max_age)
+    x = np.radians(lons[mask] - lon) * np.cos(np.radians((lats[mask] + lat) / 2))
+    y = np.radians(lats[mask] - lat)
+    dist = 6371008.8 * np.hypot(x, y)
+    return set(np.flatnonzero(mask)[dist <= index.radius_m].tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reports", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    parser.add_argument("--verify", type=int, default=300, help="queries checked against brute force")
+    parser.add_argument("--radius", type=float, default=50.0)
+    parser.add_argument("--window-hours", type=float, default=72.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n = args.reports
+    lats = rng.uniform(*LAT_RANGE, n)
+    lons = rng.uniform(*LON_RANGE, n)
+    types = rng.integers(0, len(ISSUE_TYPES), n)
+    ages = rng.uniform(0, 2 * args.window_hours, n)  # hours; half fall outside the window
+
+    rss_before = peak_rss_mb()
+    index = GeoGridIndex(args.radius)
+    start = time.perf_counter()
+    for i, (lat, lon, t, age) in enumerate(zip(lats.tolist(), lons.tolist(), types.tolist(), ages.tolist())):
+        # Timestamps as "hours before now" negated, so newer = larger
+        index.add(i, ISSUE_TYPES[t], lat, lon, -age)
+    build_s = time.perf_counter() - start
+    print(f"Indexed {n:,} reports in {build_s:.2f}s "
+          f"({n / build_s:,.0f}/s), peak RSS +{peak_rss_mb() - rss_before:.0f} MB")
+
+    # Half the queries land right next to an existing report, half anywhere
+    q_lat = rng.uniform(*LAT_RANGE, args.queries)
+    q_lon = rng.uniform(*LON_RANGE, args.queries)
+    q_type = rng.integers(0, len(ISSUE_TYPES), args.queries)
+    near = rng.random(args.queries) < 0.5
+    picks = rng.integers(0, n, args.queries)
+    q_lat[near] = lats[picks[near]] + rng.normal(0, args.radius / 3 / 111320.0, near.sum())
+    q_lon[near] = lons[picks[near]]
+    q_type[near] = types[picks[near]]
+
+    since = -args.window_hours
+    times, hits = [], 0
+    for lat, lon, t in zip(q_lat.tolist(), q_lon.tolist(), q_type.tolist()):
+        start = time.perf_counter()
+        found = index.nearby(ISSUE_TYPES[t], lat, lon, since=since)
+        times.append(time.perf_counter() - start)
+        hits += bool(found)
+
+    times_us = np.array(times) * 1e6
+    print(f"\n{args.queries:,} lookups (radius {args.radius:g} m, window {args.window_hours:g} h): "
+          f"{hits:,} found a duplicate")
+    print(f"  p50 {np.percentile(times_us, 50):7.1f} us")
+    print(f"  p95 {np.percentile(times_us, 95):7.1f} us")
+    print(f"  p99 {np.percentile(times_us, 99):7.1f} us")
+    print(f"  max {times_us.max():7.1f} us")
+
+    # Correctness and baseline: brute-force scan over all reports. Expired
+    # entries were pruned by the timed queries, so compare against ages too.
+    mismatches, brute_times = 0, []
+    for lat, lon, t in list(zip(q_lat.tolist(), q_lon.tolist(), q_type.tolist()))[: args.verify]:
+        start = time.perf_counter()
+        expected = brute_force(index, lats, lons, types, ages, t, lat, lon, args.window_hours)
+        brute_times.append(time.perf_counter() - start)
+        got = {report_id for _, report_id, _ in index.nearby(ISSUE_TYPES[t], lat, lon, since=since)}
+        mismatches += got != expected
+
+    print(f"\nBrute-force NumPy scan: mean {np.mean(brute_times) * 1e3:.1f} ms per lookup")
+    print(f"Verified {min(args.verify, args.queries)} lookups against brute force: "
+          f"{'OK' if not mismatches else f'{mismatches} MISMATCHES'}")
+
+
+if __name__ == "__main__":
+    main()
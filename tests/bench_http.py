@@ -0,0 +1,380 @@
+"""
+End-to-end HTTP benchmark for the Flask API.
+
+Starts the app locally (gunicorn when installed, else Flask's threaded dev
+server) or targets --base-url, waits for /readyz and then drives each
+scenario with --concurrency closed-loop clients for --duration seconds:
+
+    classify-text   POST /api/classify        description only
+    classify-image  POST /api/classify        JPEG only
+    classify-both   POST /api/classify        JPEG + description
+    report          POST /api/report          random location in Bengaluru
+    track           GET  /api/track           ids created during setup
+    admin-reports   GET  /admin/reports       first page, all filters off
+
+Per scenario it reports throughput (successful requests/sec) and
+p50/p95/p99 latency, and writes everything plus the run settings and the
+server's /api/metrics snapshot to a JSON file. --compare prints the change
+against an earlier result file and exits with status 1 when a p95 latency
+grew by more than --threshold percent.
+
+The report/track scenarios write rows: run against a scratch database
+(e.g. `createdb snapfix_bench && psql -d snapfix_bench -f schema.sql`, then
+DB_NAME=snapfix_bench), never production. Images repeat from a pool of
+--images synthetic JPEGs; start the server with SNAPFIX_IMAGE_CACHE_SIZE=0
+to measure uncached inference.
+
+    python bench_http.py --concurrency 1 8 32 --duration 20 --out run.json
+    python bench_http.py --scenarios classify-text track --compare run.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import importlib.util
+import threading
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+import requests
+from PIL import Image, ImageDraw
+
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DESCRIPTIONS = [
+    "Huge pothole on the main road near the bus stop",
+    "Garbage has not been collected for a week",
+    "Street light pole is bent and wires are hanging",
+    "Tree fell on the footpath after last night's rain",
+    "Water logging under the railway bridge",
+    "No electricity in our area since morning",
+    "Cars parked on the footpath blocking pedestrians",
+    "Graffiti sprayed all over the compound wall",
+    "Road sign knocked down at the junction",
+    "Cracks in the flyover pillar",
+]
+
+ISSUE_TYPES = [
+    "pothole_road_crack", "garbage", "damaged_electric_poles", "fallen_trees",
+    "water_logging", "no_electricity", "illegal_parking", "graffiti",
+    "damaged_road_sign", "damaged_concrete_structures",
+]
+
+SCENARIOS = ["classify-text", "classify-image", "classify-both", "report", "track", "admin-reports"]
+
+
+# ---------- PAYLOADS ----------
+
+def make_images(count, seed):
+    """Distinct synthetic JPEGs (random shapes on a random background)."""
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        img = Image.new("RGB", (640, 480), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(12):
+            x, y = rng.randrange(600), rng.randrange(440)
+            box = [x, y, x + rng.randrange(20, 200), y + rng.randrange(20, 200)]
+            color = tuple(rng.randrange(256) for _ in range(3))
+            (draw.ellipse if rng.random() < 0.5 else draw.rectangle)(box, fill=color)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=85)
+        images.append(buf.getvalue())
+    return images
+
+
+def report_payload(rng):
+    lat = 12.85 + rng.random() * 0.25
+    lon = 77.45 + rng.random() * 0.30
+    issue_type = rng.choice(ISSUE_TYPES)
+    return {
+        "issueType": issue_type,
+        "location": f"{lat:.6f},{lon:.6f}",
+        "description": rng.choice(DESCRIPTIONS),
+        "priority": "Medium",
+        "probability": round(rng.random(), 4),
+        "decisionSource": "bench",
+        "rawLabel": issue_type,
+    }
+
+
+class Scenario:
+    def __init__(self, name, base_url, images, tracking_ids):
+        self.name = name
+        self.base_url = base_url
+        self.images = images
+        self.tracking_ids = tracking_ids
+
+    def request(self, session, rng):
+        """Send one request; returns the response."""
+        url = self.base_url
+        if self.name.startswith("classify-"):
+            data = {}
+            files = None
+            if self.name != "classify-image":
+                data["description"] = rng.choice(DESCRIPTIONS)
+            if self.name != "classify-text":
+                files = {"file": ("photo.jpg", rng.choice(self.images), "image/jpeg")}
+            return session.post(f"{url}/api/classify", data=data, files=files)
+        if self.name == "report":
+            return session.post(f"{url}/api/report", json=report_payload(rng))
+        if self.name == "track":
+            return session.get(f"{url}/api/track", params={"id": rng.choice(self.tracking_ids)})
+        if self.name == "admin-reports":
+            return session.get(f"{url}/admin/reports")
+        raise ValueError(self.name)
+
+
+# ---------- LOAD ----------
+
+def run_load(scenario, concurrency, duration, warmup, seed):
+    """Closed loop: `concurrency` clients, each firing its next request as soon as the last returns."""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [dict() for _ in range(concurrency)]
+    warm_until = time.perf_counter() + warmup
+    stop_at = warm_until + duration
+
+    def client(i):
+        rng = random.Random(seed * 1000 + i)
+        session = requests.Session()
+        while True:
+            start = time.perf_counter()
+            if start >= stop_at:
+                break
+            try:
+                r = scenario.request(session, rng)
+                status = r.status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            end = time.perf_counter()
+            if start < warm_until:
+                continue
+            if status == 200:
+                latencies[i].append(end - start)
+            else:
+                errors[i][str(status)] = errors[i].get(str(status), 0) + 1
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    lat = np.array([x for per_client in latencies for x in per_client]) * 1000.0
+    error_counts = {}
+    for per_client in errors:
+        for status, n in per_client.items():
+            error_counts[status] = error_counts.get(status, 0) + n
+
+    result = {
+        "concurrency": concurrency,
+        "requests": int(len(lat)),
+        "errors": error_counts,
+        "throughput_rps": round(len(lat) / duration, 2),
+    }
+    if len(lat):
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        result.update({
+            "mean_ms": round(float(lat.mean()), 2),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(lat.max()), 2),
+        })
+    return result
+
+
+# ---------- SERVER ----------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args):
+    port = free_port()
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3")
+    if args.server == "gunicorn":
+        cmd = [
+            sys.executable, "-m", "gunicorn", "app:app",
+            "-b", f"127.0.0.1:{port}", "-w", str(args.workers), "--threads", str(args.threads),
+            "--timeout", "120",
+        ]
+    else:
+        cmd = [
+            sys.executable, "-c",
+            "import app; app.models.start(); "
+            f"app.app.run(host='127.0.0.1', port={port}, threaded=True)",
+        ]
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    proc = subprocess.Popen(cmd, cwd=args.app_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def wait_ready(base_url, timeout, proc=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise SystemExit(f"server exited with status {proc.returncode} (see --server-log)")
+        try:
+            if requests.get(f"{base_url}/readyz", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"{base_url} not ready after {timeout:.0f}s")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------- REPORTING ----------
+
+def print_results(results):
+    print(f"\n{'scenario':16s} {'conc':>5s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'errors':>7s}")
+    for name, runs in results.items():
+        for r in runs:
+            print(
+                f"{name:16s} {r['concurrency']:5d} {r['throughput_rps']:9.1f} "
+                f"{r.get('p50_ms', float('nan')):9.1f} {r.get('p95_ms', float('nan')):9.1f} "
+                f"{r.get('p99_ms', float('nan')):9.1f} {sum(r['errors'].values()):7d}"
+            )
+
+
+def compare(results, baseline_path, threshold):
+    """Print deltas against an earlier run; True when any p95 regressed past `threshold` %."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    regressed = False
+    print(f"\nvs {baseline_path}")
+    print(f"{'scenario':16s} {'conc':>5s} {'req/s':>10s} {'p50':>10s} {'p95':>10s} {'p99':>10s}")
+    for name, runs in results.items():
+        before = {r["concurrency"]: r for r in baseline.get(name, [])}
+        for r in runs:
+            old = before.get(r["concurrency"])
+            if not old or "p95_ms" not in old or "p95_ms" not in r:
+                continue
+
+            def pct(key):
+                return (r[key] - old[key]) / old[key] * 100.0 if old[key] else 0.0
+
+            flag = ""
+            if pct("p95_ms") > threshold:
+                regressed = True
+                flag = "  <-- p95 regression"
+            print(
+                f"{name:16s} {r['concurrency']:5d} {pct('throughput_rps'):+9.1f}% "
+                f"{pct('p50_ms'):+9.1f}% {pct('p95_ms'):+9.1f}% {pct('p99_ms'):+9.1f}%{flag}"
+            )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--app-dir", default=APP_DIR)
+    parser.add_argument("--server", choices=["gunicorn", "flask"],
+                        default="gunicorn" if importlib.util.find_spec("gunicorn") else "flask")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--server-log", help="file for the server's stdout/stderr")
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=15, help="measured seconds per scenario and level")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before each run")
+    parser.add_argument("--images", type=int, default=200, help="distinct JPEGs in the upload pool")
+    parser.add_argument("--seed-reports", type=int, default=500, help="reports created for the track scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=f"bench_http_{datetime.now():%Y%m%d_%H%M%S}.json")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="p95 regression (%%) that fails --compare")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    proc = None
+    if args.base_url:
+        base_url = args.base_url.rstrip("/")
+    else:
+        proc, base_url = start_server(args)
+    try:
+        start = time.perf_counter()
+        wait_ready(base_url, args.ready_timeout, proc)
+        print(f"Server ready at {base_url} after {time.perf_counter() - start:.1f}s")
+
+        rng = random.Random(args.seed)
+        images = make_images(args.images, args.seed)
+        tracking_ids = []
+        if "track" in args.scenarios:
+            with requests.Session() as session:
+                for _ in range(args.seed_reports):
+                    r = session.post(f"{base_url}/api/report", json=report_payload(rng))
+                    r.raise_for_status()
+                    tracking_ids.append(r.json()["tracking_id"])
+
+        results = {}
+        for name in args.scenarios:
+            scenario = Scenario(name, base_url, images, tracking_ids)
+            results[name] = []
+            for level in args.concurrency:
+                results[name].append(run_load(scenario, level, args.duration, args.warmup, args.seed))
+                r = results[name][-1]
+                print(f"  {name:16s} c={level:<3d} {r['throughput_rps']:8.1f} req/s  p95 {r.get('p95_ms', float('nan')):.1f} ms")
+
+        try:
+            server_metrics = requests.get(f"{base_url}/api/metrics", timeout=5).json()
+        except (requests.RequestException, ValueError):
+            server_metrics = None
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print_results(results)
+
+    output = {
+        "meta": {
+            "started_at": started_at,
+            "git_commit": git_commit(),
+            "base_url": args.base_url,
+            "server": None if args.base_url else args.server,
+            "workers": args.workers if not args.base_url and args.server == "gunicorn" else None,
+            "threads": args.threads if not args.base_url and args.server == "gunicorn" else None,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "images": args.images,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "env": {k: v for k, v in os.environ.items() if k.startswith("SNAPFIX_") or k in ("DB_NAME", "DB_HOST")},
+        },
+        "results": results,
+        "server_metrics": server_metrics,
+    }
+    with open(args.out, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: full JPEG decode vs draft-mode decode for /api/classify.
+
+Each mode runs in its own subprocess so peak RSS is comparable. Uses the
+photos in --images if given, otherwise synthesises 12 MP (4032x3024)
+phone-sized JPEGs. Also prints the JPEG sizes Telegram would hand the bot
+at its usual PhotoSize widths, i.e. the bandwidth saved by downloading the
+smallest size that still covers the 224px model input.
+
+    python bench_image_decode.py --images ../data/images/test/garbage
+"""
+
+import io
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from image_preprocess import decode_image, MODEL_INPUT_SIZE
+
+
+def synthetic_photo(width=4032, height=3024, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    noise = rng.integers(0, 40, size=(height, width, 3))
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8)).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def load_photos(directory, count):
+    paths = sorted(glob.glob(os.path.join(directory, "*.jp*g")))[:count]
+    return [open(p, "rb").read() for p in paths]
+
+
+def peak_rss_mb():
+    # VmHWM resets on exec, unlike ru_maxrss which inherits the parent's peak
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def full_decode(data):
+    image = Image.open(io.BytesIO(data)).convert("RGB").resize(MODEL_INPUT_SIZE)
+    return np.asarray(image, dtype=np.float32)
+
+
+def run_mode(mode, args):
+    photos = load_photos(args.images, args.count)
+    fn = decode_image if mode == "draft" else full_decode
+
+    rss_before = peak_rss_mb()
+    fn(photos[0])  # warm-up
+    times = []
+    for data in photos * args.repeat:
+        start = time.perf_counter()
+        fn(data)
+        times.append(time.perf_counter() - start)
+
+    return {
+        "mode": mode,
+        "images": len(photos),
+        "mean_bytes": float(np.mean([len(p) for p in photos])),
+        "mean_ms": float(np.mean(times) * 1000.0),
+        "p95_ms": float(np.percentile(times, 95) * 1000.0),
+        "peak_rss_growth_mb": peak_rss_mb() - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", help="directory of real JPEG photos")
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=4)
+    parser.add_argument("--mode", choices=["full", "draft"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args)))
+        return
+
+    if not args.images:
+        # Synthesised up front so generating them doesn't inflate the children's RSS
+        args.images = tempfile.mkdtemp(prefix="snapfix-photos-")
+        for i in range(args.count):
+            with open(os.path.join(args.images, f"photo_{i}.jpg"), "wb") as f:
+                f.write(synthetic_photo(seed=i))
+
+    results = {}
+    for mode in ("full", "draft"):
+        cmd = [sys.executable, __file__, "--mode", mode, "--count", str(args.count),
+               "--repeat", str(args.repeat), "--images", args.images]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    full, draft = results["full"], results["draft"]
+    print(f"\nDecode to {MODEL_INPUT_SIZE[0]}x{MODEL_INPUT_SIZE[1]} ({full['images']} photos, "
+          f"mean {full['mean_bytes'] / 1e6:.2f} MB each)\n")
+    print(f"{'metric':22s} {'full':>10s} {'draft':>10s}")
+    for key in ("mean_ms", "p95_ms", "peak_rss_growth_mb"):
+        print(f"{key:22s} {full[key]:10.2f} {draft[key]:10.2f}")
+    print(f"\nDecode speed-up: {full['mean_ms'] / draft['mean_ms']:.1f}x")
+
+    # Bandwidth: same photo at Telegram's typical PhotoSize widths
+    photo = Image.open(io.BytesIO(load_photos(args.images, 1)[0])).convert("RGB")
+    print("\nJPEG bytes per Telegram PhotoSize (bot now picks the smallest with short side >= 224):")
+    for width in (90, 320, 800, 1280):
+        scaled = photo.resize((width, round(photo.height * width / photo.width)))
+        buf = io.BytesIO()
+        scaled.save(buf, format="JPEG", quality=87)
+        print(f"  {scaled.width:5d}x{scaled.height:<5d} {len(buf.getvalue()) / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: image model forward pass, single image and batches of N.
+
+Paths compared on the same trained Keras model:
+- predict    : Model.predict on the saved model (augmentation layers
+               included, per-call data adapter/callbacks),
+- keras      : KerasImageModel.predict (the saved model called directly),
+- call       : the augmentation-stripped inference graph
+               (train_image_model.build_inference_model) called directly
+               through a tf.function,
+- xla        : the same, jit_compile=True, batches padded to a bucket size,
+- savedmodel : the exported serving SavedModel (SavedModelImageModel.predict),
+               if --serving exists (XLA or not, as exported).
+Also checks that every path returns the probabilities of `predict`.
+
+    python bench_image_inference.py --batch 1 8 32 --repeat 50 --paths keras savedmodel
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "training"))
+
+KERAS_PATH = os.path.join(ROOT, "model_output", "image_model_mobilenet.keras")
+SERVING_PATH = os.path.join(ROOT, "model_output", "image_model_serving")
+
+
+def build_paths(args):
+    import tensorflow as tf
+    from image_backends import KerasImageModel, SavedModelImageModel, BATCH_BUCKETS, _bucket
+    from train_image_model import build_inference_model
+
+    keras_backend = KerasImageModel(args.keras)
+    inference = build_inference_model(keras_backend.model)
+    call = tf.function(lambda images: inference(images, training=False))
+    xla = tf.function(lambda images: inference(images, training=False), jit_compile=True)
+
+    def run_xla(batch):
+        size = _bucket(len(batch), BATCH_BUCKETS)
+        padded = np.concatenate([batch, np.repeat(batch[-1:], size - len(batch), axis=0)])
+        return xla(tf.constant(padded)).numpy()[:len(batch)]
+
+    paths = {
+        "predict": lambda batch: keras_backend.model.predict(batch, verbose=0),
+        "keras": keras_backend.predict,
+        "call": lambda batch: call(tf.constant(batch)).numpy(),
+        "xla": run_xla,
+    }
+    if os.path.isdir(args.serving):
+        paths["savedmodel"] = SavedModelImageModel(args.serving).predict
+    return {name: fn for name, fn in paths.items() if name == "predict" or name in args.paths}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keras", default=KERAS_PATH)
+    parser.add_argument("--serving", default=SERVING_PATH)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--paths", nargs="+", default=["keras", "call", "xla", "savedmodel"],
+                        help="paths to time besides predict")
+    args = parser.parse_args()
+
+    paths = build_paths(args)
+    rng = np.random.default_rng(0)
+
+    print(f"\n{'path':12s} {'batch':>5s} {'p50 ms':>9s} {'p95 ms':>9s} {'ms/img':>8s} {'compile s':>10s} {'max|diff|':>10s}")
+    for n in args.batch:
+        batch = rng.uniform(0, 255, size=(n, 224, 224, 3)).astype(np.float32)
+        reference = paths["predict"](batch)
+        for name, fn in paths.items():
+            # First call traces and (for XLA) compiles this batch size
+            start = time.perf_counter()
+            out = fn(batch)
+            first_s = time.perf_counter() - start
+            for _ in range(args.warmup):
+                fn(batch)
+
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                fn(batch)
+                times.append((time.perf_counter() - start) * 1000.0)
+            p50, p95 = np.percentile(times, [50, 95])
+            diff = float(np.abs(out - reference).max())
+            print(f"{name:12s} {n:5d} {p50:9.2f} {p95:9.2f} {p50 / n:8.2f} {first_s:10.2f} {diff:10.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: image training input pipeline throughput (images/sec), no model.
+
+Pipelines compared over --epochs epochs of shuffled batches:
+- directory : image_dataset_from_directory + prefetch (JPEGs decoded and
+              resized every epoch, the old training input),
+- records   : training/image_records.load_dataset on the TFRecord shards,
+              cache off (raw pixels parsed every epoch),
+- cached    : the same with cache() on; epoch 1 parses and fills the cache,
+              later epochs read memory.
+Writing the records is timed too (one-time cost). Also checks that the
+records pipeline yields the directory pipeline's labels and pixels (within
+the 0.5 rounding of uint8 storage).
+
+Without --data, synthetic phone-sized JPEGs in --classes folders are
+written to a temporary directory:
+
+    python bench_image_pipeline.py --count 400 --epochs 3
+    python bench_image_pipeline.py --data ../training/data/images/train
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "training")))
+
+import tensorflow as tf
+
+from image_records import IMG_SIZE, write_records, load_dataset, load_meta
+
+
+def synthetic_dataset(directory, classes, count, width, height):
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    for i in range(count):
+        class_dir = os.path.join(directory, f"class_{i % classes}")
+        os.makedirs(class_dir, exist_ok=True)
+        base = np.stack([x * 255 // width, y * 255 // height, np.full_like(x, 40 * (i % classes))], -1)
+        noise = rng.integers(0, 60, size=(height, width, 3))
+        Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8)).save(
+            os.path.join(class_dir, f"photo_{i}.jpg"), quality=90
+        )
+
+
+def time_epochs(ds, epochs):
+    """Images/sec of each epoch."""
+    rates = []
+    for _ in range(epochs):
+        n = 0
+        start = time.perf_counter()
+        for images, _ in ds:
+            n += int(images.shape[0])
+        rates.append(n / (time.perf_counter() - start))
+    return rates
+
+
+def check_parity(data_dir, records_dir):
+    ds = tf.keras.utils.image_dataset_from_directory(
+        data_dir, image_size=(IMG_SIZE, IMG_SIZE), batch_size=64, shuffle=False
+    )
+    dir_images = np.concatenate([x.numpy() for x, _ in ds])
+    dir_labels = np.concatenate([y.numpy() for _, y in ds])
+    # Records are stored shuffled; dataset.json lists their source files in order
+    index = {os.path.relpath(path, data_dir): i for i, path in enumerate(ds.file_paths)}
+    order = [index[name] for name in load_meta(records_dir)["files"]]
+    rec_ds, _ = load_dataset(records_dir, batch_size=64, cache=False)
+    rec_images = np.concatenate([x.numpy() for x, _ in rec_ds])
+    rec_labels = np.concatenate([y.numpy() for _, y in rec_ds])
+
+    same_labels = np.array_equal(dir_labels[order], rec_labels)
+    diff = float(np.abs(dir_images[order] - rec_images).max())
+    print(f"\nParity: labels {'match' if same_labels else 'DIFFER'}, max pixel |diff| {diff:.3f}")
+    return same_labels and diff <= 0.5 + 1e-3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", help="class-folder directory (default: synthetic JPEGs)")
+    parser.add_argument("--records", help="where to write the records (default: temporary)")
+    parser.add_argument("--classes", type=int, default=4)
+    parser.add_argument("--count", type=int, default=400, help="synthetic photos")
+    parser.add_argument("--size", type=int, nargs=2, default=[1600, 1200], help="synthetic photo width height")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--shard-size", type=int, default=128)
+    parser.add_argument("--skip-parity", action="store_true")
+    args = parser.parse_args()
+
+    if not args.data:
+        args.data = tempfile.mkdtemp(prefix="snapfix-images-")
+        synthetic_dataset(args.data, args.classes, args.count, *args.size)
+    records = args.records or tempfile.mkdtemp(prefix="snapfix-records-")
+
+    start = time.perf_counter()
+    meta = write_records(args.data, records, shard_size=args.shard_size)
+    write_s = time.perf_counter() - start
+
+    directory_ds = tf.keras.utils.image_dataset_from_directory(
+        args.data, image_size=(IMG_SIZE, IMG_SIZE), batch_size=args.batch, shuffle=True, seed=42
+    ).prefetch(tf.data.AUTOTUNE)
+    pipelines = {
+        "directory": directory_ds,
+        "records": load_dataset(records, args.batch, shuffle=True, cache=False)[0],
+        "cached": load_dataset(records, args.batch, shuffle=True, cache=True)[0],
+    }
+
+    print(f"\n{meta['count']} images, {len(meta['shards'])} shard(s), records written in {write_s:.1f}s "
+          f"({meta['count'] / write_s:.0f} images/s)\n")
+    print(f"{'pipeline':10s} " + " ".join(f"{'epoch ' + str(i + 1):>10s}" for i in range(args.epochs)) + "  (images/s)")
+    for name, ds in pipelines.items():
+        rates = time_epochs(ds, args.epochs)
+        print(f"{name:10s} " + " ".join(f"{r:10.0f}" for r in rates))
+
+    ok = True
+    if not args.skip_parity:
+        ok = check_parity(args.data, records)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
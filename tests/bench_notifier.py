@@ -0,0 +1,199 @@
+"""
+Throughput / ordering check for the Telegram notification dispatcher.
+
+Starts a local fake Telegram Bot API server, writes synthetic rows into the
+real `notification_outbox` table (DB_* settings as in app.py; use a test
+database, the table is drained and bench rows are deleted afterwards) and
+drains them with --dispatchers NotificationDispatcher instances running
+concurrently, each standing in for one gunicorn worker. Reports:
+- delivered messages/sec and the most messages in any 1 s window, against
+  the configured global rate,
+- the smallest gap between two messages to the same chat,
+- whether every chat received its messages in order.
+
+--limiter local gives every dispatcher its own in-process token buckets
+(N dispatchers send up to N times the limit); shared uses the buckets in
+Postgres.
+
+    python bench_notifier.py --messages 300 --chats 50 --dispatchers 4 --fail-rate 0.05
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from psycopg2.extras import RealDictCursor
+
+from db import ConnectionPool
+from notifier import NotificationDispatcher, TelegramSender, LocalRateLimiter, PostgresRateLimiter
+
+
+DB_SETTINGS = dict(
+    dbname=os.getenv("DB_NAME", "snapfix"),
+    user=os.getenv("DB_USER", "postgres"),
+    password=os.getenv("DB_PASSWORD", ""),
+    host=os.getenv("DB_HOST", "localhost"),
+    port=int(os.getenv("DB_PORT", "5432")),
+)
+
+
+class FakeTelegram(BaseHTTPRequestHandler):
+    received = []
+    lock = threading.Lock()
+    fail_rate = 0.0
+    rate_limited = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        if random.random() < self.fail_rate:
+            with self.lock:
+                FakeTelegram.rate_limited += 1
+            self._reply(429, {
+                "ok": False,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            })
+            return
+
+        with self.lock:
+            self.received.append((time.monotonic(), body["chat_id"], body["text"]))
+        self._reply(200, {"ok": True, "result": {}})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def outstanding(db_pool):
+    with db_pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT COUNT(*) AS n FROM notification_outbox "
+            "WHERE tracking_id LIKE 'BENCH-%' AND status IN ('pending', 'sending')"
+        )
+        n = cur.fetchone()["n"]
+        conn.commit()
+        cur.close()
+    return n
+
+
+def reset(db_pool):
+    with db_pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM notification_outbox WHERE tracking_id LIKE 'BENCH-%'")
+        cur.execute("DELETE FROM notification_rate_limits")
+        conn.commit()
+        cur.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--dispatchers", type=int, default=4)
+    parser.add_argument("--limiter", choices=["shared", "local"], default="shared")
+    parser.add_argument("--global-rate", type=float, default=30.0)
+    parser.add_argument("--per-chat-rate", type=float, default=1.0)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    random.seed(42)
+    FakeTelegram.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegram)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    db_pool = ConnectionPool(minconn=1, maxconn=2 * args.dispatchers + 2, cursor_factory=RealDictCursor, **DB_SETTINGS)
+    reset(db_pool)
+
+    # Distinct tracking ids, so nothing is coalesced away
+    rows, per_chat_seq = [], {}
+    for i in range(args.messages):
+        chat_id = random.randrange(args.chats)
+        seq = per_chat_seq.get(chat_id, 0)
+        per_chat_seq[chat_id] = seq + 1
+        rows.append((f"BENCH-{i:06d}", chat_id, f"{chat_id}:{seq}"))
+    with db_pool.connection() as conn:
+        cur = conn.cursor()
+        cur.executemany("INSERT INTO notification_outbox (tracking_id, chat_id, message) VALUES (%s, %s, %s)", rows)
+        conn.commit()
+        cur.close()
+
+    dispatchers = [
+        NotificationDispatcher(
+            db_pool,
+            TelegramSender("TEST", api_url=api_url),
+            batch_size=args.batch_size,
+            global_rate=args.global_rate,
+            per_chat_rate=args.per_chat_rate,
+            max_attempts=100,
+            limiter=PostgresRateLimiter(db_pool) if args.limiter == "shared" else LocalRateLimiter(),
+        )
+        for _ in range(args.dispatchers)
+    ]
+    done = threading.Event()
+
+    def drain(dispatcher):
+        while not done.is_set():
+            if dispatcher.drain_once() == 0:
+                time.sleep(0.01)
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=drain, args=(d,), daemon=True) for d in dispatchers]
+    for t in threads:
+        t.start()
+    while outstanding(db_pool):
+        time.sleep(0.05)
+    elapsed = time.monotonic() - start
+    done.set()
+    for t in threads:
+        t.join()
+    server.shutdown()
+    reset(db_pool)
+
+    received = FakeTelegram.received
+    last_seen, in_order, min_gap = {}, True, float("inf")
+    for ts, chat_id, text in received:
+        seq = int(text.split(":")[1])
+        if chat_id in last_seen:
+            prev_ts, prev_seq = last_seen[chat_id]
+            in_order &= seq == prev_seq + 1
+            min_gap = min(min_gap, ts - prev_ts)
+        elif seq != 0:
+            in_order = False
+        last_seen[chat_id] = (ts, seq)
+
+    times = sorted(ts for ts, _, _ in received)
+    peak, lo = 0, 0
+    for hi, ts in enumerate(times):
+        while ts - times[lo] >= 1.0:
+            lo += 1
+        peak = max(peak, hi - lo + 1)
+
+    print(f"Dispatchers       : {args.dispatchers} ({args.limiter} rate limits)")
+    print(f"Delivered         : {len(received)}/{args.messages} in {elapsed:.2f}s")
+    print(f"Throughput        : {len(received) / elapsed:.1f} msg/s (global limit {args.global_rate}/s)")
+    print(f"Peak 1 s window   : {peak} messages")
+    print(f"429 responses     : {FakeTelegram.rate_limited}")
+    print(f"Min per-chat gap  : {min_gap:.3f}s (limit {1 / args.per_chat_rate:.3f}s)")
+    print(f"Per-chat ordering : {'OK' if in_order else 'VIOLATED'}")
+
+
+if __name__ == "__main__":
+    main()
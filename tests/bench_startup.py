@@ -0,0 +1,127 @@
+"""
+Cold-start benchmark for the Flask app under each model-loading mode.
+
+Every configuration runs in a fresh interpreter and reports:
+- import_s      : time until `import app` returns (worker can accept requests)
+- ready_s       : time until /readyz answers 200
+- first_classify_ms : latency of the first /api/classify (text + photo)
+- rss_import_mb / rss_ready_mb : resident memory at those two points
+- tensorflow    : whether TensorFlow ended up imported
+
+"eager" reproduces the old behaviour (models loaded while importing app.py).
+Exits non-zero if a configuration never became ready, a model failed to
+load or the first classify did not answer 200, so it doubles as a check
+that app.py loads its models in every mode.
+Needs the model artifacts in --app-dir; no database is touched.
+
+    python bench_startup.py --app-dir ..
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+
+CONFIGS = {
+    "eager": {"SNAPFIX_MODEL_LOADING": "eager"},
+    "background": {"SNAPFIX_MODEL_LOADING": "background"},
+    "lazy": {"SNAPFIX_MODEL_LOADING": "lazy"},
+    "web-only": {"SNAPFIX_WORKER_PROFILE": "web"},
+}
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def child(app_dir, ready_timeout):
+    t0 = time.perf_counter()
+    sys.path.insert(0, app_dir)
+    os.chdir(app_dir)
+    import app as snapfix
+
+    result = {"import_s": time.perf_counter() - t0, "rss_import_mb": rss_mb()}
+    client = snapfix.app.test_client()
+
+    # /healthz is the first request: it starts background loading per worker
+    client.get("/healthz")
+    deadline = time.monotonic() + ready_timeout
+    while client.get("/readyz").status_code != 200 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    result["ready_s"] = time.perf_counter() - t0
+    result["rss_ready_mb"] = rss_mb()
+    status = snapfix.models.status()
+    result["ready"] = status["ready"]
+    result["load_errors"] = {
+        name: model["error"] for name, model in status["models"].items() if model["error"] or model["failures"]
+    }
+
+    if snapfix.WORKER_PROFILE == "full":
+        from PIL import Image
+
+        buf = io.BytesIO()
+        Image.new("RGB", (640, 480), (90, 120, 60)).save(buf, format="JPEG")
+        start = time.perf_counter()
+        r = client.post(
+            "/api/classify",
+            data={"description": "garbage not collected", "file": (io.BytesIO(buf.getvalue()), "a.jpg")},
+            content_type="multipart/form-data",
+        )
+        result["first_classify_ms"] = (time.perf_counter() - start) * 1000.0
+        result["first_classify_status"] = r.status_code
+        result["rss_after_classify_mb"] = rss_mb()
+    result["tensorflow"] = "tensorflow" in sys.modules
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app-dir", default=os.path.join(os.path.dirname(__file__), ".."))
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    app_dir = os.path.abspath(args.app_dir)
+
+    if args.child:
+        print(json.dumps(child(app_dir, args.ready_timeout)))
+        return
+
+    results = {}
+    for name in args.configs:
+        env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3", **CONFIGS[name])
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", "--app-dir", app_dir,
+               "--ready-timeout", str(args.ready_timeout)]
+        out = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
+        results[name] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    keys = ["ready", "import_s", "ready_s", "first_classify_ms", "first_classify_status",
+            "rss_import_mb", "rss_ready_mb", "tensorflow"]
+    print(f"{'':22s}" + "".join(f"{name:>12s}" for name in results))
+    for key in keys:
+        row = f"{key:22s}"
+        for r in results.values():
+            value = r.get(key, "-")
+            row += f"{value:12.2f}" if isinstance(value, float) else f"{str(value):>12s}"
+        print(row)
+
+    failed = {
+        name: r for name, r in results.items()
+        if not r["ready"] or r["load_errors"] or r.get("first_classify_status", 200) != 200
+    }
+    for name, r in failed.items():
+        print(f"\n❌ {name}: ready={r['ready']} first_classify_status={r.get('first_classify_status')} "
+              f"load_errors={r['load_errors']}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
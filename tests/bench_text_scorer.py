@@ -0,0 +1,100 @@
+"""
+Parity check + microbenchmark: compiled text scorer vs sklearn.
+
+Exports the given joblib vectorizer/classifier with
+export_compiled_scorer(), then:
+- asserts the compiled probabilities match sklearn's predict_proba within
+  --tolerance on every text of the dataset (plus a few edge cases),
+- times single-description scoring (the /api/classify path) and one
+  batch over the whole dataset for both implementations.
+
+    python bench_text_scorer.py --vectorizer ../text_vectorizer.joblib \\
+        --classifier ../text_classifier.joblib --dataset ../complaints_text_dataset.csv
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+import joblib
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from text_scorer import export_compiled_scorer, CompiledTextScorer
+
+
+EDGE_CASES = [
+    "",
+    "the and of",  # stop words only
+    "!!! ??? ...",
+    "GARBAGE  garbage\tGarbage\nnot collected",
+    "ರಸ್ತೆಯಲ್ಲಿ ಗುಂಡಿ pothole near school",
+    "no power no power no power since morning",
+]
+
+
+def time_per_call(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectorizer", default=os.path.join(ROOT, "models", "text_vectorizer.joblib"))
+    parser.add_argument("--classifier", default=os.path.join(ROOT, "models", "text_classifier.joblib"))
+    parser.add_argument("--dataset", default=os.path.join(ROOT, "complaints_text_dataset.csv"))
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    parser.add_argument("--samples", type=int, default=500, help="texts used for the single-call timing")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    vectorizer = joblib.load(args.vectorizer)
+    classifier = joblib.load(args.classifier)
+    texts = pd.read_csv(args.dataset)["text"].astype(str).tolist() + EDGE_CASES
+
+    path = os.path.join(tempfile.mkdtemp(prefix="snapfix-scorer-"), "text_scorer.npz")
+    export_compiled_scorer(vectorizer, classifier, path)
+    scorer = CompiledTextScorer(path)
+    print(f"Compiled scorer: {os.path.getsize(path) / 1024:.0f} KB, "
+          f"{len(scorer.vocabulary)} features, {len(scorer.classes_)} classes")
+
+    # ---------- PARITY ----------
+    expected = classifier.predict_proba(vectorizer.transform(texts))
+    got = scorer.predict_proba(texts)
+    # The single-document fast path must agree as well
+    single = np.vstack([scorer.predict_proba([t]) for t in texts])
+    diff = np.maximum(np.abs(got - expected), np.abs(single - expected))
+    worst = int(diff.max(axis=1).argmax())
+    print(f"\nParity on {len(texts)} texts: max |Δp| = {diff.max():.2e}, "
+          f"argmax agreement {np.mean(got.argmax(1) == expected.argmax(1)) * 100:.2f}%")
+    if diff.max() > args.tolerance:
+        raise SystemExit(f"FAILED: exceeds {args.tolerance:g} (worst text: {texts[worst]!r})")
+    print(f"OK (tolerance {args.tolerance:g})")
+
+    # ---------- SPEED ----------
+    sample = texts[: args.samples]
+    sk_single = time_per_call(lambda t: classifier.predict_proba(vectorizer.transform([t])), sample, args.repeat)
+    cs_single = time_per_call(lambda t: scorer.predict_proba([t]), sample, args.repeat)
+
+    start = time.perf_counter()
+    classifier.predict_proba(vectorizer.transform(texts))
+    sk_batch = time.perf_counter() - start
+    start = time.perf_counter()
+    scorer.predict_proba(texts)
+    cs_batch = time.perf_counter() - start
+
+    print(f"\n{'':28s} {'sklearn':>12s} {'compiled':>12s} {'speed-up':>9s}")
+    print(f"{'single description (us)':28s} {sk_single * 1e6:12.1f} {cs_single * 1e6:12.1f} {sk_single / cs_single:8.1f}x")
+    print(f"{f'batch of {len(texts)} (ms)':28s} {sk_batch * 1e3:12.1f} {cs_batch * 1e3:12.1f} {sk_batch / cs_batch:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Load test for status subscriptions (/api/track/watch and /api/track/events).
+
+Starts the app (web profile, no models) with the production gunicorn
+profile (gunicorn.conf.py: --workers workers with SNAPFIX_THREADS request
+threads plus --watch-cap watcher threads each) or targets --base-url,
+creates --watchers reports through /api/reports/bulk and opens one
+subscription per report:
+- longpoll : GET /api/track/watch?since=<version>, re-polled on 204,
+- sse      : one GET /api/track/events stream per report.
+Subscribers over the cap get 503 and retry after Retry-After. Once every
+subscriber that fits is connected it measures an idle window:
+- database statements run by the server (snapfix_db_seconds_count from
+  /metrics) against what polling /api/track every --poll-interval would cost,
+- server RSS and thread count,
+- latency of /api/track requests sent meanwhile (--probe-rate per second),
+  which must not wait for a thread held by a watcher.
+Then --updates reports change status through a direct UPDATE, and the time
+from COMMIT to the subscriber receiving the change is reported
+(p50/p95/p99/max).
+
+Subscribers are plain asyncio sockets speaking HTTP/1.0 (one connection per
+request, the body ends at EOF), so thousands of them fit in one process.
+Writes rows: use a scratch database (see bench_http.py).
+
+    python bench_watchers.py --watchers 2000 --watch-cap 2000 --mode longpoll --idle 30 --updates 200
+    python bench_watchers.py --watchers 200 --watch-cap 32 --mode sse
+    python bench_watchers.py --watchers 200 --watch-cap 0 --threads 4   # no cap: watchers take every thread
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import importlib.util
+from urllib.parse import urlsplit, urlencode
+
+import numpy as np
+import psycopg2
+import requests
+
+from bench_http import APP_DIR, free_port, wait_ready, report_payload
+
+
+def connect_db():
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME", "snapfix"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", ""),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", "5432")),
+    )
+
+
+def start_server(args):
+    port = free_port()
+    env = dict(
+        os.environ, SNAPFIX_WORKER_PROFILE="web", SNAPFIX_WATCH_TIMEOUT_S=str(args.poll_timeout),
+        SNAPFIX_BIND=f"127.0.0.1:{port}", SNAPFIX_WORKERS=str(args.workers), SNAPFIX_THREADS=str(args.threads),
+        SNAPFIX_WATCH_MAX_PER_WORKER=str(args.watch_cap),
+    )
+    if importlib.util.find_spec("gunicorn"):
+        # The production profile; with one worker /metrics covers every subscriber
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--backlog", "4096", "app:app"]
+    else:
+        cmd = [sys.executable, "-c", f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    proc = subprocess.Popen(cmd, cwd=args.app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def process_usage(pid):
+    """(RSS MB, threads) of `pid` plus its direct children (gunicorn workers)."""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    rss, threads = 0.0, 0
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) / 1024.0
+                    elif line.startswith("Threads:"):
+                        threads += int(line.split()[1])
+        except OSError:
+            pass
+    return round(rss, 1), threads
+
+
+def db_statements(base_url):
+    """Statements run so far, or None if /metrics got no answer (every thread busy)."""
+    try:
+        text = requests.get(f"{base_url}/metrics", timeout=10).text
+    except requests.RequestException:
+        return None
+    return sum(
+        float(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+        if line.startswith("snapfix_db_seconds_count") and 'op="execute"' in line
+    )
+
+
+# ---------- MINIMAL ASYNC HTTP ----------
+
+async def open_get(base_url, path, params):
+    """Send GET over a new connection; returns (status, headers, reader, writer) after the headers."""
+    url = urlsplit(base_url)
+    reader, writer = await asyncio.open_connection(url.hostname, url.port)
+    writer.write(f"GET {path}?{urlencode(params)} HTTP/1.0\r\nHost: {url.netloc}\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, reader, writer
+
+
+async def get(base_url, path, params):
+    status, headers, reader, writer = await open_get(base_url, path, params)
+    body = await reader.read()
+    writer.close()
+    return status, headers, body
+
+
+def retry_delay(status, headers):
+    """Seconds to wait before re-subscribing: Retry-After on 503, else 1."""
+    if status == 503:
+        try:
+            return float(headers.get("retry-after", 1))
+        except ValueError:
+            pass
+    return 1.0
+
+
+class State:
+    def __init__(self):
+        self.connected = 0
+        self.repolls = 0
+        self.errors = {}  # status -> count
+        self.admitted = set()  # tracking ids currently holding a subscription
+        self.received = {}  # tracking_id -> perf_counter() of the pushed change
+        self.all_connected = asyncio.Event()
+        self.target = 0
+
+    def on_connected(self):
+        self.connected += 1
+        if self.connected == self.target:
+            self.all_connected.set()
+
+
+async def longpoll_watcher(base_url, tracking_id, state, poll_timeout):
+    version = None  # first call has no cursor and answers immediately
+    while True:
+        params = {"id": tracking_id} if version is None else {"id": tracking_id, "since": version, "timeout": poll_timeout}
+        if version is not None:
+            # Held by the server unless it answers 503 right away
+            state.admitted.add(tracking_id)
+        try:
+            status, headers, body = await get(base_url, "/api/track/watch", params)
+        except OSError:
+            status, headers, body = "connection error", {}, None
+        if status == 200:
+            if version is None:
+                state.on_connected()
+            else:
+                state.received.setdefault(tracking_id, time.perf_counter())
+            version = json.loads(body)["version"]
+        elif status == 204:
+            state.repolls += 1
+        else:
+            state.admitted.discard(tracking_id)
+            state.errors[status] = state.errors.get(status, 0) + 1
+            await asyncio.sleep(retry_delay(status, headers))
+
+
+async def sse_watcher(base_url, tracking_id, state):
+    connected = False
+    while True:
+        try:
+            status, headers, reader, writer = await open_get(base_url, "/api/track/events", {"id": tracking_id})
+        except OSError:
+            status, headers = "connection error", {}
+        if status != 200:
+            if status != "connection error":
+                writer.close()
+            state.errors[status] = state.errors.get(status, 0) + 1
+            await asyncio.sleep(retry_delay(status, headers))
+            continue
+        try:
+            first = True
+            while line := await reader.readline():
+                if not line.startswith(b"id:"):
+                    continue
+                if first and not connected:
+                    connected = True
+                    state.on_connected()
+                if first:
+                    state.admitted.add(tracking_id)
+                elif not first:
+                    state.received.setdefault(tracking_id, time.perf_counter())
+                first = False
+        finally:
+            state.admitted.discard(tracking_id)
+            writer.close()
+
+
+async def probe(base_url, tracking_id, rate, stop):
+    """/api/track latencies (ms) while `stop` is unset; a request that gets no thread times out at 10 s."""
+    latencies, failures = [], 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            status, _, _ = await asyncio.wait_for(get(base_url, "/api/track", {"id": tracking_id}), 10.0)
+        except (OSError, asyncio.TimeoutError):
+            status = None
+        if status == 200:
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        else:
+            failures += 1
+        await asyncio.sleep(max(0.0, 1.0 / rate - (time.perf_counter() - start)))
+    return latencies, failures
+
+
+async def run(args, base_url, server_pid):
+    # ---------- SEED ----------
+    rng = random.Random(args.seed)
+    tracking_ids = []
+    for start in range(0, args.watchers, 5000):
+        n = min(5000, args.watchers - start)
+        r = requests.post(f"{base_url}/api/reports/bulk", json=[report_payload(rng) for _ in range(n)])
+        r.raise_for_status()
+        tracking_ids += r.json()["tracking_ids"]
+
+    # ---------- SUBSCRIBE ----------
+    state = State()
+    # Subscribers the server admits; the rest keep getting 503
+    state.target = len(tracking_ids) if not args.watch_cap else min(len(tracking_ids), args.watch_cap * args.workers)
+    tasks = []
+    start = time.perf_counter()
+    for i, tracking_id in enumerate(tracking_ids):
+        if args.mode == "sse":
+            coro = sse_watcher(base_url, tracking_id, state)
+        else:
+            coro = longpoll_watcher(base_url, tracking_id, state, args.poll_timeout)
+        tasks.append(asyncio.create_task(coro))
+        if (i + 1) % args.ramp == 0:
+            await asyncio.sleep(1.0)
+    try:
+        await asyncio.wait_for(state.all_connected.wait(), timeout=args.connect_timeout)
+    except asyncio.TimeoutError:
+        pass
+    connect_s = time.perf_counter() - start
+    print(f"{state.connected}/{len(tracking_ids)} {args.mode} subscribers connected in {connect_s:.1f}s "
+          f"(errors: {state.errors or 'none'})")
+
+    # ---------- IDLE ----------
+    statements_before = await asyncio.to_thread(db_statements, base_url)
+    repolls_before = state.repolls
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(base_url, tracking_ids[0], args.probe_rate, stop))
+    await asyncio.sleep(args.idle)
+    stop.set()
+    probe_ms, probe_failures = await probe_task
+    statements_after = await asyncio.to_thread(db_statements, base_url)
+    idle_statements = None if None in (statements_before, statements_after) else statements_after - statements_before
+    rss_mb, threads = process_usage(server_pid) if server_pid else (None, None)
+    idle = {
+        "seconds": args.idle,
+        "db_statements": None if idle_statements is None else int(idle_statements),
+        "db_statements_per_s": None if idle_statements is None else round(idle_statements / args.idle, 2),
+        "repolls": state.repolls - repolls_before,
+        "polling_equivalent_per_s": round(len(tracking_ids) / args.poll_interval, 1),
+        "server_rss_mb": rss_mb,
+        "server_threads": threads,
+        "track_requests": len(probe_ms) + probe_failures,
+        "track_failures": probe_failures,
+        "track_p50_ms": round(float(np.percentile(probe_ms, 50)), 2) if probe_ms else None,
+        "track_max_ms": round(float(max(probe_ms)), 2) if probe_ms else None,
+    }
+    print(f"Idle {args.idle:.0f}s: {idle['db_statements']} statements "
+          f"({idle['db_statements_per_s']}/s) vs {idle['polling_equivalent_per_s']}/s for "
+          f"/api/track polling every {args.poll_interval:g}s; server RSS {rss_mb} MB, {threads} threads")
+    print(f"/api/track meanwhile: {idle['track_requests']} requests, {probe_failures} failed or timed out, "
+          f"p50 {idle['track_p50_ms']} ms, max {idle['track_max_ms']} ms")
+
+    # ---------- UPDATES ----------
+    # Only subscribers the server admitted can be told about a change
+    admitted = sorted(state.admitted)
+    changed = rng.sample(admitted, min(args.updates, len(admitted)))
+    committed = {}
+    conn = connect_db()
+    cur = conn.cursor()
+    for tracking_id in changed:
+        cur.execute("UPDATE reports SET dept_status = 'In Progress' WHERE tracking_id = %s", (tracking_id,))
+        conn.commit()
+        committed[tracking_id] = time.perf_counter()
+        await asyncio.sleep(1.0 / args.update_rate)
+    conn.close()
+
+    deadline = time.perf_counter() + args.poll_timeout + 10
+    while time.perf_counter() < deadline and not all(t in state.received for t in changed):
+        await asyncio.sleep(0.05)
+
+    latencies = np.array([state.received[t] - committed[t] for t in changed if t in state.received]) * 1000.0
+    delivery = {"updates": len(changed), "delivered": int(len(latencies)), "errors": state.errors}
+    if len(latencies):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        delivery.update({
+            "p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2), "max_ms": round(float(latencies.max()), 2),
+        })
+    print(f"Delivered {delivery['delivered']}/{delivery['updates']} changes: "
+          f"p50 {delivery.get('p50_ms')} ms, p95 {delivery.get('p95_ms')} ms, "
+          f"p99 {delivery.get('p99_ms')} ms, max {delivery.get('max_ms')} ms")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {"mode": args.mode, "watchers": len(tracking_ids), "connected": state.connected,
+            "workers": args.workers, "threads": args.threads, "watch_cap": args.watch_cap,
+            "connect_s": round(connect_s, 2), "idle": idle, "delivery": delivery}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", help="use a running server (server RSS/threads are then not reported)")
+    parser.add_argument("--app-dir", default=APP_DIR)
+    parser.add_argument("--mode", choices=["longpoll", "sse"], default="longpoll")
+    parser.add_argument("--watchers", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=1, help="SNAPFIX_WORKERS (/metrics then covers one of them)")
+    parser.add_argument("--threads", type=int, default=4, help="SNAPFIX_THREADS: request threads per worker")
+    parser.add_argument("--watch-cap", type=int, default=32,
+                        help="SNAPFIX_WATCH_MAX_PER_WORKER: watcher threads per worker, 0 = no cap")
+    parser.add_argument("--probe-rate", type=float, default=5.0, help="/api/track requests per second while idle")
+    parser.add_argument("--connect-timeout", type=float, default=120.0)
+    parser.add_argument("--ramp", type=int, default=200, help="new subscriptions per second")
+    parser.add_argument("--idle", type=float, default=30.0, help="seconds of idle measurement")
+    parser.add_argument("--poll-timeout", type=float, default=25.0, help="long-poll hold (SNAPFIX_WATCH_TIMEOUT_S)")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="/api/track polling interval to compare with")
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--update-rate", type=float, default=50.0, help="UPDATEs per second")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    proc = None
+    if args.base_url:
+        base_url = args.base_url.rstrip("/")
+    else:
+        proc, base_url = start_server(args)
+    try:
+        wait_ready(base_url, 120, proc)
+        result = asyncio.run(run(args, base_url, proc.pid if proc else None))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                # Graceful shutdown waits for held long-polls
+                proc.kill()
+                proc.wait()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
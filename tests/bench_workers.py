@@ -0,0 +1,153 @@
+"""
+Throughput scaling of the production gunicorn profile (gunicorn.conf.py)
+from 1 to N workers on a fixed set of cores.
+
+For every worker count in --workers and every profile in --profiles the
+server is started from scratch and each --scenarios route is driven by
+--concurrency closed-loop clients (default: 2 per worker):
+
+    default : no preload, TF/TFLite/BLAS thread pools at their defaults
+              (every worker sizes them for all cores),
+    tuned   : preload + fork, cores // workers inference threads per worker,
+    pinned  : tuned, and each worker pinned to its own cores.
+
+Reports req/s, p50/p95 and the server's memory: RSS summed over master and
+workers (counts shared pages once per process) and PSS (shares them out).
+Restrict the cores with taskset to measure a fixed CPU count:
+
+    taskset -c 0-3 python bench_workers.py --workers 1 2 4 8 --out workers.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import requests
+
+from bench_http import APP_DIR, Scenario, free_port, wait_ready, make_images, run_load
+
+
+PROFILES = {
+    "default": {"SNAPFIX_PRELOAD": "0", "SNAPFIX_TUNE_THREADS": "0"},
+    "tuned": {"SNAPFIX_PRELOAD": "1", "SNAPFIX_TUNE_THREADS": "1"},
+    "pinned": {"SNAPFIX_PRELOAD": "1", "SNAPFIX_TUNE_THREADS": "1", "SNAPFIX_PIN_WORKERS": "1"},
+}
+
+
+def start_server(args, workers, profile):
+    port = free_port()
+    env = dict(
+        os.environ, TF_CPP_MIN_LOG_LEVEL="3",
+        SNAPFIX_BIND=f"127.0.0.1:{port}", SNAPFIX_WORKERS=str(workers), SNAPFIX_THREADS=str(args.threads),
+        **PROFILES[profile],
+    )
+    cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+    log = open(args.server_log, "a") if args.server_log else subprocess.DEVNULL
+    proc = subprocess.Popen(cmd, cwd=args.app_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def wait_workers_ready(base_url, workers, timeout):
+    """/readyz answers from whichever worker accepts; poll until `workers` distinct pids said ready."""
+    ready = set()
+    deadline = time.monotonic() + timeout
+    while len(ready) < workers and time.monotonic() < deadline:
+        try:
+            r = requests.get(f"{base_url}/readyz", headers={"Connection": "close"}, timeout=2)
+            if r.status_code == 200:
+                ready.add(r.json().get("pid"))
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(0.05)
+    return len(ready)
+
+
+def server_memory(pid):
+    """(RSS MB, PSS MB) of `pid` plus its direct children."""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    rss = pss = 0.0
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1]) / 1024.0
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1]) / 1024.0
+        except OSError:
+            pass
+    return round(rss, 1), round(pss, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app-dir", default=APP_DIR)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--scenarios", nargs="+", default=["classify-image"],
+                        choices=["classify-text", "classify-image", "classify-both"])
+    parser.add_argument("--concurrency", type=int, help="clients (default: 2 per worker)")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="SNAPFIX_THREADS: request threads per worker (plus the watcher threads)")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--server-log", help="file for the servers' stdout/stderr")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    images = make_images(args.images, args.seed)
+    cores = len(os.sched_getaffinity(0))
+    results = []
+    for workers in args.workers:
+        for profile in args.profiles:
+            proc, base_url = start_server(args, workers, profile)
+            try:
+                start = time.perf_counter()
+                wait_ready(base_url, args.ready_timeout, proc)
+                ready = wait_workers_ready(base_url, workers, args.ready_timeout)
+                startup_s = time.perf_counter() - start
+                rss_mb, pss_mb = server_memory(proc.pid)
+                for name in args.scenarios:
+                    scenario = Scenario(name, base_url, images, [])
+                    concurrency = args.concurrency or 2 * workers
+                    r = run_load(scenario, concurrency, args.duration, args.warmup, args.seed)
+                    r.update({
+                        "scenario": name, "workers": workers, "profile": profile, "cores": cores,
+                        "workers_ready": ready, "startup_s": round(startup_s, 1),
+                        "rss_mb": rss_mb, "pss_mb": pss_mb,
+                    })
+                    results.append(r)
+                    print(f"  {name:15s} w={workers:<2d} {profile:8s} {r['throughput_rps']:8.1f} req/s  "
+                          f"p95 {r.get('p95_ms', float('nan')):.0f} ms  PSS {pss_mb:.0f} MB", flush=True)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=60)
+
+    print(f"\n{cores} core(s)\n")
+    print(f"{'scenario':15s} {'workers':>7s} {'profile':>8s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} "
+          f"{'errors':>6s} {'RSS MB':>8s} {'PSS MB':>8s}")
+    for r in results:
+        print(
+            f"{r['scenario']:15s} {r['workers']:7d} {r['profile']:>8s} {r['throughput_rps']:8.1f} "
+            f"{r.get('p50_ms', float('nan')):8.1f} {r.get('p95_ms', float('nan')):8.1f} "
+            f"{sum(r['errors'].values()):6d} {r['rss_mb']:8.0f} {r['pss_mb']:8.0f}"
+        )
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"cores": cores, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
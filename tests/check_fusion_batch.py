@@ -0,0 +1,114 @@
+"""
+Property check + benchmark for fusion.fuse_predictions_batch.
+
+Generates random image/text probability matrices, including ties,
+confidences sitting exactly on the 0.50 review threshold, float32 and
+float64 inputs, and rows missing one or both modalities. Asserts that the
+batched function agrees row for row with the scalar fuse_predictions,
+then times both on --rows rows.
+
+    python check_fusion_batch.py --rounds 200 --rows 100000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fusion import fuse_predictions, fuse_predictions_batch, batch_labels
+
+
+CLASS_NAMES = [
+    "damaged_concrete_structures", "damaged_electric_poles", "damaged_road_sign",
+    "fallen_trees", "garbage", "graffiti", "illegal_parking", "no_electricity",
+    "pothole_road_crack", "water_logging",
+]
+
+
+def random_probs(rng, n, c, dtype):
+    probs = rng.dirichlet(np.full(c, rng.choice([0.1, 0.5, 1.0, 5.0])), size=n)
+    # Edge rows: exact ties and top-1 values that land on the thresholds
+    # after the +0.15 / -0.20 adjustments
+    for value in (0.35, 0.5, 0.7, 0.85, 1.0 / c):
+        rows = rng.random(n) < 0.03
+        probs[rows] = (1.0 - value) / (c - 1)
+        probs[rows, rng.integers(0, c)] = value
+    return probs.astype(dtype)
+
+
+def scalar(image_probs, text_probs, has_img, has_txt):
+    out = []
+    for i in range(len(has_img)):
+        out.append(fuse_predictions(
+            image_probs=image_probs[i] if has_img[i] else None,
+            text_probs=text_probs[i] if has_txt[i] else None,
+            class_names=CLASS_NAMES,
+        ))
+    return out
+
+
+def check_round(rng, n):
+    c = len(CLASS_NAMES)
+    dtype = rng.choice([np.float32, np.float64])
+    image_probs = random_probs(rng, n, c, dtype)
+    text_probs = random_probs(rng, n, c, dtype)
+    # Share the top class on some rows so the agree branch is exercised
+    same = rng.random(n) < 0.4
+    text_probs[same] = image_probs[same][:, rng.permutation(c)] if rng.random() < 0.2 else image_probs[same]
+    has_img = rng.random(n) < 0.8
+    has_txt = rng.random(n) < 0.8
+
+    label_idx, conf, source = fuse_predictions_batch(image_probs, text_probs, has_img, has_txt)
+    labels = batch_labels(label_idx, CLASS_NAMES)
+
+    for i, (exp_label, exp_conf, exp_source) in enumerate(scalar(image_probs, text_probs, has_img, has_txt)):
+        got = (labels[i], conf[i], source[i])
+        if got != (exp_label, exp_conf, exp_source):
+            raise AssertionError(f"row {i}: batch {got} != scalar {(exp_label, exp_conf, exp_source)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for _ in range(args.rounds):
+        check_round(rng, int(rng.integers(1, 500)))
+    # Whole-modality-absent calls
+    probs = random_probs(rng, 100, len(CLASS_NAMES), np.float32)
+    for kwargs in ({"image_probs": probs}, {"text_probs": probs}):
+        label_idx, conf, source = fuse_predictions_batch(**kwargs)
+        expected = [fuse_predictions(class_names=CLASS_NAMES, **{
+            "image_probs": None, "text_probs": None, **{k: v[i] for k, v in kwargs.items()}
+        }) for i in range(len(probs))]
+        assert list(zip(batch_labels(label_idx, CLASS_NAMES), conf, source)) == expected
+    print(f"Property check: {args.rounds} random rounds + single-modality calls OK")
+
+    image_probs = random_probs(rng, args.rows, len(CLASS_NAMES), np.float32)
+    text_probs = random_probs(rng, args.rows, len(CLASS_NAMES), np.float32)
+    has_img = rng.random(args.rows) < 0.8
+    has_txt = rng.random(args.rows) < 0.8
+
+    start = time.perf_counter()
+    scalar(image_probs, text_probs, has_img, has_txt)
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fuse_predictions_batch(image_probs, text_probs, has_img, has_txt)
+    batch_s = time.perf_counter() - start
+
+    print(f"\n{args.rows:,} rows")
+    print(f"  scalar : {scalar_s * 1000:9.1f} ms")
+    print(f"  batch  : {batch_s * 1000:9.1f} ms")
+    print(f"  speed-up: {scalar_s / batch_s:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
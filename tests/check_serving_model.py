@@ -0,0 +1,194 @@
+"""
+Parity check + latency comparison for the serving SavedModel (raw bytes in).
+
+Parity: the photos in --images are loaded the way training loads them
+(tf.keras.utils.image_dataset_from_directory) and compared with
+- the SavedModel's in-graph `preprocess` signature on the encoded bytes,
+- the PIL path of the keras/tflite backends (image_preprocess.decode_image),
+then the SavedModel's probabilities on the bytes are compared with the Keras
+model on the training-time pixels. Exits 1 if the in-graph path drifts from
+training (pixels beyond --pixel-tol or probabilities beyond --prob-tol).
+
+Latency: one image per call from --threads concurrent callers, for
+- pil+keras  : PIL decode + KerasImageModel.predict (default backend),
+- pil+pixels : PIL decode + the SavedModel's float pixel signature,
+- bytes      : SavedModelImageModel.predict_bytes (decode inside the graph).
+
+Without --images, synthetic phone-sized JPEGs and PNGs are written to a
+temporary directory. Run from the tests/ directory after exporting:
+
+    python check_serving_model.py --images ../data/images/test/garbage --threads 1 4 8
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from image_preprocess import decode_image, MODEL_INPUT_SIZE
+
+
+KERAS_PATH = "../model_output/image_model_mobilenet.keras"
+SERVING_PATH = "../model_output/image_model_serving"
+EXTENSIONS = ("*.jpg", "*.jpeg", "*.png", "*.bmp", "*.gif")
+
+
+def synthetic_photos(directory, count, width, height):
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    for i in range(count):
+        base = np.stack([x * 255 // width, y * 255 // height, (x + y + 40 * i) * 255 // (width + height + 40 * i)], -1)
+        noise = rng.integers(0, 40, size=(height, width, 3))
+        image = Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+        # Every fourth photo as PNG, so both decoders are exercised
+        if i % 4 == 3:
+            image.save(os.path.join(directory, f"photo_{i}.png"))
+        else:
+            image.save(os.path.join(directory, f"photo_{i}.jpg"), quality=90)
+
+
+def training_pixels(directory):
+    """(paths, pixels) exactly as image_dataset_from_directory yields them to fit()."""
+    import tensorflow as tf
+
+    ds = tf.keras.utils.image_dataset_from_directory(
+        directory,
+        labels=None,
+        image_size=MODEL_INPUT_SIZE,
+        batch_size=1,
+        shuffle=False,
+    )
+    return list(ds.file_paths), np.concatenate([batch.numpy() for batch in ds])
+
+
+# ---------- PARITY ----------
+
+def check_parity(args, serving, keras_model, paths, train_pixels):
+    import tensorflow as tf
+
+    photos = [open(p, "rb").read() for p in paths]
+    graph_pixels = np.concatenate([
+        serving.model.signatures["preprocess"](image_bytes=tf.constant([data]))["images"].numpy()
+        for data in photos
+    ])
+    pil_pixels = np.stack([decode_image(data) for data in photos])
+
+    graph_diff = np.abs(graph_pixels - train_pixels).max(axis=(1, 2, 3))
+    pil_diff = np.abs(pil_pixels - train_pixels).mean(axis=(1, 2, 3))
+
+    train_probs = keras_model.predict(train_pixels, verbose=0)
+    bytes_probs = np.concatenate([serving.predict_bytes([data]) for data in photos])
+    pil_probs = keras_model.predict(pil_pixels, verbose=0)
+    prob_diff = np.abs(bytes_probs - train_probs).max(axis=1)
+
+    print(f"\nParity against training-time preprocessing ({len(photos)} photos)\n")
+    print(f"in-graph pixels   : max |diff| {graph_diff.max():.4f} (0-255 scale)")
+    print(f"PIL pixels        : mean |diff| {pil_diff.mean():.4f}, worst photo {pil_diff.max():.4f}")
+    print(f"in-graph probs    : max |diff| {prob_diff.max():.2e}, "
+          f"top-1 agreement {np.mean(bytes_probs.argmax(1) == train_probs.argmax(1)):.2%}")
+    print(f"PIL path probs    : max |diff| {np.abs(pil_probs - train_probs).max():.2e}, "
+          f"top-1 agreement {np.mean(pil_probs.argmax(1) == train_probs.argmax(1)):.2%}")
+
+    failed = [
+        os.path.basename(p) for p, dp, dq in zip(paths, graph_diff, prob_diff)
+        if dp > args.pixel_tol or dq > args.prob_tol
+    ]
+    if failed:
+        print(f"❌ In-graph preprocessing differs from training for: {', '.join(failed[:10])}")
+    else:
+        print("✅ In-graph preprocessing matches training")
+    return not failed
+
+
+# ---------- LATENCY ----------
+
+def run_concurrent(fn, photos, threads, calls):
+    """Per-call latencies (ms) and throughput with `threads` callers sharing `calls` calls."""
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(calls))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            fn(photos[i % len(photos)])
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed * 1000.0)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - start
+    return np.array(latencies), calls / wall
+
+
+def compare_latency(args, serving, keras_backend, photos):
+    modes = {
+        "pil+keras": lambda data: keras_backend.predict(decode_image(data)[None]),
+        "pil+pixels": lambda data: serving.predict(decode_image(data)[None]),
+        "bytes": lambda data: serving.predict_bytes([data]),
+    }
+    for fn in modes.values():
+        for data in photos[:3]:
+            fn(data)  # warm-up
+
+    mean_kb = np.mean([len(p) for p in photos]) / 1024.0
+    print(f"\nLatency, one photo per call ({len(photos)} photos, mean {mean_kb:.0f} KB, {args.calls} calls per cell)\n")
+    print(f"{'mode':12s} {'threads':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'img/s':>9s}")
+    for threads in args.threads:
+        for mode, fn in modes.items():
+            lat, throughput = run_concurrent(fn, photos, threads, args.calls)
+            p50, p95 = np.percentile(lat, [50, 95])
+            print(f"{mode:12s} {threads:7d} {p50:9.2f} {p95:9.2f} {throughput:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", help="directory of photos (default: synthetic JPEG/PNG)")
+    parser.add_argument("--keras", default=KERAS_PATH)
+    parser.add_argument("--serving", default=SERVING_PATH)
+    parser.add_argument("--count", type=int, default=16, help="synthetic photos")
+    parser.add_argument("--size", type=int, nargs=2, default=[1600, 1200], help="synthetic photo width height")
+    parser.add_argument("--pixel-tol", type=float, default=1e-3)
+    parser.add_argument("--prob-tol", type=float, default=1e-4)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--skip-latency", action="store_true")
+    args = parser.parse_args()
+
+    import tensorflow as tf
+    from image_backends import KerasImageModel, SavedModelImageModel
+
+    if not args.images:
+        args.images = tempfile.mkdtemp(prefix="snapfix-photos-")
+        synthetic_photos(args.images, args.count, *args.size)
+
+    paths, train_pixels = training_pixels(args.images)
+    keras_backend = KerasImageModel(args.keras)
+    serving = SavedModelImageModel(args.serving)
+
+    ok = check_parity(args, serving, keras_backend.model, paths, train_pixels)
+    if not args.skip_latency:
+        photos = [open(p, "rb").read() for p in paths]
+        compare_latency(args, serving, keras_backend, photos)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
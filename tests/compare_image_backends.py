@@ -0,0 +1,91 @@
+"""
+Side-by-side report of the Keras (float32) and TFLite (int8) image backends.
+
+Each backend is evaluated in its own subprocess so peak RSS is not
+polluted by the other one. Run from the tests/ directory:
+
+    python compare_image_backends.py
+"""
+
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(".."))
+
+# ===== PATHS =====
+KERAS_PATH = "../model_output/image_model_mobilenet.keras"
+TFLITE_PATH = "../model_output/image_model_int8.tflite"
+TEST_DIR = "../data/images/test"
+LATENCY_SAMPLES = 200
+
+
+def evaluate(backend):
+    import tensorflow as tf
+    from image_backends import load_image_model
+
+    model = load_image_model(backend, keras_path=KERAS_PATH, tflite_path=TFLITE_PATH)
+
+    test_ds = tf.keras.utils.image_dataset_from_directory(
+        TEST_DIR,
+        image_size=(224, 224),
+        batch_size=1,
+        shuffle=False,
+    )
+
+    y_true, y_pred, latencies = [], [], []
+    for images, labels in test_ds:
+        batch = images.numpy().astype(np.float32)
+        start = time.perf_counter()
+        probs = model.predict(batch)
+        latencies.append(time.perf_counter() - start)
+        y_true.append(int(labels.numpy()[0]))
+        y_pred.append(int(np.argmax(probs[0])))
+
+    # skip warm-up calls when timing
+    lat_ms = np.array(latencies[5:LATENCY_SAMPLES + 5]) * 1000.0
+
+    return {
+        "backend": backend,
+        "images": len(y_true),
+        "accuracy": float(np.mean(np.array(y_true) == np.array(y_pred))),
+        "latency_p50_ms": float(np.percentile(lat_ms, 50)),
+        "latency_p95_ms": float(np.percentile(lat_ms, 95)),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "model_size_mb": os.path.getsize(KERAS_PATH if backend == "keras" else TFLITE_PATH) / 1e6,
+    }
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--backend":
+        print(json.dumps(evaluate(sys.argv[2])))
+        return
+
+    results = {}
+    for backend in ("keras", "tflite"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--backend", backend],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        results[backend] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    keras, tflite = results["keras"], results["tflite"]
+
+    print("\nImage backend comparison (CPU, batch size 1)\n")
+    print(f"{'metric':18s} {'keras':>10s} {'tflite':>10s}")
+    for key in ("accuracy", "latency_p50_ms", "latency_p95_ms", "max_rss_mb", "model_size_mb"):
+        print(f"{key:18s} {keras[key]:10.4f} {tflite[key]:10.4f}")
+
+    print(f"\nAccuracy delta (tflite - keras): {tflite['accuracy'] - keras['accuracy']:+.4f}")
+    print(f"p50 speed-up: {keras['latency_p50_ms'] / tflite['latency_p50_ms']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,38 @@
+import os
+import sys
+
 import tensorflow as tf
 import numpy as np
 from sklearn.metrics import classification_report, accuracy_score
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "training")))
+
+from image_records import has_records, load_dataset
+
 # ===== PATHS =====
 MODEL_PATH = "../model_output/image_model_mobilenet.keras"
 TEST_DIR = "../data/images/test"   # IMPORTANT: exact path
+# Used instead of TEST_DIR once built (python ../training/image_records.py --splits test)
+TEST_RECORDS_DIR = "../training/records/test"
 
 # ===== LOAD MODEL =====
 model = tf.keras.models.load_model(MODEL_PATH)
 print("✅ MobileNetV2 model loaded")
 
 # ===== LOAD TEST DATA =====
-test_ds = tf.keras.utils.image_dataset_from_directory(
-    TEST_DIR,
-    image_size=(224, 224),
-    batch_size=32,
-    shuffle=False
-)
-
-class_names = test_ds.class_names
+if has_records(TEST_RECORDS_DIR):
+    # Decoded once into memory, so the two passes below do not re-read the shards
+    test_ds, class_names = load_dataset(TEST_RECORDS_DIR, batch_size=32)
+    print(f"✅ Test set read from {TEST_RECORDS_DIR}")
+else:
+    test_ds = tf.keras.utils.image_dataset_from_directory(
+        TEST_DIR,
+        image_size=(224, 224),
+        batch_size=32,
+        shuffle=False
+    )
+    class_names = test_ds.class_names
+
 print("Classes:", class_names)
 
 # ===== GET PREDICTIONS =====
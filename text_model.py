@@ -0,0 +1,186 @@
+"""
+TF-IDF + LogisticRegression text classifier with memoized predictions.
+
+Citizens submit highly repetitive descriptions ("garbage not collected",
+"no power since morning"), so class probabilities are cached in an LRU
+keyed by (model version, normalized description). Normalization reuses
+the vectorizer's own lowercasing and token pattern, so two descriptions
+share a key only if the vectorizer would produce the same features.
+
+Misses are scored by the compiled NumPy scorer (text_scorer.py) when its
+.npz export exists, otherwise by the pickled sklearn vectorizer and
+classifier.
+
+The artifacts in use are re-stat'ed every `check_interval` seconds; when
+one changes (or the compiled export appears or disappears) the model is
+reloaded and the cache is dropped.
+
+With `timer` set, misses time their two stages: timer("vectorize") around
+feature extraction and timer("predict_proba") around the classifier.
+"""
+
+import os
+import re
+import threading
+import time
+import logging
+from contextlib import nullcontext
+
+import joblib
+
+from cache import LRUCache
+from text_scorer import CompiledTextScorer
+
+
+class TextModel:
+    def __init__(self, vectorizer_path, classifier_path, scorer_path=None,
+                 cache_size=4096, cache_ttl=3600.0, check_interval=5.0, timer=None):
+        self.vectorizer_path = vectorizer_path
+        self.classifier_path = classifier_path
+        self.scorer_path = scorer_path
+        self.check_interval = float(check_interval)
+        # stage name -> context manager
+        self.timer = timer or (lambda stage: nullcontext())
+
+        self.cache = LRUCache(max_entries=cache_size, ttl=cache_ttl, name="text-cache")
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._reloads = 0
+
+        # (version, predict_fn, normalize, backend): swapped as one tuple;
+        # predict_fn maps a list of texts to an (N, C) probability array
+        self._model = None
+        self._load()
+
+    # ---------- ARTIFACTS ----------
+
+    def _use_compiled(self):
+        return bool(self.scorer_path) and os.path.exists(self.scorer_path)
+
+    def _artifact_version(self):
+        if self._use_compiled():
+            paths = (self.scorer_path,)
+        else:
+            paths = (self.vectorizer_path, self.classifier_path)
+        parts = []
+        for path in paths:
+            st = os.stat(path)
+            parts.append(f"{os.path.basename(path)}:{st.st_mtime_ns}:{st.st_size}")
+        return "|".join(parts)
+
+    def _load(self):
+        version = self._artifact_version()
+        timer = self.timer
+        if self._use_compiled():
+            scorer = CompiledTextScorer(self.scorer_path)
+            vectorizer, transform, predict = scorer, scorer.transform, scorer.predict_proba_features
+            backend = "compiled"
+        else:
+            vectorizer = joblib.load(self.vectorizer_path)
+            classifier = joblib.load(self.classifier_path)
+            transform, predict = vectorizer.transform, classifier.predict_proba
+            backend = "sklearn"
+
+        def predict_fn(texts):
+            with timer("vectorize"):
+                features = transform(texts)
+            with timer("predict_proba"):
+                return predict(features)
+
+        self._model = (version, predict_fn, build_normalizer(vectorizer), backend)
+        self.cache.clear()
+
+    def _check_for_update(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            try:
+                if self._artifact_version() == self._model[0]:
+                    return
+                self._load()
+                self._reloads += 1
+                logging.info("🔄 Text model artifacts changed, reloaded and cleared cache")
+            except Exception:
+                # Half-written artifact or file missing mid-deploy: keep serving
+                # the loaded model and retry on the next check.
+                logging.exception("❌ Text model reload failed")
+
+    # ---------- PUBLIC API ----------
+
+    def predict_proba(self, description):
+        """Class probabilities (read-only array) for one description."""
+        self._check_for_update()
+        version, predict_fn, normalize, _ = self._model
+
+        def compute():
+            probs = predict_fn([description])[0]
+            probs.setflags(write=False)  # shared between requests
+            return probs
+
+        return self.cache.get_or_compute((version, normalize(description)), compute)
+
+    def predict_proba_batch(self, descriptions):
+        """
+        Class probabilities for many descriptions: cache hits are served
+        directly, all misses are scored in one call.
+        """
+        self._check_for_update()
+        version, predict_fn, normalize, _ = self._model
+
+        keys = [(version, normalize(d)) for d in descriptions]
+        results = [self.cache.get(key) for key in keys]
+
+        # One row per distinct missing key
+        missing = {}
+        for i, probs in enumerate(results):
+            if probs is None:
+                missing.setdefault(keys[i], descriptions[i])
+        if missing:
+            probs_rows = predict_fn(list(missing.values()))
+            for key, probs in zip(missing, probs_rows):
+                probs.setflags(write=False)  # view of a batch array nobody else holds
+                self.cache.put(key, probs)
+                missing[key] = probs
+            results = [missing[key] if probs is None else probs for key, probs in zip(keys, results)]
+        return results
+
+    def warmup(self):
+        """One uncached prediction so the first request doesn't pay first-call costs."""
+        self._model[1](["warm up"])
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats["model_version"] = self._model[0]
+        stats["backend"] = self._model[3]
+        stats["reloads"] = self._reloads
+        return stats
+
+
+def build_normalizer(vectorizer):
+    """
+    Cache-key function for `vectorizer`: lowercase and keep only the tokens
+    its token_pattern extracts. Vectorizers with custom analyzers,
+    preprocessors or accent stripping fall back to the raw text.
+    """
+    if (
+        getattr(vectorizer, "analyzer", None) != "word"
+        or getattr(vectorizer, "tokenizer", None) is not None
+        or getattr(vectorizer, "preprocessor", None) is not None
+        or getattr(vectorizer, "strip_accents", None) is not None
+        or not getattr(vectorizer, "token_pattern", None)
+    ):
+        return lambda text: text
+
+    token_re = re.compile(vectorizer.token_pattern)
+    lowercase = vectorizer.lowercase
+
+    def normalize(text):
+        if lowercase:
+            text = text.lower()
+        return " ".join(token_re.findall(text))
+
+    return normalize
@@ -0,0 +1,215 @@
+"""
+Compiled TF-IDF + LogisticRegression scorer without sklearn on the request path.
+
+export_compiled_scorer() flattens a fitted TfidfVectorizer (word analyzer)
+and LogisticRegression into one .npz file:
+- vocabulary, stop words and tokenizer settings,
+- IDF weights,
+- coefficients and intercepts.
+CompiledTextScorer replays the same pipeline with a dict lookup per
+n-gram and a small dense dot product:
+
+    lowercase -> token_pattern -> stop words -> n-grams -> tf * idf -> norm
+    -> X @ coef.T + intercept -> softmax (or one-vs-rest sigmoid)
+
+Probabilities match sklearn's predict_proba to float64 rounding.
+"""
+
+import re
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+
+def _is_ovr(clf):
+    # Same rule as LogisticRegression.predict_proba
+    multi_class = getattr(clf, "multi_class", "auto")
+    if multi_class == "deprecated":
+        multi_class = "auto"
+    return multi_class in ("ovr", "warn") or (
+        multi_class == "auto" and (len(clf.classes_) <= 2 or clf.solver == "liblinear")
+    )
+
+
+def export_compiled_scorer(vectorizer, classifier, path):
+    """Write the fitted vectorizer + classifier to `path` (.npz)."""
+    if vectorizer.analyzer != "word" or vectorizer.tokenizer is not None or vectorizer.preprocessor is not None:
+        raise ValueError("only the default word analyzer can be compiled")
+    if vectorizer.strip_accents is not None:
+        raise ValueError("strip_accents is not supported by the compiled scorer")
+
+    vocabulary = vectorizer.vocabulary_
+    terms = np.empty(len(vocabulary), dtype=object)
+    for term, index in vocabulary.items():
+        terms[index] = term
+
+    idf = vectorizer.idf_ if vectorizer.use_idf else np.ones(len(terms))
+    stop_words = sorted(vectorizer.get_stop_words() or ())
+
+    np.savez(
+        path,
+        format_version=FORMAT_VERSION,
+        terms=terms.astype(str),
+        stop_words=np.array(stop_words, dtype=str),
+        token_pattern=vectorizer.token_pattern,
+        lowercase=vectorizer.lowercase,
+        ngram_range=np.array(vectorizer.ngram_range),
+        binary=vectorizer.binary,
+        sublinear_tf=vectorizer.sublinear_tf,
+        norm=vectorizer.norm or "",
+        idf=np.asarray(idf, dtype=np.float64),
+        coef=np.asarray(classifier.coef_, dtype=np.float64),
+        intercept=np.asarray(classifier.intercept_, dtype=np.float64),
+        classes=np.asarray(classifier.classes_),
+        ovr=_is_ovr(classifier),
+    )
+
+
+class CompiledTextScorer:
+    # Read by text_model.build_normalizer, like a TfidfVectorizer
+    analyzer = "word"
+    tokenizer = None
+    preprocessor = None
+    strip_accents = None
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported scorer format {int(data['format_version'])}")
+
+            self.vocabulary = {term: i for i, term in enumerate(data["terms"].tolist())}
+            self.stop_words = frozenset(data["stop_words"].tolist())
+            self.token_pattern = str(data["token_pattern"])
+            self.lowercase = bool(data["lowercase"])
+            self.min_n, self.max_n = (int(n) for n in data["ngram_range"])
+            self.binary = bool(data["binary"])
+            self.sublinear_tf = bool(data["sublinear_tf"])
+            self.norm = str(data["norm"]) or None
+            self.idf = data["idf"]
+            # (features, classes): one contiguous row per feature for the sparse dot
+            self.coef_t = np.ascontiguousarray(data["coef"].T)
+            self.intercept = data["intercept"]
+            self.classes_ = data["classes"]
+            self.ovr = bool(data["ovr"])
+
+        self._token_re = re.compile(self.token_pattern)
+
+    # ---------- FEATURES ----------
+
+    def _terms(self, text):
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._token_re.findall(text)
+        if self.stop_words:
+            tokens = [t for t in tokens if t not in self.stop_words]
+
+        min_n, max_n = self.min_n, self.max_n
+        if max_n == 1:
+            return tokens
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def _counts(self, text):
+        """{feature index: term count} for one document."""
+        vocabulary = self.vocabulary
+        counts = {}
+        for term in self._terms(text):
+            index = vocabulary.get(term)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        return counts
+
+    def _weights(self, indices, tf):
+        if self.binary:
+            tf[:] = 1.0
+        elif self.sublinear_tf:
+            tf = np.log(tf) + 1.0
+        return tf * self.idf[indices]
+
+    def _row(self, text):
+        """(indices, normalized tf-idf weights) of one document."""
+        counts = self._counts(text)
+        indices = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        weights = self._weights(indices, np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+        if self.norm == "l2":
+            norm = np.sqrt(np.dot(weights, weights))
+        elif self.norm == "l1":
+            norm = np.abs(weights).sum()
+        else:
+            norm = 0.0
+        if norm > 0:
+            weights /= norm
+        return indices, weights
+
+    def _csr(self, texts):
+        """(indptr, indices, normalized tf-idf weights) of many documents."""
+        indptr, indices, counts = [0], [], []
+        for text in texts:
+            row = self._counts(text)
+            indices.extend(row.keys())
+            counts.extend(row.values())
+            indptr.append(len(indices))
+
+        indptr = np.array(indptr, dtype=np.intp)
+        indices = np.array(indices, dtype=np.intp)
+        weights = self._weights(indices, np.array(counts, dtype=np.float64))
+
+        if self.norm and len(weights):
+            lengths = np.diff(indptr)
+            starts = indptr[:-1][lengths > 0]
+            per_entry = weights * weights if self.norm == "l2" else np.abs(weights)
+            norms = np.add.reduceat(per_entry, starts)
+            if self.norm == "l2":
+                norms = np.sqrt(norms)
+            norms[norms == 0] = 1.0
+            weights /= np.repeat(norms, lengths[lengths > 0])
+        return indptr, indices, weights
+
+    def transform(self, texts):
+        """Tf-idf features of `texts` as CSR parts (indptr, indices, weights)."""
+        if len(texts) == 1:
+            # /api/classify hot path: one document, no CSR bookkeeping
+            indices, weights = self._row(texts[0])
+            return (0, len(indices)), indices, weights
+        return self._csr(texts)
+
+    # ---------- SCORING ----------
+
+    def decision_function_features(self, features):
+        indptr, indices, weights = features
+        if len(indptr) == 2:
+            return (self.intercept + weights @ self.coef_t[indices])[None, :]
+
+        indptr = np.asarray(indptr)
+        scores = np.tile(self.intercept, (len(indptr) - 1, 1))
+        if len(indices):
+            nonempty = np.diff(indptr) > 0
+            contributions = weights[:, None] * self.coef_t[indices]
+            scores[nonempty] += np.add.reduceat(contributions, indptr[:-1][nonempty], axis=0)
+        return scores
+
+    def predict_proba_features(self, features):
+        scores = self.decision_function_features(features)
+        if not self.ovr:
+            if scores.shape[1] == 1:
+                # Binary multinomial: sklearn softmaxes [-d, d]
+                scores = np.hstack([-scores, scores])
+            scores -= scores.max(axis=1, keepdims=True)
+            np.exp(scores, out=scores)
+            scores /= scores.sum(axis=1, keepdims=True)
+            return scores
+
+        probs = 1.0 / (1.0 + np.exp(-scores))
+        if probs.shape[1] == 1:
+            return np.hstack([1.0 - probs, probs])
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def decision_function(self, texts):
+        return self.decision_function_features(self.transform(texts))
+
+    def predict_proba(self, texts):
+        return self.predict_proba_features(self.transform(texts))
@@ -0,0 +1,145 @@
+"""
+Read-through cache for /api/track lookups.
+
+Citizens poll "Track Issue" far more often than reports change, so the
+JSON body of each lookup is cached by tracking id in two tiers:
+- a per-worker LRU (cache.LRUCache),
+- optionally a Redis instance shared by all workers, so one worker's
+  query serves the others.
+Unknown ids are cached as well (negative entries, shorter TTL): scanning
+random ids costs one query per id per TTL instead of one per request.
+
+Writers call invalidate(tracking_id) after committing; it drops the local
+entry and the shared key. Other workers' local entries cannot be reached,
+so the staleness bound after a write is `ttl` for known reports and
+`negative_ttl` for a freshly created id that had been looked up before it
+existed. Redis errors are logged and counted; lookups then go to the
+database.
+"""
+
+import threading
+import logging
+
+from cache import LRUCache
+
+
+_MISSING = object()
+# Shared-tier marker for "no such report"
+_NOT_FOUND = ""
+
+
+class TrackCache:
+    def __init__(self, max_entries=10000, ttl=30.0, negative_ttl=10.0, redis_url=None,
+                 key_prefix="snapfix:track:", name="track-cache"):
+        self.ttl = float(ttl)
+        self.negative_ttl = float(negative_ttl)
+        self.key_prefix = key_prefix
+        self.local = LRUCache(max_entries=max_entries, ttl=self.ttl, name=name)
+
+        self.redis = None
+        if redis_url:
+            import redis
+
+            self.redis = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+        self._stats_lock = threading.Lock()
+        self._shared_hits = 0
+        self._loads = 0
+        self._negative_hits = 0
+        self._invalidations = 0
+        self._shared_errors = 0
+
+    # ---------- SHARED TIER ----------
+
+    def _shared_get(self, tracking_id):
+        try:
+            raw = self.redis.get(self.key_prefix + tracking_id)
+        except Exception:
+            self._shared_error("read")
+            return _MISSING
+        return _MISSING if raw is None else raw.decode()
+
+    def _shared_put(self, tracking_id, body):
+        ttl = self.ttl if body is not None else self.negative_ttl
+        try:
+            self.redis.set(self.key_prefix + tracking_id, _NOT_FOUND if body is None else body,
+                           px=max(1, int(ttl * 1000)))
+        except Exception:
+            self._shared_error("write")
+
+    def _shared_delete(self, tracking_ids):
+        try:
+            self.redis.delete(*(self.key_prefix + t for t in tracking_ids))
+        except Exception:
+            self._shared_error("delete")
+
+    def _shared_error(self, op):
+        with self._stats_lock:
+            self._shared_errors += 1
+        logging.warning(f"⚠️ Track cache: shared {op} failed, using the database", exc_info=True)
+
+    # ---------- PUBLIC API ----------
+
+    def get(self, tracking_id, load):
+        """
+        JSON body for `tracking_id`, or None if there is no such report.
+        load(tracking_id) -> body or None runs on a miss in every tier.
+        """
+        body = self.local.get(tracking_id, _MISSING)
+        if body is _MISSING and self.redis is not None:
+            body = self._shared_get(tracking_id)
+            if body is not _MISSING:
+                body = None if body == _NOT_FOUND else body
+                with self._stats_lock:
+                    self._shared_hits += 1
+                self._put_local(tracking_id, body)
+
+        if body is _MISSING:
+            body = load(tracking_id)
+            with self._stats_lock:
+                self._loads += 1
+            self._put_local(tracking_id, body)
+            if self.redis is not None:
+                self._shared_put(tracking_id, body)
+        elif body is None:
+            with self._stats_lock:
+                self._negative_hits += 1
+        return body
+
+    def _put_local(self, tracking_id, body):
+        self.local.put(tracking_id, body, ttl=self.ttl if body is not None else self.negative_ttl)
+
+    def invalidate(self, *tracking_ids):
+        """Forget these ids (call after the write is committed)."""
+        tracking_ids = [t for t in tracking_ids if t]
+        if not tracking_ids:
+            return
+        for tracking_id in tracking_ids:
+            self.local.delete(tracking_id)
+        if self.redis is not None:
+            self._shared_delete(tracking_ids)
+        with self._stats_lock:
+            self._invalidations += len(tracking_ids)
+
+    def stats(self):
+        local = self.local.stats()
+        with self._stats_lock:
+            lookups = local["hits"] + local["misses"]
+            hits = local["hits"] + self._shared_hits
+            return {
+                "backend": "local+redis" if self.redis is not None else "local",
+                "size": local["size"],
+                "max_entries": local["max_entries"],
+                "lookups": lookups,
+                "local_hits": local["hits"],
+                "shared_hits": self._shared_hits,
+                "negative_hits": self._negative_hits,
+                "db_loads": self._loads,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self._invalidations,
+                "shared_errors": self._shared_errors,
+                "evictions": local["evictions"],
+                # Worst case a worker that did not make a write keeps serving the old answer
+                "max_staleness_s": self.ttl,
+                "max_negative_staleness_s": self.negative_ttl,
+            }
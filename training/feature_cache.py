@@ -0,0 +1,177 @@
+"""
+On-disk cache of bottleneck features for training the image head.
+
+The MobileNetV2 backbone is frozen, so its pooled output for a given photo
+never changes between epochs or between training runs. FeatureCache keeps
+those vectors in fixed-size float32 `.npy` shards (read back memory-mapped)
+plus a manifest mapping each photo's content hash to (shard, row):
+
+    feature_cache/
+        manifest.json          {"fingerprint", "dim", "shard_size", "shards", "entries"}
+        features-00000.npy     (shard_size, dim) float32
+        ...
+
+Entries are keyed by the SHA-1 of the image file, not by its path or label,
+so moving a photo to another class directory (a label fix) or re-running
+training reuses its features. The fingerprint identifies the backbone
+weights and input size; a cache written for another backbone is discarded.
+"""
+
+import os
+import json
+import hashlib
+import logging
+
+import numpy as np
+
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+SHARD_SIZE = 4096
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def weights_fingerprint(weights, *extra):
+    """Hash of a list of weight arrays (and any extra settings, e.g. the input size)."""
+    h = hashlib.sha1(repr(extra).encode())
+    for w in weights:
+        w = np.ascontiguousarray(w)
+        h.update(str(w.shape).encode())
+        h.update(w.tobytes())
+    return h.hexdigest()
+
+
+class FeatureCache:
+    def __init__(self, directory, fingerprint, dim, shard_size=SHARD_SIZE):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.dim = int(dim)
+        self.shard_size = int(shard_size)
+
+        self._shards = []  # [{"file": ..., "rows": n}]
+        self._entries = {}  # hash -> (shard index, row)
+        self._open = {}  # shard index -> memmap
+        os.makedirs(directory, exist_ok=True)
+        self._load_manifest()
+
+    # ---------- MANIFEST ----------
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILENAME)
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path()) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+
+        if (
+            manifest.get("version") != MANIFEST_VERSION
+            or manifest.get("fingerprint") != self.fingerprint
+            or manifest.get("dim") != self.dim
+        ):
+            logging.warning(f"⚠️ Feature cache in {self.directory} was built for another backbone; rebuilding")
+            self.clear()
+            return
+
+        self.shard_size = manifest["shard_size"]
+        self._shards = manifest["shards"]
+        self._entries = {key: tuple(loc) for key, loc in manifest["entries"].items()}
+
+    def _save_manifest(self):
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "fingerprint": self.fingerprint,
+            "dim": self.dim,
+            "shard_size": self.shard_size,
+            "shards": self._shards,
+            "entries": self._entries,
+        }
+        # Readers never see a half-written manifest
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path())
+
+    def clear(self):
+        self._open.clear()
+        for name in os.listdir(self.directory):
+            if name.startswith("features-") or name == MANIFEST_FILENAME:
+                os.remove(os.path.join(self.directory, name))
+        self._shards = []
+        self._entries = {}
+
+    # ---------- SHARDS ----------
+
+    def _shard(self, index, mode="r"):
+        arr = self._open.get(index)
+        if arr is None or (mode != "r" and arr.mode == "r"):
+            path = os.path.join(self.directory, self._shards[index]["file"])
+            arr = np.load(path, mmap_mode=mode)
+            self._open[index] = arr
+        return arr
+
+    def _new_shard(self):
+        index = len(self._shards)
+        name = f"features-{index:05d}.npy"
+        arr = np.lib.format.open_memmap(
+            os.path.join(self.directory, name), mode="w+", dtype=np.float32, shape=(self.shard_size, self.dim)
+        )
+        self._shards.append({"file": name, "rows": 0})
+        self._open[index] = arr
+        return index
+
+    # ---------- PUBLIC API ----------
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def missing(self, keys):
+        """Distinct keys without cached features, in first-seen order."""
+        return [key for key in dict.fromkeys(keys) if key not in self._entries]
+
+    def add(self, keys, features):
+        """Store `features` (len(keys), dim) under `keys`; already cached keys are skipped."""
+        features = np.asarray(features, dtype=np.float32)
+        if features.shape != (len(keys), self.dim):
+            raise ValueError(f"expected features of shape ({len(keys)}, {self.dim}), got {features.shape}")
+
+        pending = [(key, row) for row, key in enumerate(keys) if key not in self._entries]
+        while pending:
+            index = len(self._shards) - 1
+            if index < 0 or self._shards[index]["rows"] >= self.shard_size:
+                index = self._new_shard()
+            shard = self._shard(index, mode="r+")
+            start = self._shards[index]["rows"]
+            take = pending[:self.shard_size - start]
+            shard[start:start + len(take)] = features[[row for _, row in take]]
+            shard.flush()
+            for offset, (key, _) in enumerate(take):
+                self._entries[key] = (index, start + offset)
+            self._shards[index]["rows"] = start + len(take)
+            pending = pending[len(take):]
+        self._save_manifest()
+
+    def get(self, keys):
+        """Features of `keys` as one (len(keys), dim) array; KeyError for uncached keys."""
+        out = np.empty((len(keys), self.dim), dtype=np.float32)
+        by_shard = {}
+        for i, key in enumerate(keys):
+            index, row = self._entries[key]
+            by_shard.setdefault(index, ([], []))
+            by_shard[index][0].append(i)
+            by_shard[index][1].append(row)
+        for index, (positions, rows) in by_shard.items():
+            out[positions] = self._shard(index)[rows]
+        return out
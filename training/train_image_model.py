@@ -1,10 +1,16 @@
 import os
+import time
+import argparse
+import numpy as np
 import tensorflow as tf
 from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
+from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout, GaussianNoise
 from tensorflow.keras.models import Model
 from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
 
+from feature_cache import FeatureCache, file_hash, weights_fingerprint
+from image_records import RECORDS_DIR, decode_and_resize, list_image_files, load_dataset
+
 # ===================== PATHS =====================
 
 BASE_DIR = os.path.dirname(__file__)
@@ -13,6 +19,7 @@ OUTPUT_DIR = os.path.join(BASE_DIR, "model_output")
 
 TRAIN_DIR = os.path.join(DATA_DIR, "train")
 VAL_DIR = os.path.join(DATA_DIR, "valid")
+FEATURE_CACHE_DIR = os.path.join(BASE_DIR, "feature_cache")
 
 # ===================== CONFIG =====================
 
@@ -21,6 +28,19 @@ BATCH_SIZE = 32
 EPOCHS = 10
 LEARNING_RATE = 1e-4
 
+MODEL_FILENAME = "image_model_mobilenet.keras"
+TFLITE_FILENAME = "image_model_int8.tflite"
+SERVING_DIRNAME = "image_model_serving"
+CALIBRATION_SAMPLES = 200
+# Photos of one serving batch decoded concurrently
+DECODE_PARALLELISM = 16
+# XLA-compile the serving forward pass (one program per padded batch size).
+# Off by default: on CPU the XLA build of MobileNetV2 is slower than TF's
+# oneDNN kernels (tests/bench_image_inference.py)
+SERVING_JIT_COMPILE = False
+# Extracted features written to the cache (and the manifest saved) per chunk
+FEATURE_CHUNK = 1024
+
 # ===================== AUGMENTATION =====================
 
 data_augmentation = tf.keras.Sequential(
@@ -62,50 +82,375 @@ def build_model(num_classes):
 
     return model, base_model
 
-# ===================== TRAINING =====================
-
-def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+# ===================== TFLITE EXPORT =====================
 
-    train_ds = tf.keras.utils.image_dataset_from_directory(
+def representative_dataset(num_samples=CALIBRATION_SAMPLES):
+    """Calibration images for int8 quantization, preprocessed exactly as in training."""
+    calib_ds = tf.keras.utils.image_dataset_from_directory(
         TRAIN_DIR,
-        labels="inferred",
-        label_mode="int",
+        labels=None,
         image_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
+        batch_size=1,
         shuffle=True,
         seed=42,
     )
+    for images in calib_ds.take(num_samples):
+        yield [tf.cast(images, tf.float32)]
 
-    val_ds = tf.keras.utils.image_dataset_from_directory(
-        VAL_DIR,
-        labels="inferred",
-        label_mode="int",
-        image_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
-        shuffle=False,
+
+def export_tflite_int8(model, num_samples=CALIBRATION_SAMPLES):
+    """
+    Post-training full-integer quantization of the trained model, converted
+    without its augmentation layers (see build_inference_model).
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(build_inference_model(model))
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: representative_dataset(num_samples)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    # Raw [0, 255] pixels fit uint8 exactly; probabilities are dequantized by the backend
+    converter.inference_input_type = tf.uint8
+    converter.inference_output_type = tf.uint8
+
+    tflite_model = converter.convert()
+
+    save_path = os.path.join(OUTPUT_DIR, TFLITE_FILENAME)
+    with open(save_path, "wb") as f:
+        f.write(tflite_model)
+
+    print(f"✅ Int8 TFLite model saved to: {save_path} ({len(tflite_model) / 1e6:.1f} MB)")
+
+# ===================== SERVING EXPORT =====================
+
+def build_inference_model(model):
+    """
+    The graph of build_model() without data_augmentation: its layers are
+    no-ops at inference but still end up in every traced serving graph.
+    The backbone and head layers (and so the weights) of the trained
+    `model` are reused, not copied.
+    """
+    layers = model.layers
+    # The MobileNetV2 backbone: the nested model that is not the augmentation block
+    base = next(
+        i for i, layer in enumerate(layers)
+        if isinstance(layer, tf.keras.Model) and layer.name != data_augmentation.name
     )
 
-    class_names = train_ds.class_names
-    print("✅ Classes:", class_names)
+    inputs = tf.keras.Input(shape=(IMG_SIZE, IMG_SIZE, 3))
+    x = preprocess_input(inputs)
+    x = layers[base](x, training=False)
+    for layer in layers[base + 1:]:
+        x = layer(x)
+    return Model(inputs, x)
+
+
+class ServingModule(tf.Module):
+    """Signatures of the serving SavedModel; preprocess_input is part of `model`."""
+
+    def __init__(self, model, jit_compile=SERVING_JIT_COMPILE):
+        super().__init__()
+        self.model = build_inference_model(model)
+        # Called directly, not through Model.predict. XLA compiles one program
+        # per input shape, so the backend pads batches to a few fixed sizes
+        # when this flag is saved as True.
+        self.jit_compile = tf.Variable(bool(jit_compile), trainable=False, name="jit_compile")
+        self.forward = tf.function(self._forward, jit_compile=bool(jit_compile))
+
+    def _forward(self, images):
+        return self.model(images, training=False)
+
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string, name="image_bytes")])
+    def preprocess(self, image_bytes):
+        images = tf.map_fn(
+            lambda data: decode_and_resize(data, IMG_SIZE),
+            image_bytes,
+            fn_output_signature=tf.TensorSpec((IMG_SIZE, IMG_SIZE, 3), tf.float32),
+            parallel_iterations=DECODE_PARALLELISM,
+        )
+        return {"images": images}
+
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string, name="image_bytes")])
+    def classify_bytes(self, image_bytes):
+        images = self.preprocess(image_bytes)["images"]
+        return {"probabilities": self.forward(images)}
+
+    @tf.function(input_signature=[tf.TensorSpec([None, IMG_SIZE, IMG_SIZE, 3], tf.float32, name="images")])
+    def classify_pixels(self, images):
+        return {"probabilities": self.forward(images)}
+
+
+def export_serving_model(model, jit_compile=SERVING_JIT_COMPILE):
+    """
+    SavedModel for the `savedmodel` backend. The default signature takes a
+    batch of encoded images, so the server forwards upload bytes and decoding
+    runs in TensorFlow ops (outside the GIL) instead of PIL. The forward pass
+    has no augmentation layers, and is XLA-compiled if `jit_compile` is set.
+    """
+    module = ServingModule(model, jit_compile=jit_compile)
+    save_path = os.path.join(OUTPUT_DIR, SERVING_DIRNAME)
+    tf.saved_model.save(
+        module,
+        save_path,
+        signatures={
+            "serving_default": module.classify_bytes,
+            "classify_pixels": module.classify_pixels,
+            "preprocess": module.preprocess,
+        },
+    )
+
+    print(f"✅ Serving SavedModel saved to: {save_path}")
+
+# ===================== CACHED FEATURES =====================
+
+def build_feature_extractor(base_model):
+    """Raw [0, 255] pixels -> pooled backbone features, i.e. the input of the Dense head."""
+    inputs = tf.keras.Input(shape=(IMG_SIZE, IMG_SIZE, 3))
+    x = preprocess_input(inputs)
+    x = base_model(x, training=False)
+    outputs = GlobalAveragePooling2D()(x)
+    return Model(inputs, outputs)
+
+
+def cache_features(cache, extractor, paths):
+    """Content hashes of `paths`; the backbone only runs on photos the cache does not hold yet."""
+    keys = [file_hash(p) for p in paths]
+    path_of = {}
+    for path, key in zip(paths, keys):
+        path_of.setdefault(key, path)
+
+    todo = cache.missing(keys)
+    print(f"🧮 {len(path_of) - len(todo)} image(s) cached, extracting {len(todo)}")
+    if not todo:
+        return keys
 
     AUTOTUNE = tf.data.AUTOTUNE
-    train_ds = train_ds.prefetch(AUTOTUNE)
-    val_ds = val_ds.prefetch(AUTOTUNE)
+    ds = (
+        tf.data.Dataset.from_tensor_slices([path_of[key] for key in todo])
+        .map(lambda path: decode_and_resize(tf.io.read_file(path), IMG_SIZE), num_parallel_calls=AUTOTUNE)
+        .batch(BATCH_SIZE)
+        .prefetch(AUTOTUNE)
+    )
+    done, chunk = 0, []
+    for images in ds:
+        chunk.append(extractor(images, training=False).numpy())
+        if sum(len(c) for c in chunk) >= FEATURE_CHUNK:
+            features = np.concatenate(chunk)
+            cache.add(todo[done:done + len(features)], features)
+            done, chunk = done + len(features), []
+    if chunk:
+        features = np.concatenate(chunk)
+        cache.add(todo[done:done + len(features)], features)
+    return keys
+
+
+def build_head(num_classes, feature_dim, feature_noise=0.0, feature_dropout=0.0):
+    """
+    The Dense head of build_model() on pooled features. Feature-level
+    augmentation (Gaussian noise, dropout of whole feature dimensions) stands
+    in for the image augmentation the cached features cannot see; both layers
+    are only active during fit().
+    """
+    inputs = tf.keras.Input(shape=(feature_dim,))
+    x = inputs
+    if feature_noise:
+        x = GaussianNoise(feature_noise)(x)
+    if feature_dropout:
+        x = Dropout(feature_dropout)(x)
+    x = Dense(128, activation="relu")(x)
+    x = Dropout(0.3)(x)
+    outputs = Dense(num_classes, activation="softmax")(x)
+    return Model(inputs, outputs)
+
+
+def mixup(features, labels, alpha):
+    """Blend each example of a batch (one-hot labels) with a shuffled partner."""
+    n = tf.shape(features)[0]
+    g1 = tf.random.gamma([n, 1], alpha)
+    g2 = tf.random.gamma([n, 1], alpha)
+    lam = g1 / (g1 + g2)
+    partner = tf.random.shuffle(tf.range(n))
+    features = lam * features + (1.0 - lam) * tf.gather(features, partner)
+    labels = lam * labels + (1.0 - lam) * tf.gather(labels, partner)
+    return features, labels
+
+
+def train_on_cached_features(args):
+    """
+    Train only the Dense head, on backbone features computed once and kept
+    in the feature cache. Returns the full model (same graph as build_model,
+    head weights copied in), ready to save and export.
+    """
+    paths, labels, class_names = list_image_files(TRAIN_DIR)
+    val_paths, val_labels, _ = list_image_files(VAL_DIR, class_names)
+    print("✅ Classes:", class_names)
+
+    model, base_model = build_model(num_classes=len(class_names))
+    extractor = build_feature_extractor(base_model)
+    cache = FeatureCache(
+        args.feature_cache,
+        weights_fingerprint(base_model.get_weights(), IMG_SIZE),
+        extractor.output_shape[-1],
+    )
+
+    start = time.perf_counter()
+    x_train = cache.get(cache_features(cache, extractor, paths))
+    x_val = cache.get(cache_features(cache, extractor, val_paths))
+    print(f"✅ Features ready in {time.perf_counter() - start:.1f}s ({len(cache)} cached in {args.feature_cache})")
+
+    head = build_head(len(class_names), x_train.shape[1], args.feature_noise, args.feature_dropout)
+    if args.mixup:
+        y_train = tf.one_hot(labels, len(class_names))
+        y_val = tf.one_hot(val_labels, len(class_names))
+        loss = "categorical_crossentropy"
+    else:
+        y_train, y_val = labels, val_labels
+        loss = "sparse_categorical_crossentropy"
+    head.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=LEARNING_RATE),
+        loss=loss,
+        metrics=["accuracy"],
+    )
+
+    train_ds = (
+        tf.data.Dataset.from_tensor_slices((x_train, y_train))
+        .shuffle(len(x_train), seed=42, reshuffle_each_iteration=True)
+        .batch(BATCH_SIZE)
+    )
+    if args.mixup:
+        train_ds = train_ds.map(lambda x, y: mixup(x, y, args.mixup))
+    val_ds = tf.data.Dataset.from_tensor_slices((x_val, y_val)).batch(BATCH_SIZE)
+
+    start = time.perf_counter()
+    head.fit(train_ds, validation_data=val_ds, epochs=args.epochs)
+    print(f"✅ Head trained in {time.perf_counter() - start:.1f}s")
+
+    model_dense = [layer for layer in model.layers if isinstance(layer, Dense)]
+    head_dense = [layer for layer in head.layers if isinstance(layer, Dense)]
+    for target, source in zip(model_dense, head_dense):
+        target.set_weights(source.get_weights())
+    return model
+
+# ===================== TRAINING =====================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the MobileNetV2 image classifier")
+    parser.add_argument(
+        "--export-only",
+        action="store_true",
+        help="skip training and re-export the saved Keras model (SavedModel and TFLite)",
+    )
+    parser.add_argument(
+        "--calibration-samples",
+        type=int,
+        default=CALIBRATION_SAMPLES,
+        help="train images used to calibrate int8 quantization",
+    )
+    parser.add_argument(
+        "--xla",
+        action="store_true",
+        default=SERVING_JIT_COMPILE,
+        help="XLA-compile the forward pass of the serving SavedModel",
+    )
+    parser.add_argument(
+        "--cached-features",
+        action="store_true",
+        help="run the frozen backbone once, cache its features and train only the Dense head on them",
+    )
+    parser.add_argument("--feature-cache", default=FEATURE_CACHE_DIR, help="directory of the feature cache")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument(
+        "--records",
+        nargs="?",
+        const=RECORDS_DIR,
+        help="read train/valid from the TFRecords written by image_records.py (default dir: training/records)",
+    )
+    parser.add_argument(
+        "--feature-noise",
+        type=float,
+        default=0.0,
+        help="--cached-features: stddev of Gaussian noise added to the features",
+    )
+    parser.add_argument(
+        "--feature-dropout",
+        type=float,
+        default=0.0,
+        help="--cached-features: fraction of feature dimensions dropped per example",
+    )
+    parser.add_argument(
+        "--mixup",
+        type=float,
+        default=0.0,
+        help="--cached-features: mixup Beta(alpha, alpha) parameter (0 disables)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    save_path = os.path.join(OUTPUT_DIR, MODEL_FILENAME)
+
+    if args.export_only:
+        model = tf.keras.models.load_model(save_path)
+        export_serving_model(model, jit_compile=args.xla)
+        export_tflite_int8(model, args.calibration_samples)
+        return
+
+    if args.cached_features:
+        model = train_on_cached_features(args)
+        model.save(save_path)
+        print(f"✅ Model saved to: {save_path}")
+        export_serving_model(model, jit_compile=args.xla)
+        export_tflite_int8(model, args.calibration_samples)
+        return
+
+    if args.records:
+        train_ds, class_names = load_dataset(
+            os.path.join(args.records, "train"), BATCH_SIZE, shuffle=True, seed=42
+        )
+        val_ds, _ = load_dataset(os.path.join(args.records, "valid"), BATCH_SIZE)
+    else:
+        train_ds = tf.keras.utils.image_dataset_from_directory(
+            TRAIN_DIR,
+            labels="inferred",
+            label_mode="int",
+            image_size=(IMG_SIZE, IMG_SIZE),
+            batch_size=BATCH_SIZE,
+            shuffle=True,
+            seed=42,
+        )
+
+        val_ds = tf.keras.utils.image_dataset_from_directory(
+            VAL_DIR,
+            labels="inferred",
+            label_mode="int",
+            image_size=(IMG_SIZE, IMG_SIZE),
+            batch_size=BATCH_SIZE,
+            shuffle=False,
+        )
+
+        class_names = train_ds.class_names
+
+        AUTOTUNE = tf.data.AUTOTUNE
+        train_ds = train_ds.prefetch(AUTOTUNE)
+        val_ds = val_ds.prefetch(AUTOTUNE)
+
+    print("✅ Classes:", class_names)
 
     model, base_model = build_model(num_classes=len(class_names))
 
     model.fit(
         train_ds,
         validation_data=val_ds,
-        epochs=EPOCHS,
+        epochs=args.epochs,
     )
 
-    save_path = os.path.join(OUTPUT_DIR, "image_model_mobilenet.keras")
     model.save(save_path)
 
     print(f"✅ Model saved to: {save_path}")
 
+    export_serving_model(model, jit_compile=args.xla)
+    export_tflite_int8(model, args.calibration_samples)
+
 # ===================== ENTRY =====================
 
 if __name__ == "__main__":
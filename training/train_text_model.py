@@ -1,9 +1,20 @@
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 import joblib
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from text_scorer import export_compiled_scorer, CompiledTextScorer
+
+SCORER_FILENAME = "text_scorer.npz"
+PARITY_TOLERANCE = 1e-6
+
 # ===============================
 # LOAD DATASET
 # ===============================
@@ -74,3 +85,19 @@ joblib.dump(clf, "text_classifier.joblib")
 joblib.dump(label_to_idx, "label_to_idx.joblib")
 
 print("✅ Text model and artifacts saved successfully")
+
+# ===============================
+# COMPILED SCORER EXPORT
+# ===============================
+
+# NumPy-only replica of vectorizer + classifier for the request path
+export_compiled_scorer(vectorizer, clf, SCORER_FILENAME)
+
+scorer = CompiledTextScorer(SCORER_FILENAME)
+max_diff = float(np.abs(scorer.predict_proba(texts) - clf.predict_proba(vectorizer.transform(texts))).max())
+print(f"Compiled scorer max |Δp| vs sklearn on {len(texts)} texts: {max_diff:.2e}")
+if max_diff > PARITY_TOLERANCE:
+    os.remove(SCORER_FILENAME)
+    raise SystemExit(f"❌ Compiled scorer deviates by {max_diff:.2e} (> {PARITY_TOLERANCE}); not exported")
+
+print(f"✅ Compiled scorer saved to {SCORER_FILENAME}")